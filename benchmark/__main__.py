@@ -0,0 +1,44 @@
+"""
+Run benchmarks and store the results as JSON.
+
+Usage::
+
+    python -m benchmark [--pattern "bench_*.py"] [--output results.json]
+"""
+import argparse
+import os
+import sys
+import unittest
+
+from benchmark.base import write_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    parser.add_argument("-p", "--pattern", default="bench_*.py",
+                        help="pattern of benchmark modules")
+    parser.add_argument("-o", "--output",
+                        help="file for the results in JSON (default: stdout)")
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    suite = unittest.defaultTestLoader.discover(
+        here, pattern=args.pattern, top_level_dir=os.path.dirname(here))
+    # Benchmarks print measurements; keep stdout for the results if needed
+    stdout = sys.stdout
+    if args.output is None:
+        sys.stdout = sys.stderr
+    try:
+        result = unittest.TextTestRunner(stream=sys.stderr).run(suite)
+    finally:
+        sys.stdout = stdout
+    if args.output is None:
+        write_results(sys.stdout)
+    else:
+        with open(args.output, "w") as f:
+            write_results(f)
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Utilities for benchmarking.
+
+Benchmarks are test methods of :class:`Benchmark` subclasses in `bench_*.py`
+modules. They are not run by the test suite; run them with::
+
+    python -m unittest discover -s benchmark -t . -p "bench_*.py"
+
+or, to also store the results in a JSON file, with::
+
+    python -m benchmark [--pattern "bench_*.py"] [--output results.json]
+"""
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+import unittest
+
+#: Results of measurements in this process; see :obj:`write_results`
+results = []
+
+
+class Benchmark(unittest.TestCase):
+    #: Number of calls of the benchmarked function within a single timing
+    number = 10
+    #: Number of timings; the best one is reported
+    repeat = 5
+
+    def measure(self, name, func, number=None, repeat=None, **params):
+        """
+        Time `func` and print the best time per call.
+
+        Parameters
+        ----------
+        name : str
+            name of the measurement, used in the output
+        func : Callable[[], Any]
+            function to time
+        number : Optional[int]
+            number of calls in a single timing (default: `self.number`)
+        repeat : Optional[int]
+            number of timings (default: `self.repeat`)
+        **params
+            parameters of the measurement (e.g. sizes of data), which are
+            printed and stored in results
+
+        Returns
+        -------
+        time : float
+            the best time of a single call, in seconds
+        """
+        number = number or self.number
+        repeat = repeat or self.repeat
+        times = timeit.repeat(func, number=number, repeat=repeat)
+        best = min(times) / number
+        print("{}.{}{}: {:.3f} ms".format(
+            type(self).__name__, name, _format_params(params), best * 1e3))
+        self._add_result(name, params, time=best, number=number,
+                         repeat=repeat, times=[t / number for t in times])
+        return best
+
+    def measure_memory(self, name, func, **params):
+        """
+        Trace memory allocated by `func` and print the memory that is still
+        allocated when it returns (including its result) and the peak.
+
+        Parameters
+        ----------
+        name : str
+            name of the measurement, used in the output
+        func : Callable[[], Any]
+            function to trace
+        **params
+            parameters of the measurement; see :obj:`measure`
+
+        Returns
+        -------
+        (current, peak) : Tuple[int, int]
+            allocated memory after the call and the peak, in bytes
+        """
+        tracemalloc.start()
+        try:
+            result = func()  # pylint: disable=unused-variable
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+        print("{}.{}{}: {:.1f} MB (peak {:.1f} MB)".format(
+            type(self).__name__, name, _format_params(params),
+            current / 2 ** 20, peak / 2 ** 20))
+        self._add_result(name, params, memory=current, peak_memory=peak)
+        return current, peak
+
+    def record(self, name, params, **measurements):
+        """
+        Print and store measurements made by the benchmark itself, e.g.
+        latencies; times are given in seconds.
+
+        Parameters
+        ----------
+        name : str
+            name of the measurement
+        params : dict
+            parameters of the measurement; see :obj:`measure`
+        **measurements
+            measured values
+        """
+        print("{}.{}{}: {}".format(
+            type(self).__name__, name, _format_params(params),
+            ", ".join("{}={:.3f} ms".format(key, value * 1e3)
+                      if isinstance(value, float)
+                      else "{}={}".format(key, value)
+                      for key, value in measurements.items())))
+        self._add_result(name, params, **measurements)
+
+    def _add_result(self, name, params, **measurements):
+        results.append(dict(
+            benchmark="{}.{}".format(type(self).__module__,
+                                     type(self).__qualname__),
+            name=name, params=params, **measurements))
+
+
+def _format_params(params):
+    if not params:
+        return ""
+    return "[{}]".format(
+        ", ".join("{}={}".format(*item) for item in params.items()))
+
+
+def write_results(stream):
+    """Write results of measurements to `stream` as JSON."""
+    json.dump(dict(python=sys.version, platform=platform.platform(),
+                   results=results),
+              stream, indent=1)
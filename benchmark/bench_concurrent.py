@@ -0,0 +1,133 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import unittest
+
+import numpy as np
+
+from AnyQt.QtCore import QEventLoop, QTimer
+
+from orangewidget.tests.base import GuiTest
+from orangewidget.utils.concurrent import ProcessPool, FutureSetWatcher
+from orangewidget.utils.sharedarrays import SHARED_MEMORY_SUPPORTED
+from benchmark.base import Benchmark
+
+
+def work(n):
+    """A CPU-bound pure Python task"""
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+class BenchProcessPool(Benchmark):
+    """Run 32 CPU-bound tasks in threads and in processes"""
+    n_tasks = 32
+    task_size = 200000
+    workers = (1, 2, 4, 8)
+    number = 1
+    repeat = 3
+
+    def run_tasks(self, submit):
+        futures = [submit(work, self.task_size) for _ in range(self.n_tasks)]
+        wait(futures)
+        assert all(f.exception() is None for f in futures)
+
+    def test_scaling(self):
+        cpus = os.cpu_count()
+        for workers in self.workers:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                self.measure("threads",
+                             lambda: self.run_tasks(executor.submit),
+                             workers=workers, cpus=cpus)
+            pool = ProcessPool(max_workers=workers)
+            try:
+                # measure the reused (warm) workers, not their start-up
+                pool.warm_up()
+                self.measure("processes",
+                             lambda: self.run_tasks(pool.submit),
+                             workers=workers, cpus=cpus)
+            finally:
+                pool.shutdown()
+
+    def test_start_up(self):
+        def start():
+            pool = ProcessPool(max_workers=2)
+            pool.warm_up()
+            pool.shutdown()
+
+        self.measure("warm_up", start, workers=2)
+
+
+@unittest.skipUnless(SHARED_MEMORY_SUPPORTED, "shared memory is not supported")
+class BenchSharedArrays(Benchmark):
+    """Transfer 100 MB and 1 GB arrays from a worker process"""
+    sizes = (100 * 2 ** 20, 2 ** 30)
+    number = 1
+    repeat = 2
+
+    def setUp(self):
+        self.pool = ProcessPool(max_workers=1)
+        self.pool.warm_up()
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_transfer(self):
+        for size in self.sizes:
+            mb = size // 2 ** 20
+            for name, submit in (("pickled", self.pool.submit),
+                                 ("shared", self.pool.submit_shared)):
+                def transfer():
+                    return submit(np.ones, size, np.uint8).result()
+
+                self.measure(name, transfer, mb=mb)
+                self.measure_memory(name + "_memory", transfer, mb=mb)
+
+
+class BenchFutureSetWatcher(Benchmark, GuiTest):
+    """Latency of the event loop while watching 50000 short tasks"""
+    n_tasks = 50000
+    #: Interval (in ms) of the timer whose delays are measured
+    tick = 5
+
+    def watch(self, batched):
+        executor = ThreadPoolExecutor(max_workers=4)
+        futures = [executor.submit(time.sleep, 1e-4)
+                   for _ in range(self.n_tasks)]
+        watcher = FutureSetWatcher()
+        if batched:
+            watcher.setBatchMode()
+        else:
+            watcher.resultReadyAt.connect(lambda i, result: None)
+        watcher.setFutures(futures)
+
+        loop = QEventLoop()
+        delays = []
+        last = [time.perf_counter()]
+
+        def on_tick():
+            now = time.perf_counter()
+            delays.append(now - last[0] - self.tick / 1000)
+            last[0] = now
+
+        timer = QTimer(interval=self.tick)
+        timer.timeout.connect(on_tick)
+        watcher.doneAll.connect(loop.quit)
+        start = time.perf_counter()
+        timer.start()
+        loop.exec()
+        total = time.perf_counter() - start
+        timer.stop()
+        executor.shutdown()
+        watcher.deleteLater()
+        return total, delays
+
+    def test_latency(self):
+        for name, batched in (("per_future", False), ("batched", True)):
+            total, delays = self.watch(batched)
+            self.record(name, dict(tasks=self.n_tasks), time=total,
+                        max_latency=max(delays, default=0.),
+                        mean_latency=sum(delays) / max(len(delays), 1),
+                        ticks=len(delays))
@@ -0,0 +1,55 @@
+import pickle
+
+import numpy as np
+
+from orangewidget.settings import (
+    ContextHandler, ContextSetting, Context, PICKLE_PROTOCOL
+)
+from benchmark.base import Benchmark
+
+
+def values():
+    rng = np.random.RandomState(0)
+    # a selection with a few long runs and some scattered indices
+    selection = set(range(10000, 150000)) | set(range(200000, 300000)) \
+        | set(rng.randint(0, 500000, 20000).tolist())
+    return dict(
+        selection=selection,
+        order=list(range(100000)),
+        attributes=[("attribute{}".format(i), 2) for i in range(50000)],
+        weights=rng.rand(100000),
+    )
+
+
+class BenchContextEncoding(Benchmark):
+    number = 3
+    repeat = 3
+
+    @classmethod
+    def setUpClass(cls):
+        cls.values = values()
+
+    def context(self, compress):
+        handler = ContextHandler()
+        context = Context()
+        for name, value in self.values.items():
+            setting = ContextSetting(None, compress=compress)
+            setting.name = name
+            context.values[name] = \
+                handler.encode_setting(context, setting, value)
+        return handler, context
+
+    def test_encoding(self):
+        for name, compress in (("plain", False), ("compressed", True)):
+            handler, context = self.context(compress)
+            pickled = pickle.dumps(context, protocol=PICKLE_PROTOCOL)
+            print("{}.{}: {:.1f} kB".format(
+                type(self).__name__, name, len(pickled) / 1024))
+
+            def load():
+                context = pickle.loads(pickled)
+                for value in context.values.values():
+                    handler.decode_setting(None, value)
+
+            self.measure(name + "_load_decode", load)
+            self.measure(name + "_encode", lambda: self.context(compress))
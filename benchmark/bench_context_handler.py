@@ -0,0 +1,64 @@
+from copy import copy
+
+from orangewidget.settings import Context, ContextHandler
+from benchmark.base import Benchmark
+
+
+class Widget:
+    def __init__(self):
+        self.context_settings = []
+        self.current_context = None
+
+
+class DescriptionContextHandler(ContextHandler):
+    """Match contexts by descriptions of variables, like domain contexts"""
+    MAX_SAVED_CONTEXTS = 10000
+
+    def new_context(self, description):
+        return Context(description=description)
+
+    def match(self, context, description):
+        if context.description == description:
+            return self.PERFECT_MATCH
+        common = len(set(context.description) & set(description))
+        return common > len(description) // 2 and self.MATCH
+
+    def clone_context(self, old_context, description):
+        return copy(old_context)
+
+
+class IndexedContextHandler(DescriptionContextHandler):
+    def fingerprint(self, description):
+        return description
+
+    def context_fingerprint(self, context):
+        return context.description
+
+
+def description(i):
+    return tuple("{}-{}".format(i, j) for j in range(20))
+
+
+class BenchFindContext(Benchmark):
+    def _bench(self, handler, name):
+        for n in (10, 100, 1000):
+            widget = Widget()
+            widget.context_settings = \
+                [handler.new_context(description(i)) for i in range(n)]
+            handler.global_contexts = \
+                [handler.new_context(description(i)) for i in range(n)]
+
+            # Reopen contexts in turn, starting with the oldest, as widgets
+            # do when data changes. The found context moves to the top.
+            descs = [description(i) for i in reversed(range(n))]
+            descs = iter(descs * (1 + 1000 // n))
+
+            def run():
+                handler.find_or_create_context(widget, next(descs))
+            self.measure("{}[{}]".format(name, n), run, number=50)
+
+    def test_linear(self):
+        self._bench(DescriptionContextHandler(), "linear")
+
+    def test_indexed(self):
+        self._bench(IndexedContextHandler(), "indexed")
@@ -0,0 +1,181 @@
+import itertools
+
+from orangewidget.gui import OWComponent
+from orangewidget.settings import (
+    ContextHandler, ContextSetting, Context, Setting, SettingProvider,
+    _apply_setting
+)
+from benchmark.base import Benchmark
+
+
+def recursive_traverse(provider, data=None, instance=None):
+    """Traverse settings like SettingProvider did before plans"""
+    data = data if data is not None else {}
+    for setting in provider.settings.values():
+        yield setting, data, instance
+    for sub_provider in provider.providers.values():
+        yield from recursive_traverse(
+            sub_provider, data.get(sub_provider.name, {}),
+            getattr(instance, sub_provider.name, None))
+
+
+def recursive_pack(provider, instance, packer=None):
+    """Pack settings like SettingProvider did before plans"""
+    packer = packer or provider._default_packer
+    packed_settings = dict(itertools.chain(
+        *(packer(setting, instance)
+          for setting in provider.settings.values())))
+    packed_settings.update({
+        name: recursive_pack(sub_provider, getattr(instance, name), packer)
+        for name, sub_provider in provider.providers.items()
+        if hasattr(instance, name)
+    })
+    return packed_settings
+
+
+def recursive_unpack(provider, instance, data):
+    for setting, data_, inst in recursive_traverse(provider, data, instance):
+        if setting.name in data_ and inst is not None:
+            _apply_setting(setting, inst, data_[setting.name])
+
+
+def with_settings(n_settings, n_context_settings):
+    def add_settings(cls):
+        for i in range(n_settings):
+            setattr(cls, "setting{}".format(i), Setting(i))
+        for i in range(n_context_settings):
+            setattr(cls, "context_setting{}".format(i), ContextSetting([i]))
+        return cls
+    return add_settings
+
+
+@with_settings(n_settings=10, n_context_settings=5)
+class Axis(OWComponent):
+    pass
+
+
+@with_settings(n_settings=10, n_context_settings=5)
+class Graph(OWComponent):
+    x_axis = SettingProvider(Axis)
+    y_axis = SettingProvider(Axis)
+
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.x_axis = Axis(widget)
+        self.y_axis = Axis(widget)
+
+
+class Handler(ContextHandler):
+    def read_defaults(self):
+        pass
+
+    def new_context(self, *args):
+        return Context()
+
+    def match(self, context, *args):
+        return self.PERFECT_MATCH
+
+
+@with_settings(n_settings=10, n_context_settings=5)
+class Widget(OWComponent):
+    settingsHandler = None
+    graph = SettingProvider(Graph)
+    graph2 = SettingProvider(Graph)
+
+    def __init__(self):
+        self.settingsHandler = Handler.create(Widget, template=Handler())
+        self.settingsHandler.initialize(self)
+        super().__init__(self)
+        self.graph = Graph(self)
+        self.graph2 = Graph(self)
+
+    def storeSpecificSettings(self):
+        pass
+
+    def retrieveSpecificSettings(self):
+        pass
+
+
+class BenchSettingProvider(Benchmark):
+    number = 1000
+
+    def setUp(self):
+        self.widget = Widget()
+        self.handler = self.widget.settingsHandler
+        self.provider = self.handler.provider
+        self.packed = self.provider.pack(self.widget)
+
+    def test_pack(self):
+        # assign to all settings to avoid reusing cached packs
+        def touch():
+            for setting, _, instance in self.provider.traverse_settings(
+                    instance=self.widget):
+                setattr(instance, setting.name, getattr(instance, setting.name))
+
+        self.measure("pack_recursive", lambda: (
+            touch(), recursive_pack(self.provider, self.widget)))
+        self.measure("pack_plan", lambda: (
+            touch(), self.provider.pack(self.widget)))
+
+    def test_pack_incremental(self):
+        # unchanged settings reuse values packed before
+        widget = self.widget
+
+        def assign_one():
+            widget.graph.x_axis.setting0 = widget.graph.x_axis.setting0
+
+        self.measure("pack_unchanged", lambda: self.provider.pack(widget))
+        self.measure("pack_one_assigned", lambda: (
+            assign_one(), self.provider.pack(widget)))
+
+    def test_unpack(self):
+        self.measure("unpack_recursive", lambda: recursive_unpack(
+            self.provider, self.widget, self.packed))
+        self.measure("unpack_plan", lambda: self.provider.unpack(
+            self.widget, self.packed))
+
+    def test_reset(self):
+        def recursive_reset():
+            for setting, _, inst in recursive_traverse(
+                    self.provider, instance=self.widget):
+                if setting.packable:
+                    _apply_setting(setting, inst, setting.default)
+
+        self.measure("reset_recursive", recursive_reset)
+        self.measure("reset_plan",
+                     lambda: self.handler.reset_settings(self.widget))
+
+    def test_context(self):
+        widget, handler = self.widget, self.handler
+
+        def to_from_widget_recursive():
+            # ContextHandler.settings_to_widget and settings_from_widget
+            # before plans
+            context = widget.current_context
+            widget.retrieveSpecificSettings()
+            for setting, data, instance in recursive_traverse(
+                    self.provider, context.values, widget):
+                if not isinstance(setting, ContextSetting) \
+                        or setting.name not in data:
+                    continue
+                value = handler.decode_setting(setting, data[setting.name])
+                _apply_setting(setting, instance, value)
+
+            widget.storeSpecificSettings()
+
+            def packer(setting, instance):
+                if isinstance(setting, ContextSetting) \
+                        and hasattr(instance, setting.name):
+                    value = getattr(instance, setting.name)
+                    yield setting.name, \
+                        handler.encode_setting(context, setting, value)
+
+            context.values = recursive_pack(self.provider, widget, packer)
+
+        def to_from_widget():
+            handler.settings_to_widget(widget)
+            handler.settings_from_widget(widget)
+
+        handler.open_context(widget)
+        self.measure("context_recursive", to_from_widget_recursive)
+        self.measure("context_plan", to_from_widget)
@@ -0,0 +1,119 @@
+"""
+Benchmarks of settings handlers on synthetic widgets with growing numbers
+of settings, setting providers and stored contexts.
+
+Measurements are stored with parameters `settings` (number of settings in
+each component), `providers` (number of components with settings) and
+`contexts` (number of stored contexts), so results for different sizes
+can be compared; see `python -m benchmark --help`.
+"""
+import io
+from types import SimpleNamespace
+
+from orangewidget.gui import OWComponent
+from orangewidget.settings import (
+    Context, ContextHandler, ContextSetting, Setting, SettingProvider
+)
+from benchmark.base import Benchmark
+
+#: (settings, providers, contexts)
+SIZES = [(10, 1, 10), (50, 5, 50), (200, 10, 200)]
+
+
+class Handler(ContextHandler):
+    """Match contexts by a key, without reading or writing any files"""
+    MAX_SAVED_CONTEXTS = 10000
+
+    def read_defaults(self):
+        pass
+
+    def write_defaults(self):
+        # serialize as usual, but do not write
+        self.write_defaults_file(io.BytesIO())
+
+    def new_context(self, key):
+        return Context(key=key)
+
+    def match(self, context, key):
+        return self.PERFECT_MATCH if context.key == key else self.NO_MATCH
+
+
+def component_class(name, n_settings):
+    attrs = {"setting{}".format(i): Setting(i) for i in range(n_settings)}
+    attrs.update({"context_setting{}".format(i): ContextSetting([i, str(i)])
+                  for i in range(n_settings // 2)})
+    return type(name, (OWComponent, ), attrs)
+
+
+def widget_class(n_settings, n_providers):
+    component = component_class("Component", n_settings)
+    attrs = {"component{}".format(i): SettingProvider(component)
+             for i in range(n_providers - 1)}
+
+    def __init__(self):
+        self.settingsAboutToBePacked = SimpleNamespace(emit=lambda: None)
+        self.settingsHandler.initialize(self)
+        OWComponent.__init__(self, self)
+        for i in range(n_providers - 1):
+            setattr(self, "component{}".format(i), component(self))
+
+    attrs.update(
+        __init__=__init__,
+        settings_version=1,
+        migrate_settings=classmethod(lambda cls, settings, version: None),
+        migrate_context=classmethod(lambda cls, context, version: None),
+        storeSpecificSettings=lambda self: None,
+        retrieveSpecificSettings=lambda self: None)
+    cls = type("Widget", (component_class("Base", n_settings), ), attrs)
+    cls.settingsHandler = Handler.create(cls, template=Handler())
+    return cls
+
+
+class BenchSettingsHandler(Benchmark):
+    number = 3
+    repeat = 3
+
+    def test_settings_handler(self):
+        for n_settings, n_providers, n_contexts in SIZES:
+            self._bench(n_settings, n_providers, n_contexts)
+
+    def _bench(self, n_settings, n_providers, n_contexts):
+        params = dict(settings=n_settings, providers=n_providers,
+                      contexts=n_contexts)
+        cls = widget_class(n_settings, n_providers)
+        handler = cls.settingsHandler
+        widget = cls()
+        for i in range(n_contexts):
+            handler.open_context(widget, i)
+        handler.close_context(widget)
+        handler.update_defaults(widget)
+        assert len(handler.global_contexts) == n_contexts
+        packed = handler.pack_data(widget)
+
+        self.measure("initialize", lambda: handler.initialize(widget, packed),
+                     **params)
+        self.measure("pack_data", lambda: handler.pack_data(widget), **params)
+        self.measure("update_defaults",
+                     lambda: handler.update_defaults(widget), **params)
+
+        buffer = io.BytesIO()
+        handler.write_defaults_file(buffer)
+        data = buffer.getvalue()
+        self.measure("read_defaults_file",
+                     lambda: handler.read_defaults_file(io.BytesIO(data)),
+                     **params)
+
+        # open the oldest (last) context, so the search covers all contexts
+        def open_close():
+            handler.open_context(widget, 0)
+            handler.close_context(widget)
+
+        widget.context_settings = []
+        self.measure("open_close_context", open_close, **params)
+
+        handler.open_context(widget, 0)
+        self.measure("settings_to_widget",
+                     lambda: handler.settings_to_widget(widget), **params)
+        self.measure("settings_from_widget",
+                     lambda: handler.settings_from_widget(widget), **params)
+        handler.close_context(widget)
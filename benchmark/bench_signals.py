@@ -0,0 +1,341 @@
+from unittest.mock import patch
+
+from AnyQt.QtWidgets import QApplication
+
+from orangecanvas.registry import WidgetDescription
+from orangecanvas.scheme import SchemeNode, SchemeLink
+from orangecanvas.scheme.signalmanager import Signal
+
+from orangewidget.tests.base import GuiTest
+from orangewidget.utils.signals import (
+    notify_input_helper, summarize, PartialSummary, WidgetSignalsMixin
+)
+from orangewidget.widget import OWBaseWidget, Output, MultiInput
+from orangewidget.workflow import widgetsscheme
+from orangewidget.workflow.utils import index_of
+from orangewidget.workflow.widgetsscheme import WidgetsScheme
+from benchmark.base import Benchmark
+
+
+class Source(OWBaseWidget):
+    name = "Source"
+
+    class Outputs:
+        out = Output("Data", object, auto_summary=False)
+
+
+class Merge(OWBaseWidget):
+    name = "Merge"
+
+    class Inputs:
+        data = MultiInput("Data", object, auto_summary=False)
+
+    def __init__(self):
+        super().__init__()
+        self.data = []
+
+    @Inputs.data
+    def set_data(self, index, data):
+        self.data[index] = data
+
+    @Inputs.data.insert
+    def insert_data(self, index, data):
+        self.data.insert(index, data)
+
+    @Inputs.data.remove
+    def remove_data(self, index):
+        self.data.pop(index)
+
+
+def list_process_signal_input(input, widget, signal, workflow):
+    """process_signal_input_default with signals in a list, as before"""
+    inputs = widget.__dict__.setdefault("__list_inputs", [])
+    link = signal.link
+    index = signal.index
+    value = signal.value
+
+    index_existing = index_of(inputs, signal,
+                              eq=lambda s1, s2: s1.link == s2.link)
+    if index_existing is not None:
+        index = index_existing
+    index_local = index_of(
+        (s.link for s in inputs if s.channel.name == input.name), link)
+    if isinstance(signal, Signal.New):
+        if not 0 <= index < len(inputs):
+            index = len(inputs)
+        inputs.insert(index, signal)
+        index_local = index_of(
+            (s.link for s in inputs if s.channel.name == input.name), link)
+    elif isinstance(signal, Signal.Close):
+        inputs.pop(index)
+        value = input.closing_sentinel
+    else:
+        inputs[index] = signal
+    key = (id(link.source_node), link.source_channel.name, signal.id)
+    notify_input_helper(input, widget, value, key=key, index=index_local)
+
+
+class BenchMultiInput(Benchmark, GuiTest):
+    n_links = 500
+    number = 1
+    repeat = 3
+
+    def setUp(self):
+        super().setUp()
+        self.widget = Merge()
+        sink = SchemeNode(WidgetDescription(**Merge.get_widget_description()))
+        description = WidgetDescription(**Source.get_widget_description())
+        self.links = [
+            SchemeLink(SchemeNode(description), "Data", sink, "Data")
+            for _ in range(self.n_links)]
+
+    def tearDown(self):
+        self.widget.deleteLater()
+        super().tearDown()
+
+    def deliver(self, process, signal_type, links):
+        widget = self.widget
+        input = Merge.Inputs.data
+        for i, link in enumerate(links):
+            process(input, widget, signal_type(link, i, None, index=i), None)
+
+    def reset(self):
+        for name in ("__list_inputs", "_OWBaseWidget__process_signal_input",
+                     "_WidgetSignalsMixin__input_state"):
+            self.widget.__dict__.pop(name, None)
+        self.widget.data = []
+
+    def test_multi_input(self):
+        for name, process in (
+                ("list", list_process_signal_input),
+                ("indexed", widgetsscheme.process_signal_input_default)):
+            # workflow loading: links are appended one by one
+            self.measure("{}_new".format(name), lambda: (
+                self.reset(),
+                self.deliver(process, Signal.New, self.links)),
+                links=self.n_links)
+            self.measure("{}_update".format(name), lambda: self.deliver(
+                process, Signal.Update, self.links), links=self.n_links)
+            self.assertEqual(self.widget.data, list(range(self.n_links)))
+            # remove links from the front
+            self.measure("{}_close".format(name), lambda: (
+                self.reset(),
+                self.deliver(process, Signal.New, self.links),
+                self.deliver(process, Signal.Close, self.links)),
+                links=self.n_links)
+            self.assertEqual(self.widget.data, [])
+
+    def test_bookkeeping(self):
+        # exclude the widget's own (MultiInput) bookkeeping
+        for name, process in (
+                ("list", list_process_signal_input),
+                ("indexed", widgetsscheme.process_signal_input_default)):
+            with patch.object(widgetsscheme, "notify_input_helper"), \
+                    patch(__name__ + ".notify_input_helper"):
+                self.measure("{}_bookkeeping".format(name), lambda: (
+                    self.reset(),
+                    self.deliver(process, Signal.New, self.links),
+                    self.deliver(process, Signal.Update, self.links),
+                    self.deliver(process, Signal.Close, self.links)),
+                    links=self.n_links)
+
+
+class BenchSendToNode(Benchmark, GuiTest):
+    """Order signals for delivery in a scheme with 1000 links"""
+    n_sources = 500
+    n_sinks = 100
+    links_per_source = 2
+    number = 1
+    repeat = 3
+
+    def setUp(self):
+        super().setUp()
+        self.scheme = scheme = WidgetsScheme()
+        source = WidgetDescription(**Source.get_widget_description())
+        merge = WidgetDescription(**Merge.get_widget_description())
+        sinks = [scheme.new_node(merge) for _ in range(self.n_sinks)]
+        for i in range(self.n_sources):
+            node = scheme.new_node(source)
+            for j in range(self.links_per_source):
+                scheme.new_link(node, "Data", sinks[(i + j) % len(sinks)],
+                                "Data")
+        self.signals = {
+            sink: [Signal.Update(link, None)
+                   for link in reversed(scheme.find_links(sink_node=sink))]
+            for sink in sinks}
+        # only measure finding the widget and ordering the signals
+        scheme.signal_manager.process_signals_for_widget = \
+            lambda node, widget, signals: None
+
+    def tearDown(self):
+        self.scheme.clear()
+        super().tearDown()
+
+    def test_send_to_node(self):
+        scheme, manager = self.scheme, self.scheme.signal_manager
+        n_links = len(scheme.links)
+
+        def uncached(node, signals):
+            # WidgetsSignalManager.send_to_node, as before caching links
+            scheme.widget_for_node(node)
+            _order = {
+                l: i for i, l in enumerate(scheme.find_links(sink_node=node))
+            }
+            return sorted(signals, key=lambda s: _order.get(s.link, -1))
+
+        def propagate(send_to_node):
+            for node, signals in self.signals.items():
+                send_to_node(node, signals)
+
+        self.measure("send_to_node_uncached", lambda: propagate(uncached),
+                     links=n_links)
+        self.measure("send_to_node", lambda: propagate(manager.send_to_node),
+                     links=n_links)
+
+
+class Data(str):
+    pass
+
+
+@summarize.register(Data)
+def summarize_data(data):
+    return PartialSummary(data, "Data " + data)
+
+
+class SummarizedMerge(OWBaseWidget):
+    name = "Merge"
+
+    class Inputs:
+        data = MultiInput("Data", Data)
+
+    @Inputs.data
+    def set_data(self, index, data):
+        pass
+
+    @Inputs.data.insert
+    def insert_data(self, index, data):
+        pass
+
+    @Inputs.data.remove
+    def remove_data(self, index):
+        pass
+
+
+class BenchSummaries(Benchmark, GuiTest):
+    """Connect many inputs with summaries, as when loading a workflow"""
+    n_links = 300
+    number = 1
+    repeat = 3
+
+    def setUp(self):
+        super().setUp()
+        sink = SchemeNode(
+            WidgetDescription(**SummarizedMerge.get_widget_description()))
+        description = WidgetDescription(**Source.get_widget_description())
+        self.signals = [
+            Signal.New(SchemeLink(SchemeNode(description), "Data",
+                                  sink, "Data"),
+                       Data(i), None, index=i)
+            for i in range(self.n_links)]
+
+    def load(self):
+        widget = SummarizedMerge()
+        widgetsscheme.process_signals_for_widget(widget, self.signals, None)
+        QApplication.processEvents()
+        assert len(widget.input_summaries["Data"]) == self.n_links
+        widget.deleteLater()
+
+    def test_load(self):
+        def update_immediately(widget, summaries):
+            widget._update_summary(summaries)
+
+        with patch.object(WidgetSignalsMixin,
+                          "_WidgetSignalsMixin__schedule_summary_update",
+                          update_immediately):
+            self.measure("load_immediate", self.load, links=self.n_links)
+        self.measure("load_deferred", self.load, links=self.n_links)
+
+
+class Words(OWBaseWidget):
+    """A widget that recomputes its output whenever the inputs change"""
+    name = "Words"
+
+    class Inputs:
+        data = MultiInput("Data", Data)
+
+    def __init__(self):
+        super().__init__()
+        self.data = []
+        self.words = []
+
+    def _update_words(self):
+        self.words = sorted(set(" ".join(self.data).split()))
+
+    @Inputs.data
+    def set_data(self, index, data):
+        self.data[index] = data
+        self._update_words()
+
+    @Inputs.data.insert
+    def insert_data(self, index, data):
+        self.data.insert(index, data)
+        self._update_words()
+
+    @Inputs.data.remove
+    def remove_data(self, index):
+        self.data.pop(index)
+        self._update_words()
+
+
+class BulkWords(Words):
+    class Inputs:
+        data = MultiInput("Data", Data)
+
+    set_data = Inputs.data(Words.set_data)
+    insert_data = Inputs.data.insert(Words.insert_data)
+    remove_data = Inputs.data.remove(Words.remove_data)
+
+    @Inputs.data.bulk
+    def update_data(self, changes):
+        for kind, index, data in changes:
+            if kind == "insert":
+                self.data.insert(index, data)
+            elif kind == "set":
+                self.data[index] = data
+            else:
+                self.data.pop(index)
+        self._update_words()
+
+
+class BenchBulkInput(Benchmark, GuiTest):
+    """Load a widget with 200 inputs with per-link and bulk handlers"""
+    n_links = 200
+    number = 1
+    repeat = 3
+
+    def signals(self, widget_class):
+        sink = SchemeNode(
+            WidgetDescription(**widget_class.get_widget_description()))
+        description = WidgetDescription(**Source.get_widget_description())
+        return [
+            Signal.New(SchemeLink(SchemeNode(description), "Data",
+                                  sink, "Data"),
+                       Data(" ".join(map(str, range(i, i + 100)))),
+                       None, index=i)
+            for i in range(self.n_links)]
+
+    def load(self, widget_class, signals):
+        widget = widget_class()
+        widgetsscheme.process_signals_for_widget(widget, signals, None)
+        QApplication.processEvents()
+        assert len(widget.data) == self.n_links
+        assert len(widget.input_summaries["Data"]) == self.n_links
+        widget.deleteLater()
+
+    def test_load(self):
+        for name, widget_class in (("per_link", Words),
+                                   ("bulk", BulkWords)):
+            signals = self.signals(widget_class)
+            self.measure("load_" + name,
+                         lambda: self.load(widget_class, signals),
+                         links=self.n_links)
@@ -0,0 +1,66 @@
+import copy
+from unittest.mock import patch
+
+from orangecanvas.registry import WidgetDescription
+
+from orangewidget.settings import (
+    ContextHandler, ContextSetting, Context, CopyOnWriteDict
+)
+from orangewidget.tests.base import GuiTest
+from orangewidget.widget import OWBaseWidget
+from orangewidget.workflow.widgetsscheme import WidgetsScheme
+from benchmark.base import Benchmark
+
+
+class NamesContextHandler(ContextHandler):
+    def new_context(self, names):
+        return Context(names=names)
+
+    def match(self, context, names):
+        return (context.names == names) * self.PERFECT_MATCH
+
+
+class ContextWidget(OWBaseWidget):
+    name = "Context widget"
+    selection = ContextSetting([])
+    settingsHandler = NamesContextHandler()
+
+    def set_names(self, names):
+        self.closeContext()
+        self.openContext(names)
+
+
+def stored_settings(n_contexts, n_names):
+    return dict(context_settings=[
+        Context(names={"{}-{}".format(i, j): 2 for j in range(n_names)},
+                values=dict(selection=list(range(n_names)), __version__=1))
+        for i in range(n_contexts)
+    ])
+
+
+class BenchLoadWorkflow(Benchmark, GuiTest):
+    n_nodes = 20
+    n_contexts = 50
+    n_names = 1000
+
+    def load_workflow(self, properties):
+        model = WidgetsScheme()
+        description = WidgetDescription(
+            **ContextWidget.get_widget_description())
+        for _ in range(self.n_nodes):
+            node = model.new_node(description, properties=properties)
+            widget = model.widget_for_node(node)
+            # use one of the stored contexts
+            widget.set_names(properties["context_settings"][1].names)
+        return model
+
+    def test_load_workflow(self):
+        properties = stored_settings(self.n_contexts, self.n_names)
+        for name, stored in (("deepcopy", copy.deepcopy),
+                             ("copy_on_write", CopyOnWriteDict)):
+            with patch("orangewidget.workflow.widgetsscheme.CopyOnWriteDict",
+                       stored):
+                self.measure_memory(
+                    name, lambda: self.load_workflow(properties))
+                self.measure(name, lambda: self.load_workflow(properties),
+                             number=1, repeat=3)
@@ -109,6 +109,12 @@ def resource_filename(path):
     return pkg_resources.resource_filename(__name__, path)
 
 
+# Key in `OWComponent.__dict__` under which `SettingProvider.pack` caches
+# packed setting values; `OWComponent.__setattr__` marks a setting as changed
+# by removing it from the cache
+_PACKED_SETTINGS_KEY = "_OWComponent__packed_settings"
+
+
 class OWComponent:
     """
     Mixin for classes that contain settings and/or attributes that trigger
@@ -181,6 +187,9 @@ class OWComponent:
             setattr(sub, rest, value)
         else:
             super().__setattr__(name, value)
+            packed = self.__dict__.get(_PACKED_SETTINGS_KEY)
+            if packed is not None:
+                packed.pop(name, None)
             # First check that the widget is not just being constructed
             if hasattr(self, "controlled_attributes"):
                 for callback in self.controlled_attributes.get(name, ()):
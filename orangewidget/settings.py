@@ -30,24 +30,42 @@ so they can be used alter. It should be called before widget starts modifying
 """
 
 import sys
+import atexit
 import copy
+import io
 import itertools
 import os
 import logging
 import pickle
 import pprint
+import sqlite3
+import tempfile
+import threading
+import time
 import warnings
+import zlib
 from operator import itemgetter
-from typing import Any, Optional, Tuple
+from collections import OrderedDict, namedtuple
+from collections.abc import ItemsView, ValuesView
+from typing import Any, Optional, Tuple, Dict, Callable, List
+from weakref import WeakKeyDictionary
 
-from orangewidget.gui import OWComponent
+import numpy as np
+
+from orangewidget.gui import OWComponent, _PACKED_SETTINGS_KEY
 
 log = logging.getLogger(__name__)
 
 __all__ = [
     "Setting", "SettingsHandler", "SettingProvider",
     "ContextSetting", "Context", "ContextHandler", "IncompatibleContext",
-    "SettingsPrinter", "rename_setting", "widget_settings_dir"
+    "SettingsPrinter", "rename_setting", "widget_settings_dir",
+    "SettingsWriter", "set_settings_writer", "settings_writer",
+    "SettingsStore", "set_settings_store", "settings_store",
+    "CopyOnWriteDict", "CopyOnWriteList",
+    "MigrationStatistics", "migration_statistics", "clear_migration_cache",
+    "ContextEviction", "LRUContextEviction", "LFUContextEviction",
+    "SizeContextEviction", "CompressedValue"
 ]
 
 _IMMUTABLES = (str, int, bytes, bool, float, tuple)
@@ -129,6 +147,331 @@ def widget_settings_dir(versioned=True) -> str:
             return os.path.join(base, "widgets")
 
 
+class SettingsWriter:
+    """
+    Write files with widgets' default settings in a background thread.
+
+    Writes are queued and coalesced: if a file is queued again before it is
+    written, only the latest content is written. Each file is first written
+    to a temporary file in the same directory, which then replaces the
+    target, so readers never see partially written files.
+    """
+    def __init__(self):
+        # (write function, target) -> data
+        self.__pending = {}  # type: Dict[Tuple[Optional[Callable], str], bytes]
+        self.__writing = False
+        self.__condition = threading.Condition()
+        self.__thread = None  # type: Optional[threading.Thread]
+        #: Number of written files
+        self.written = 0
+        #: Number of writes that were superseded before they were written
+        self.coalesced = 0
+
+    def write(self, target: str, data: bytes,
+              write: Optional[Callable[[str, bytes], bool]] = None) -> None:
+        """
+        Queue writing `data` to `target`.
+
+        `target` is a file name, unless a function `write(target, data)` that
+        writes the data and returns `True` on success (e.g.
+        :obj:`SettingsStore.write`) is given.
+        """
+        key = (write, target)
+        with self.__condition:
+            if self.__pending.pop(key, None) is not None:
+                self.coalesced += 1
+            self.__pending[key] = data
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__run, name="SettingsWriter", daemon=True)
+                self.__thread.start()
+            self.__condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all queued files are written.
+
+        Return `False` if the `timeout` (in seconds) expired before that.
+        """
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: not self.__pending and not self.__writing, timeout)
+
+    def __run(self):
+        condition = self.__condition
+        while True:
+            with condition:
+                condition.wait_for(lambda: self.__pending)
+                key = next(iter(self.__pending))
+                data = self.__pending.pop(key)
+                self.__writing = True
+            write, target = key
+            written = False
+            try:
+                written = (write or self._write_file)(target, data)
+            except Exception:  # pylint: disable=broad-except
+                # the thread must keep running, or flush would never return
+                log.exception("Could not write default settings to %s.",
+                              target)
+            finally:
+                with condition:
+                    self.__writing = False
+                    self.written += written
+                    condition.notify_all()
+
+    @staticmethod
+    def _write_file(filename: str, data: bytes) -> bool:
+        dirname, basename = os.path.split(filename)
+        try:
+            os.makedirs(dirname, exist_ok=True)
+            fd, tmpname = tempfile.mkstemp(
+                prefix=basename + ".", suffix=".tmp", dir=dirname)
+        except OSError as ex:
+            log.error("Could not write default settings to %s (%s).",
+                      filename, ex)
+            return False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmpname, filename)
+        except Exception as ex:  # pylint: disable=broad-except
+            log.error("Could not write default settings to %s (%s).",
+                      filename, ex)
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+            return False
+        return True
+
+
+__SETTINGS_WRITER = None  # type: Optional[SettingsWriter]
+
+#: Time (in seconds) to wait for pending writes at interpreter exit
+SETTINGS_WRITER_EXIT_TIMEOUT = 10
+
+
+def set_settings_writer(writer: Optional[SettingsWriter]) -> None:
+    """
+    Set the writer used by `SettingsHandler.write_defaults`.
+
+    If `None` (default), defaults are written synchronously. A previously set
+    writer is flushed. The writer is also flushed at interpreter exit, for at
+    most `SETTINGS_WRITER_EXIT_TIMEOUT` seconds.
+
+    See Also
+    --------
+    settings_writer
+    """
+    global __SETTINGS_WRITER
+    if __SETTINGS_WRITER is not None:
+        atexit.unregister(__SETTINGS_WRITER.flush)
+        __SETTINGS_WRITER.flush()
+    __SETTINGS_WRITER = writer
+    if writer is not None:
+        atexit.register(writer.flush, SETTINGS_WRITER_EXIT_TIMEOUT)
+
+
+def settings_writer() -> Optional[SettingsWriter]:
+    """
+    Return the writer used by `SettingsHandler.write_defaults`, if any.
+
+    See Also
+    --------
+    set_settings_writer
+    """
+    return __SETTINGS_WRITER
+
+
+class SettingsStore:
+    """
+    A store of all widgets' default settings in a single sqlite database.
+
+    This is an alternative to storing the defaults of each widget class in a
+    separate pickle file. The defaults of a class are read when they are
+    needed, by the key `"{module}.{qualname}"`. Sqlite's locking makes
+    concurrent access from multiple processes safe.
+
+    When the store is first opened, the existing per-class pickle files in
+    `legacy_dir` are imported into the database (once).
+
+    Parameters
+    ----------
+    filename : Optional[str]
+        the database file; defaults to `widget-settings.sqlite` in
+        :obj:`widget_settings_dir`
+    legacy_dir : Optional[str]
+        the directory with per-class pickle files to import; defaults to
+        :obj:`widget_settings_dir` if `filename` is not given
+    """
+    #: Seconds to wait for a lock held by another process
+    timeout = 30
+
+    def __init__(self, filename: Optional[str] = None,
+                 legacy_dir: Optional[str] = None):
+        if filename is None:
+            filename = os.path.join(widget_settings_dir(),
+                                    "widget-settings.sqlite")
+            if legacy_dir is None:
+                legacy_dir = widget_settings_dir()
+        self.filename = filename
+        self.legacy_dir = legacy_dir
+        self.__lock = threading.RLock()
+        self.__connection = None  # type: Optional[sqlite3.Connection]
+        self.__discard_writes = False
+
+    def __connect(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            dirname = os.path.dirname(self.filename)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            # Autocommit mode; transactions are started explicitly
+            connection = sqlite3.connect(
+                self.filename, timeout=self.timeout,
+                isolation_level=None, check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS defaults "
+                "(key TEXT PRIMARY KEY, data BLOB NOT NULL)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta "
+                "(key TEXT PRIMARY KEY, value TEXT)")
+            self.__import_legacy(connection)
+            self.__connection = connection
+        return self.__connection
+
+    def __import_legacy(self, connection):
+        # Lock the database, so only one process imports the files
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            imported = connection.execute(
+                "SELECT value FROM meta WHERE key = 'imported'").fetchone()
+            if imported is None:
+                for key, data in self.__legacy_files():
+                    connection.execute(
+                        "INSERT OR IGNORE INTO defaults VALUES (?, ?)",
+                        (key, data))
+                connection.execute(
+                    "INSERT INTO meta VALUES ('imported', '1')")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+
+    def __legacy_files(self):
+        dirname = self.legacy_dir
+        if not dirname or not os.path.isdir(dirname):
+            return
+        for name in sorted(os.listdir(dirname)):
+            base, ext = os.path.splitext(name)
+            if ext != ".pickle":
+                continue
+            try:
+                with open(os.path.join(dirname, name), "rb") as f:
+                    data = f.read()
+            except OSError as ex:
+                log.error("Could not import settings from %s (%s).", name, ex)
+            else:
+                yield base, data
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Return the stored defaults for `key` or `None` if there are none."""
+        with self.__lock:
+            try:
+                row = self.__connect().execute(
+                    "SELECT data FROM defaults WHERE key = ?", (key,)
+                ).fetchone()
+            except (sqlite3.Error, OSError) as ex:
+                log.error("Could not read default settings for %s (%s).",
+                          key, ex)
+                return None
+        return None if row is None else bytes(row[0])
+
+    def write(self, key: str, data: bytes) -> bool:
+        """Store the defaults for `key`; return `True` on success."""
+        with self.__lock:
+            if self.__discard_writes:
+                return False
+            try:
+                self.__connect().execute(
+                    "INSERT OR REPLACE INTO defaults VALUES (?, ?)",
+                    (key, data))
+            except (sqlite3.Error, OSError) as ex:
+                log.error("Could not write default settings for %s (%s).",
+                          key, ex)
+                return False
+        return True
+
+    def keys(self) -> List[str]:
+        """Return keys of all stored defaults."""
+        with self.__lock:
+            try:
+                return [key for key, in self.__connect().execute(
+                    "SELECT key FROM defaults ORDER BY key")]
+            except (sqlite3.Error, OSError) as ex:
+                log.error("Could not read default settings (%s).", ex)
+                return []
+
+    def clear(self, discard_writes=False) -> bool:
+        """
+        Remove all stored defaults; return `True` on success.
+
+        If `discard_writes` is set, all subsequent writes are ignored; this
+        is used to reset settings before the application restarts, when
+        widgets would otherwise store their settings as they are closed.
+        """
+        with self.__lock:
+            try:
+                self.__connect().execute("DELETE FROM defaults")
+            except (sqlite3.Error, OSError) as ex:
+                log.error("Could not remove default settings (%s).", ex)
+                return False
+            self.__discard_writes = discard_writes
+        return True
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
+
+
+__SETTINGS_STORE = None  # type: Optional[SettingsStore]
+
+
+def set_settings_store(store: Optional[SettingsStore]) -> None:
+    """
+    Set the store used for reading and writing widgets' default settings.
+
+    If `None` (default), defaults of each widget class are stored in a
+    separate file in :obj:`widget_settings_dir`.
+
+    Note
+    ----
+    This should be set early in the application startup before any
+    `OWBaseWidget` subclasses are imported (because defaults are read at
+    class definition time).
+
+    See Also
+    --------
+    settings_store
+    """
+    global __SETTINGS_STORE
+    __SETTINGS_STORE = store
+
+
+def settings_store() -> Optional[SettingsStore]:
+    """
+    Return the store for widgets' default settings, if any.
+
+    See Also
+    --------
+    set_settings_store
+    """
+    return __SETTINGS_STORE
+
+
 class Setting:
     """Description of a setting.
     """
@@ -204,6 +547,116 @@ def _apply_setting(setting: Setting, instance: OWComponent, value: Any):
     setattr(instance, setting.name, value)
 
 
+class _SettingsPlan:
+    """A flat plan of settings in a tree of setting providers.
+
+    The tree is compiled into a tuple of groups in preorder, one for each
+    provider. A group holds the index of the parent group, the name of the
+    provider's member in the parent's instance and packed data, the provider,
+    and its settings, packable settings and context settings. Instances and
+    data of components are thus resolved with a single `getattr` and `get`
+    per group instead of recursive calls of generators.
+
+    Packing `OWComponent` instances with the default packer reuses the
+    values packed at the previous pack of the instance, except for the
+    settings that were assigned to since then (see `_pack_cached`).
+    """
+    def __init__(self, provider):
+        groups = []
+
+        def add(parent, name, provider):
+            index = len(groups)
+            settings = tuple(provider.settings.values())
+            groups.append((
+                parent, name, provider, settings,
+                tuple(s for s in settings if s.packable),
+                tuple(s for s in settings if isinstance(s, ContextSetting))))
+            for name, child in provider.providers.items():
+                add(index, name, child)
+
+        add(-1, None, provider)
+        self.groups = tuple(groups)
+
+    def _resolve(self, data, instance):
+        # Return a list of (group, data, instance) for all groups
+        resolved = [(self.groups[0], data, instance)]
+        for group in self.groups[1:]:
+            parent, name = group[0], group[1]
+            _, data, instance = resolved[parent]
+            resolved.append((group, data.get(name, {}),
+                             getattr(instance, name, None)))
+        return resolved
+
+    def traverse(self, data, instance, context_only=False):
+        """Yield (setting, data, instance) for each setting (or each context
+        setting, if `context_only` is set); see
+        :obj:`SettingProvider.traverse_settings`."""
+        for group, data_, instance_ in self._resolve(data, instance):
+            for setting in group[5] if context_only else group[3]:
+                yield setting, data_, instance_
+
+    def pack(self, instance, packer=None):
+        """Pack settings; see :obj:`SettingProvider.pack`."""
+        packed, instances = [], []
+        for parent, name, provider, settings, packable, _ in self.groups:
+            if parent >= 0:
+                parent_packed = packed[parent]
+                instance = getattr(instances[parent], name, _MISSING) \
+                    if parent_packed is not None else _MISSING
+                if instance is _MISSING:
+                    packed.append(None)
+                    instances.append(None)
+                    continue
+            if packer is None and isinstance(instance, OWComponent):
+                packed_settings = self._pack_cached(provider, packable,
+                                                    instance)
+            else:
+                packer_ = packer or provider._default_packer
+                packed_settings = dict(itertools.chain(
+                    *(packer_(setting, instance) for setting in settings)))
+            if parent >= 0:
+                parent_packed[name] = packed_settings
+            packed.append(packed_settings)
+            instances.append(instance)
+        return packed[0]
+
+    @staticmethod
+    def _pack_cached(provider, settings, instance):
+        # `OWComponent.__setattr__` removes an assigned setting from the
+        # cache, so only the settings that were (re)assigned since the last
+        # pack are read from the instance. The cache holds the instance's
+        # objects, so values changed in place are packed as they are.
+        cache = instance.__dict__.get(_PACKED_SETTINGS_KEY)
+        if cache is None:
+            cache = instance.__dict__[_PACKED_SETTINGS_KEY] = {}
+        if len(cache) == len(settings):
+            provider.pack_hits += 1
+        else:
+            provider.pack_misses += 1
+            for setting in settings:
+                if setting.name not in cache:
+                    cache.update(provider._default_packer(setting, instance))
+        # callers may modify the packed dict (e.g. `_remove_schema_only`)
+        return dict(cache)
+
+    def unpack(self, instance, data):
+        """Apply packed settings; see :obj:`SettingProvider.unpack`."""
+        for group, data_, instance_ in self._resolve(data, instance):
+            if data_ and instance_ is not None:
+                for setting in group[3]:
+                    if setting.name in data_:
+                        _apply_setting(setting, instance_, data_[setting.name])
+
+    def reset(self, instance):
+        """Reset packable settings to their defaults."""
+        for group, _, instance_ in self._resolve({}, instance):
+            for setting in group[4]:
+                _apply_setting(setting, instance_, setting.default)
+
+
+_MISSING = object()
+
+
 class SettingProvider:
     """A hierarchical structure keeping track of settings belonging to
     a class and child setting providers.
@@ -231,6 +684,11 @@ class SettingProvider:
         self.settings = {}
         """:type: dict[str, Setting]"""
         self.initialization_data = None
+        self._plan = None  # type: Optional[_SettingsPlan]
+        # Number of packs of OWComponent instances that reused all values
+        # packed before (hits) and that had to read some values (misses)
+        self.pack_hits = 0
+        self.pack_misses = 0
 
         for name in dir(provider_class):
             value = getattr(provider_class, name, None)
@@ -335,19 +793,23 @@ class SettingProvider:
             should yield (name, value) pairs that will be added to the
             packed_settings.
         """
-        if packer is None:
-            packer = self._default_packer
-
-        packed_settings = dict(itertools.chain(
-            *(packer(setting, instance) for setting in self.settings.values())
-        ))
-
-        packed_settings.update({
-            name: provider.pack(getattr(instance, name), packer)
-            for name, provider in self.providers.items()
-            if hasattr(instance, name)
-        })
-        return packed_settings
+        return self.plan.pack(instance, packer)
+
+    def pack_statistics(self):
+        """Return the numbers of packs of instances of this and child
+        providers that reused all previously packed values (hits) and that
+        had to read some values because they were assigned to (misses).
+
+        Returns
+        -------
+        (hits, misses) : Tuple[int, int]
+        """
+        hits, misses = self.pack_hits, self.pack_misses
+        for provider in self.providers.values():
+            sub_hits, sub_misses = provider.pack_statistics()
+            hits += sub_hits
+            misses += sub_misses
+        return hits, misses
 
     def unpack(self, instance, data):
         """Restore settings from data to the instance.
@@ -359,9 +821,15 @@ class SettingProvider:
         data : dict
             packed data
         """
-        for setting, _data, inst in self.traverse_settings(data, instance):
-            if setting.name in _data and inst is not None:
-                _apply_setting(setting, inst, _data[setting.name])
+        self.plan.unpack(instance, data)
+
+    @property
+    def plan(self):
+        """A flat plan of settings of this and child providers; it is
+        compiled at first use."""
+        if self._plan is None:
+            self._plan = _SettingsPlan(self)
+        return self._plan
 
     def get_provider(self, provider_class):
         """Return provider for provider_class.
@@ -394,16 +862,160 @@ class SettingProvider:
             instance matching setting_provider
         """
         data = data if data is not None else {}
+        return self.plan.traverse(data, instance)
 
-        for setting in self.settings.values():
-            yield setting, data, instance
 
-        for provider in self.providers.values():
-            data_ = data.get(provider.name, {})
-            instance_ = getattr(instance, provider.name, None)
-            for setting, component_data, component_instance in \
-                    provider.traverse_settings(data_, instance_):
-                yield setting, component_data, component_instance
+MigrationStatistics = namedtuple(
+    "MigrationStatistics", ["migrations", "cache_hits", "time"])
+MigrationStatistics.__doc__ = """
+Statistics of migrations of a widget class's settings and contexts: the
+number of migrations, the number of those that reused cached results, and
+the total time in seconds."""
+
+
+class _MigrationCache:
+    """
+    Memoized results of migrations of outdated settings and contexts.
+
+    Results are keyed by the migration function (and thus the widget class),
+    the version of settings and a cheap identity of the source from which
+    the settings were read: the pickle (bytes) or a description of the
+    file (a tuple with its name, modification time and size), or the stored
+    dict or context that a copy-on-write object was constructed from (by
+    identity; stored settings are replaced, not modified in place).
+    Settings without a source are migrated without caching. Migrations must
+    therefore depend on the content of settings only.
+
+    Results are kept as snapshots that share values with the stored settings
+    that were not accessed by the migration. They are restored copy-on-write
+    into :obj:`CopyOnWriteDict`, and deep-copied otherwise. At most
+    `maxsize` of the least recently used results are kept.
+    """
+    maxsize = 256
+
+    def __init__(self):
+        # key -> (stored source or None, snapshot of migrated object or
+        #         None if context is incompatible)
+        self.results = OrderedDict()
+        # qualified name of widget class -> [migrations, cache hits, time]
+        self.statistics = {}
+
+    def migrate(self, widget_class, migrate, obj, version, source=None):
+        """
+        Call `migrate(obj, version)`, which modifies the dict or context `obj`
+        in place, or restore the result of a migration of the same `source`.
+
+        Errors raised by `migrate` are propagated; `IncompatibleContext` is
+        also raised when restoring a result for an incompatible context.
+        """
+        t0 = time.perf_counter()
+        hit = False
+        try:
+            if source is None \
+                    or version >= getattr(widget_class, "settings_version", 1):
+                migrate(obj, version)
+                return
+            key, stored = self._key(migrate, version, source)
+            entry = self.results.get(key)
+            if entry is not None and entry[0] is stored:
+                hit = True
+                self.results.move_to_end(key)
+                if entry[1] is None:
+                    raise IncompatibleContext
+                self._restore(obj, entry[1])
+                return
+            try:
+                migrate(obj, version)
+            except IncompatibleContext:
+                self._store(key, stored, None)
+                raise
+            try:
+                self._store(key, stored, self._snapshot(obj))
+            except Exception:  # pylint: disable=broad-except
+                pass
+        finally:
+            elapsed = time.perf_counter() - t0
+            name = "{0.__module__}.{0.__qualname__}".format(widget_class)
+            stats = self.statistics.setdefault(name, [0, 0, 0.])
+            stats[0] += 1
+            stats[1] += hit
+            stats[2] += elapsed
+            log.debug("Migrated settings of %s from version %s in %.3f ms%s",
+                      name, version, elapsed * 1000, " (cached)" * hit)
+
+    @staticmethod
+    def _key(migrate, version, source):
+        if isinstance(source, (bytes, tuple)):
+            return (migrate, version, source), None
+        # Stored dicts and contexts are keyed by their ids; entries keep
+        # references to them, so the ids are not reused
+        return (migrate, version, id(source)), source
+
+    def _store(self, key, stored, result):
+        self.results[key] = (stored, result)
+        while len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+    @staticmethod
+    def _snapshot(obj):
+        if isinstance(obj, CopyOnWriteDict):
+            return obj._snapshot()
+        if isinstance(obj, Context) and isinstance(obj.values, CopyOnWriteDict):
+            context = copy.copy(obj)
+            context.values = obj.values._snapshot()
+            return context
+        return copy.deepcopy(obj)
+
+    @staticmethod
+    def _restore(obj, migrated):
+        if isinstance(obj, CopyOnWriteDict):
+            obj.clear()
+            # values are shared with the snapshot and copied on access
+            dict.update(obj, migrated)
+        elif isinstance(obj, dict):
+            obj.clear()
+            obj.update(copy.deepcopy(migrated))
+        else:
+            usage = obj.usage()
+            shared = isinstance(obj.values, CopyOnWriteDict)
+            obj.__dict__.clear()
+            if shared:
+                obj.__dict__.update(migrated.__getstate__())
+                obj.values = CopyOnWriteDict(migrated.values)
+            else:
+                obj.__dict__.update(copy.deepcopy(migrated.__getstate__()))
+            obj.__dict__.update(usage)
+
+
+_migration_cache = _MigrationCache()
+
+
+def _file_source(settings_file):
+    """Return a cheap identity of the content of `settings_file` for the
+    migration cache, or `None` if it cannot be determined."""
+    if isinstance(settings_file, io.BytesIO):
+        return settings_file.getvalue()
+    try:
+        stat = os.fstat(settings_file.fileno())
+        return os.path.abspath(settings_file.name), \
+            stat.st_mtime_ns, stat.st_size
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+def migration_statistics() -> Dict[str, MigrationStatistics]:
+    """
+    Return statistics of migrations of settings and contexts for each widget
+    class, keyed by the class's qualified name.
+    """
+    return {name: MigrationStatistics(*stats)
+            for name, stats in _migration_cache.statistics.items()}
+
+
+def clear_migration_cache() -> None:
+    """Clear cached results of migrations and migration statistics."""
+    _migration_cache.results.clear()
+    _migration_cache.statistics.clear()
 
 
 class SettingsHandler:
@@ -420,6 +1032,10 @@ class SettingsHandler:
         """:type: SettingProvider"""
         self.defaults = {}
         self.known_settings = {}
+        # Set by read_defaults_file if the defaults were migrated, or if
+        # their migration failed (then they are not written back)
+        self.defaults_outdated = False
+        self.defaults_migration_failed = False
 
     @staticmethod
     def create(widget_class, template=None):
@@ -488,7 +1104,30 @@ class SettingsHandler:
     def read_defaults(self):
         """Read (global) defaults for this widget class from a file.
         Opens a file and calls :obj:`read_defaults_file`. Derived classes
-        should overload the latter."""
+        should overload the latter.
+
+        If the defaults were stored by an older version of the widget and a
+        settings writer is set (see :obj:`set_settings_writer`), the migrated
+        defaults are written back in the background, so they are migrated
+        only once. Otherwise they are written at the next explicit save.
+        """
+        self.defaults_outdated = self.defaults_migration_failed = False
+        store = settings_store()
+        if store is not None:
+            data = store.read(self._get_settings_key())
+            if data is not None:
+                try:
+                    self.read_defaults_file(io.BytesIO(data))
+                # Unpickling exceptions can be of any type
+                # pylint: disable=broad-except
+                except Exception as ex:
+                    warnings.warn("Could not read defaults for widget {0}\n"
+                                  "The following error occurred:\n\n{1}"
+                                  .format(self.widget_class, ex))
+                else:
+                    self._write_migrated_defaults()
+            return
+
         filename = self._get_settings_filename()
         if os.path.isfile(filename):
             settings_file = open(filename, "rb")
@@ -500,8 +1139,17 @@ class SettingsHandler:
                 warnings.warn("Could not read defaults for widget {0}\n"
                               "The following error occurred:\n\n{1}"
                               .format(self.widget_class, ex))
+                return
             finally:
                 settings_file.close()
+            self._write_migrated_defaults()
+
+    def _write_migrated_defaults(self):
+        # Reading defaults (at class set-up) does not write files itself
+        if self.defaults_outdated and not self.defaults_migration_failed \
+                and settings_writer() is not None:
+            self.defaults_outdated = False
+            self.write_defaults()
 
     def read_defaults_file(self, settings_file):
         """Read (global) defaults for this widget class from a file.
@@ -516,15 +1164,42 @@ class SettingsHandler:
             for key, value in defaults.items()
             if not isinstance(value, Setting)
         }
-        self._migrate_settings(self.defaults)
+        self.defaults_outdated = self._is_outdated(self.defaults)
+        if not self._migrate_settings(self.defaults,
+                                      _file_source(settings_file)):
+            # keep the stored defaults, so they can be migrated later
+            self.defaults_migration_failed = True
         # remove schema_only settings introduced by the migration
         self._remove_schema_only(self.defaults)
 
     def write_defaults(self):
         """Write (global) defaults for this widget class to a file.
         Opens a file and calls :obj:`write_defaults_file`. Derived classes
-        should overload the latter."""
+        should overload the latter.
+
+        If a settings writer is set (see :obj:`set_settings_writer`), the
+        defaults are serialized immediately and the file is written by the
+        writer. If a settings store is set (see :obj:`set_settings_store`),
+        defaults are written to the store instead of a file."""
         filename = self._get_settings_filename()
+        store, writer = settings_store(), settings_writer()
+        if store is not None or writer is not None:
+            buffer = io.BytesIO()
+            try:
+                self.write_defaults_file(buffer)
+            except (EOFError, IOError, pickle.PicklingError) as ex:
+                log.error("Could not write default settings for %s (%s).",
+                          self.widget_class, ex)
+                return
+            data = buffer.getvalue()
+            if store is None:
+                writer.write(filename, data)
+            elif writer is None:
+                store.write(self._get_settings_key(), data)
+            else:
+                writer.write(self._get_settings_key(), data, store.write)
+            return
+
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         try:
             settings_file = open(filename, "wb")
@@ -555,8 +1230,11 @@ class SettingsHandler:
     def _get_settings_filename(self):
         """Return the name of the file with default settings for the widget"""
         return os.path.join(widget_settings_dir(),
-                            "{0.__module__}.{0.__qualname__}.pickle"
-                            .format(self.widget_class))
+                            self._get_settings_key() + ".pickle")
+
+    def _get_settings_key(self):
+        """Return the key of the widget's default settings in a store"""
+        return "{0.__module__}.{0.__qualname__}".format(self.widget_class)
 
     def initialize(self, instance, data=None):
         """
@@ -573,8 +1251,10 @@ class SettingsHandler:
         provider = self._select_provider(instance)
 
         if isinstance(data, bytes):
-            data = pickle.loads(data)
-        self._migrate_settings(data)
+            source, data = data, pickle.loads(data)
+        else:
+            source = getattr(data, "_source", None)
+        self._migrate_settings(data, source)
 
         if provider is self.provider:
             data = self._add_defaults(data)
@@ -585,15 +1265,26 @@ class SettingsHandler:
         provider = self._select_provider(instance)
         provider.reset_to_original(instance)
 
-    def _migrate_settings(self, settings):
-        """Ask widget to migrate settings to the latest version."""
+    def _is_outdated(self, settings):
+        """Return `True` if `settings` are from an older version."""
+        return settings.get(VERSION_KEY, 0) \
+            < getattr(self.widget_class, "settings_version", 1)
+
+    def _migrate_settings(self, settings, source=None):
+        """Ask widget to migrate settings to the latest version; return
+        `False` if migration failed and settings were discarded.
+
+        `source` identifies the stored settings for the migration cache."""
         if settings:
             try:
-                self.widget_class.migrate_settings(
-                    settings, settings.pop(VERSION_KEY, 0))
+                _migration_cache.migrate(
+                    self.widget_class, self.widget_class.migrate_settings,
+                    settings, settings.pop(VERSION_KEY, 0), source)
             except Exception:  # pylint: disable=broad-except
                 sys.excepthook(*sys.exc_info())
                 settings.clear()
+                return False
+        return True
 
     def _select_provider(self, instance):
         provider = self.provider.get_provider(instance.__class__)
@@ -608,6 +1299,9 @@ class SettingsHandler:
     def _add_defaults(self, data):
         if data is None:
             return self.defaults
+        if isinstance(data, CopyOnWriteDict):
+            # values that the widget does not use stay shared
+            return data._with_defaults(self.defaults)
 
         new_data = self.defaults.copy()
         new_data.update(data)
@@ -677,13 +1371,14 @@ class SettingsHandler:
         ----------
         instance : OWBaseWidget
         """
-        for setting, _, inst in self.provider.traverse_settings(instance=instance):
-            if setting.packable:
-                _apply_setting(setting, inst, setting.default)
+        self.provider.plan.reset(instance)
 
 
 class ContextSetting(Setting):
-    """Description of a context dependent setting"""
+    """Description of a context dependent setting
+
+    If `compress` is set, large values are stored in contexts as
+    :obj:`CompressedValue`."""
 
     OPTIONAL = 0
     REQUIRED = 2
@@ -696,23 +1391,544 @@ class ContextSetting(Setting):
     # simplifies the declaration of settings in widget at no (visible)
     # cost to those settings that don't need it
     def __init__(self, default, *, required=2,
-                 exclude_attributes=False, exclude_metas=False, **data):
+                 exclude_attributes=False, exclude_metas=False,
+                 compress=False, **data):
         super().__init__(default, **data)
         self.exclude_attributes = exclude_attributes
         self.exclude_metas = exclude_metas
         self.required = required
+        self.compress = compress
+
+
+class CompressedValue:
+    """
+    A compact encoding of a large value of context setting.
+
+    Values are encoded by kind:
+
+    - "ranges": sets, lists and tuples (but not their subclasses) of
+      integers, without booleans, are stored as runs of consecutive integers
+      (in ascending order for sets, and in the original order for lists and
+      tuples)
+    - "array": numpy arrays with numeric types are stored as a
+      zlib-compressed buffer
+    - "pickle": other sets, lists, tuples and dicts are stored as a
+      zlib-compressed pickle
+
+    Buffers with integers are stored as little-endian 64-bit integers.
+    """
+    #: Values with fewer elements are not encoded
+    threshold = 1000
+    #: Compression level for zlib; higher levels are slower
+    level = 1
+
+    def __init__(self, kind, type, data, dtype=None, shape=None):
+        # pylint: disable=redefined-builtin
+        self.kind = kind
+        self.type = type
+        self.data = data
+        self.dtype = dtype
+        self.shape = shape
+
+    @classmethod
+    def encode(cls, value):
+        """Return an encoded value, or a copy of value that is too small or
+        cannot be encoded."""
+        if isinstance(value, np.ndarray):
+            if value.size < cls.threshold:
+                return copy.copy(value)
+            if value.dtype.kind in "biufc":
+                return cls("array", np.ndarray, zlib.compress(
+                    np.ascontiguousarray(value).tobytes(), cls.level),
+                           value.dtype.str, value.shape)
+        elif not isinstance(value, (set, frozenset, list, tuple, dict)) \
+                or len(value) < cls.threshold:
+            return copy.copy(value)
+        # Subclasses (e.g. named tuples) may not be constructible from an
+        # iterable, as required by `decode`
+        if type(value) in (set, frozenset, list, tuple) \
+                and isinstance(next(iter(value)), (int, np.integer)):
+            # numpy infers an integer type only if all elements are integers
+            # within the range of int64, but it also converts booleans
+            values = np.array(list(value))
+            if values.ndim == 1 and values.dtype.kind in "iu" \
+                    and values.dtype.itemsize <= 8 \
+                    and (values.dtype.kind == "i" or values.max() < 2 ** 63) \
+                    and not any(isinstance(v, (bool, np.bool_))
+                                for v in value):
+                if isinstance(value, (set, frozenset)):
+                    values.sort()
+                return cls("ranges", type(value),
+                           cls._ranges(values.astype(np.int64)))
+        return cls("pickle", type(value), zlib.compress(
+            pickle.dumps(value, protocol=PICKLE_PROTOCOL), cls.level))
+
+    @classmethod
+    def _ranges(cls, values):
+        # indices at which runs of consecutive integers start
+        breaks = np.flatnonzero(np.diff(values) != 1) + 1
+        starts = values[np.r_[0, breaks]]
+        stops = values[np.r_[breaks - 1, len(values) - 1]] + 1
+        bounds = np.concatenate((starts, stops)).astype("<i8")
+        return zlib.compress(bounds.tobytes(), cls.level)
+
+    def decode(self):
+        """Return the decoded value."""
+        if self.kind == "ranges":
+            bounds = np.frombuffer(zlib.decompress(self.data), dtype="<i8")
+            n = len(bounds) // 2
+            return self.type(itertools.chain.from_iterable(
+                map(range, bounds[:n].tolist(), bounds[n:].tolist())))
+        elif self.kind == "array":
+            return np.frombuffer(zlib.decompress(self.data), self.dtype) \
+                .reshape(self.shape).copy()
+        else:
+            return pickle.loads(zlib.decompress(self.data))
+
+    def __eq__(self, other):
+        return isinstance(other, CompressedValue) \
+            and self.__dict__ == other.__dict__
+
+    def __repr__(self):
+        return "CompressedValue({!r}, {}, {} bytes)".format(
+            self.kind, self.type.__name__, len(self.data))
 
 
 class Context:
     """Class for data that defines context and
     values that should be applied to widget if given context
     is encountered."""
+    #: Attributes with usage statistics, which are ignored in comparisons
+    #: and are not pickled (but are kept by copies)
+    USAGE_ATTRIBUTES = ("last_used", "use_count", "estimated_size")
+
+    #: Time (as in `time.time`) when the context was last used
+    last_used = 0.
+    #: Number of times the context was used
+    use_count = 0
+    #: Estimated size of the pickled context (see :obj:`ContextEviction`)
+    estimated_size = None
+
     def __init__(self, **argkw):
         self.values = {}
         self.__dict__.update(argkw)
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        attrs, other_attrs = self.__dict__, other.__dict__
+        usage = self.USAGE_ATTRIBUTES
+        compared = 0
+        for name, value in attrs.items():
+            if name not in usage:
+                if name not in other_attrs or other_attrs[name] != value:
+                    return False
+                compared += 1
+        return compared == len(other_attrs) - sum(
+            name in other_attrs for name in usage)
+
+    def __getstate__(self):
+        attrs = self.__dict__
+        if any(name in attrs for name in self.USAGE_ATTRIBUTES):
+            attrs = {name: value for name, value in attrs.items()
+                     if name not in self.USAGE_ATTRIBUTES}
+        return attrs
+
+    def __copy__(self):
+        context = self.__class__.__new__(self.__class__)
+        context.__dict__.update(self.__dict__)
+        return context
+
+    def __deepcopy__(self, memo):
+        context = self.__class__.__new__(self.__class__)
+        memo[id(self)] = context
+        context.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return context
+
+    def usage(self):
+        """Return a dict with usage statistics of this context."""
+        attrs = self.__dict__
+        return {name: attrs[name]
+                for name in self.USAGE_ATTRIBUTES if name in attrs}
+
+    def record_use(self):
+        """Update usage statistics when the context is used."""
+        self.last_used = time.time()
+        self.use_count += 1
+        # the context's values will probably change
+        self.estimated_size = None
+
+
+class _ContextIndex:
+    """An index of a list of contexts by their fingerprints.
+
+    Contexts are ordered by keys that follow their order in the list. The
+    handler reports contexts that it moves or adds to the top of the list
+    (:obj:`moved_to_top`), which takes constant time. Other changes are
+    detected by checking the identity and the length of the list, its
+    first and last context, and the number of stored contexts that a
+    :obj:`CopyOnWriteList` replaced by copies; the index is then rebuilt.
+    Fingerprints are computed only for contexts that were not indexed
+    before.
+    """
+    def __init__(self):
+        self.indexed = None  # the indexed list
+        self.length = 0
+        self.ends = (None, None)  # the first and the last indexed context
+        # the number of stored contexts replaced by their copies in an
+        # indexed `CopyOnWriteList`
+        self.copied = 0
+        self.top = 0  # the key of the first context
+        # id -> (context, fingerprint, key); the index keeps references to
+        # indexed contexts, so their ids can not be reused
+        self.contexts = {}
+        self.buckets = {}  # fingerprint -> set of ids of contexts
+
+    def candidates(self, handler, contexts, fingerprint):
+        """Return contexts from `contexts` with the given `fingerprint` or
+        without a fingerprint, in the order of the list."""
+        if not self.is_current(contexts):
+            self.rebuild(handler, contexts)
+        ids = self.buckets.get(fingerprint, set()) | self.buckets.get(None, set())
+        entries = sorted((self.contexts[key] for key in ids), key=itemgetter(2))
+        return [context for context, _, _ in entries]
+
+    def is_current(self, contexts):
+        """Return `True` if `contexts` are (probably) the indexed list."""
+        first, last = self.ends
+        return contexts is self.indexed and len(contexts) == self.length \
+            and getattr(contexts, "_copied", 0) == self.copied \
+            and (not contexts
+                 or _stored_item(contexts, 0) is first
+                 and _stored_item(contexts, -1) is last)
+
+    def moved_to_top(self, handler, contexts, context, found=None):
+        """Update the index after `context` was moved or added to the top of
+        the (previously indexed) list `contexts`. If `context` replaced the
+        indexed context `found` (its private copy in a
+        :obj:`CopyOnWriteList`), the entry of `found` is reused."""
+        key = id(context)
+        entry = self.contexts.get(key)
+        if entry is None and found is not None:
+            entry = self.contexts.pop(id(found), None)
+            if entry is not None:
+                bucket = self.buckets[entry[1]]
+                bucket.discard(id(found))
+                bucket.add(key)
+        if entry is None:
+            fingerprint = handler.context_fingerprint(context)
+            self.buckets.setdefault(fingerprint, set()).add(key)
+            self.length += 1
+        else:
+            fingerprint = entry[1]
+        self.top -= 1
+        self.contexts[key] = (context, fingerprint, self.top)
+        self.copied = getattr(contexts, "_copied", 0)
+        if len(contexts) == self.length:
+            self.ends = (_stored_item(contexts, 0), _stored_item(contexts, -1))
+        else:  # contexts were also removed
+            self.indexed = None
+
+    def rebuild(self, handler, contexts):
+        """Index the list `contexts`, reusing known fingerprints.
+
+        Stored contexts in a :obj:`CopyOnWriteList` are indexed without
+        copying them; fingerprints depend only on their shared attributes.
+        """
+        old = self.contexts
+        self.contexts = {}
+        self.buckets = {}
+        for position, context in enumerate(list.__iter__(contexts)):
+            key = id(context)
+            entry = old.get(key)
+            fingerprint = handler.context_fingerprint(context) \
+                if entry is None else entry[1]
+            self.contexts[key] = (context, fingerprint, position)
+            self.buckets.setdefault(fingerprint, set()).add(key)
+        self.indexed = contexts
+        self.length = len(contexts)
+        self.copied = getattr(contexts, "_copied", 0)
+        self.ends = (_stored_item(contexts, 0), _stored_item(contexts, -1)) \
+            if contexts else (None, None)
+        self.top = 0
+
+
+def _stored_item(contexts, index):
+    # Return the item at `index` without copying it if it is shared by a
+    # `CopyOnWriteList`
+    return list.__getitem__(contexts, index)
+
+
+class ContextEviction:
+    """
+    A policy for removing contexts when there are too many of them.
+
+    Contexts are ranked by :obj:`rank` and the lowest ranked are removed.
+    This (default) policy ranks contexts by their positions: contexts are
+    moved to the top of the list when they are used, so this keeps the
+    most recently used or added ones. The first context, which is the
+    current one, is never removed.
+    """
+    def rank(self, context, index):
+        """Return a key by which the context at `index` is ranked."""
+        return -index
+
+    def evict(self, contexts, max_contexts):
+        """Remove contexts from the list `contexts` (in place) to keep at
+        most `max_contexts`."""
+        if len(contexts) > max_contexts:
+            self._remove_lowest(contexts, len(contexts) - max_contexts)
+
+    def _ranked(self, contexts):
+        # Indices of contexts, except the first, from the lowest ranked
+        return sorted(range(1, len(contexts)),
+                      key=lambda i: self.rank(contexts[i], i))
+
+    def _remove_lowest(self, contexts, n):
+        for i in sorted(self._ranked(contexts)[:n], reverse=True):
+            del contexts[i]
+
+
+class LRUContextEviction(ContextEviction):
+    """Remove the least recently used contexts."""
+    def rank(self, context, index):
+        return context.last_used, -index
+
+
+class LFUContextEviction(ContextEviction):
+    """Remove the least frequently used contexts; among equally frequently
+    used, remove the least recently used."""
+    def rank(self, context, index):
+        return context.use_count, context.last_used, -index
+
+
+class SizeContextEviction(ContextEviction):
+    """
+    Remove contexts to keep the total estimated size of pickled contexts
+    within `max_bytes`.
+
+    Contexts are ranked by the `ranking` policy (by default
+    :obj:`LRUContextEviction`), which is also used to limit the number of
+    contexts.
+
+    The size of a context is estimated by pickling it and stored in the
+    context's `estimated_size` until the context is used again.
+    """
+    def __init__(self, max_bytes, ranking=None):
+        self.max_bytes = max_bytes
+        self.ranking = ranking or LRUContextEviction()
+
+    def rank(self, context, index):
+        return self.ranking.rank(context, index)
+
+    def evict(self, contexts, max_contexts):
+        super().evict(contexts, max_contexts)
+        total = sum(map(self.estimate_size, contexts))
+        if total <= self.max_bytes:
+            return
+        removed = []
+        for i in self._ranked(contexts):
+            if total <= self.max_bytes:
+                break
+            total -= contexts[i].estimated_size
+            removed.append(i)
+        for i in sorted(removed, reverse=True):
+            del contexts[i]
+
+    @staticmethod
+    def estimate_size(context):
+        """Return the estimated size of pickled context in bytes."""
+        if context.estimated_size is None:
+            context.estimated_size = \
+                len(pickle.dumps(context, protocol=PICKLE_PROTOCOL))
+        return context.estimated_size
+
+
+class CopyOnWriteDict(dict):
+    """
+    A dictionary of stored settings that shares values with the dictionary
+    it was constructed from and copies them on first access.
+
+    This allows initializing a widget from stored settings (e.g. node's
+    properties in a workflow) without deep-copying them in advance. Only the
+    values that are accessed are (deep-)copied, and the original dictionary is
+    never modified. Lists of contexts are not copied, but wrapped into
+    :obj:`CopyOnWriteList`, so that contexts that are not used by the widget
+    are not copied either.
+
+    Values that are never accessed stay shared, hence copies and pickles of
+    this dictionary are plain dicts.
+    """
+    def __init__(self, data=None):
+        super().__init__(dict.items(data) if isinstance(data, dict)
+                         else data or ())
+        self.__private = set()  # keys of values that were copied or set
+        # The stored dict, which identifies the content for the migration
+        # cache (stored dicts are replaced, not modified in place)
+        self._source = data if type(data) is dict else None
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if key not in self.__private:
+            value = _copy_on_write(value, lists=CopyOnWriteList)
+            super().__setitem__(key, value)
+            self.__private.add(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.__private.add(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.__private.discard(key)
+
+    def __iter__(self):
+        # Defining __iter__ also disables the fast path in dict(self),
+        # dict.update(self) etc., which would expose shared values
+        return super().__iter__()
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        if key in self.__private:
+            self.__private.discard(key)
+        else:
+            value = _copy_on_write(value, lists=CopyOnWriteList)
+        return key, value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        super().clear()
+        self.__private.clear()
+
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def copy(self):
+        return dict(self.items())
+
+    __copy__ = copy
+
+    def _with_defaults(self, defaults):
+        # Return a copy-on-write dict with items of `defaults` for keys that
+        # are missing here; values that were not accessed stay shared and
+        # the defaults are not copied (as in `dict(defaults, **self)`)
+        merged = CopyOnWriteDict(self)
+        merged.__private = set(self.__private)
+        for key, value in defaults.items():
+            if key not in merged:
+                merged[key] = value
+        return merged
+
+    def _snapshot(self):
+        # Return a plain dict that shares the values that were not accessed
+        # and has copies of the others
+        return {key: copy.deepcopy(value) if key in self.__private else value
+                for key, value in dict.items(self)}
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(dict.items(self)), memo)
+
+    def __reduce_ex__(self, protocol):
+        return dict, (dict(dict.items(self)), )
+
+
+class CopyOnWriteList(list):
+    """
+    A list of stored contexts that shares them with the list it was
+    constructed from and copies them on first access.
+
+    Contexts are copied shallowly, except for their `values`, which are
+    wrapped into :obj:`CopyOnWriteDict`. Other attributes of contexts describe
+    the data for which the context was created and are shared; they must
+    be replaced, not modified in place.
+    """
+    def __init__(self, data=()):
+        super().__init__(list.__iter__(data) if isinstance(data, list)
+                         else data)
+        # Items of the original list are wrapped on access. Keep references
+        # to them, so their ids can not be reused by new items.
+        self.__shared = {id(item): item for item in list.__iter__(self)}
+        # The number of items that were replaced by copies
+        self._copied = 0
+
+    def __item(self, index):
+        value = super().__getitem__(index)
+        if id(value) in self.__shared:
+            value = _copy_on_write(value)
+            super().__setitem__(index, value)
+            self._copied += 1
+        return value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.__item(i) for i in range(*index.indices(len(self)))]
+        return self.__item(index)
+
+    def __iter__(self):
+        i = 0
+        while i < len(self):
+            yield self.__item(i)
+            i += 1
+
+    def __reversed__(self):
+        for i in range(len(self) - 1, -1, -1):
+            yield self.__item(i)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def pop(self, index=-1):
+        value = self.__item(index)
+        super().pop(index)
+        return value
+
+    def copy(self):
+        return list(self)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(list(list.__iter__(self)), memo)
+
+    def __reduce_ex__(self, protocol):
+        return list, (list(list.__iter__(self)), )
+
+
+def _copy_on_write(value, lists=None):
+    """Return a private copy of a stored `value` for :obj:`CopyOnWriteDict`
+    and :obj:`CopyOnWriteList`; lists of contexts are wrapped into `lists`."""
+    if value is None or isinstance(value, _IMMUTABLES):
+        return value
+    if isinstance(value, Context):
+        context = copy.copy(value)
+        context.values = CopyOnWriteDict(value.values)
+        return context
+    if lists is not None and isinstance(value, list) and value \
+            and all(isinstance(item, Context) for item in value):
+        return lists(value)
+    return copy.deepcopy(value)
 
 
 class ContextHandler(SettingsHandler):
@@ -726,11 +1942,23 @@ class ContextHandler(SettingsHandler):
     PERFECT_MATCH = 2
 
     MAX_SAVED_CONTEXTS = 50
+    #: Policy for removing contexts beyond MAX_SAVED_CONTEXTS (or beyond a
+    #: total size, for :obj:`SizeContextEviction`)
+    CONTEXT_EVICTION = ContextEviction()
 
     def __init__(self):
         super().__init__()
         self.global_contexts = []
         self.known_settings = {}
+        self._global_index = _ContextIndex()
+        self._local_indices = WeakKeyDictionary()
+
+    def bind(self, widget_class):
+        # Handlers for different classes are (shallow) copies of the same
+        # template; they must not share indices
+        self._global_index = _ContextIndex()
+        self._local_indices = WeakKeyDictionary()
+        super().bind(widget_class)
 
     def initialize(self, instance, data=None):
         """Initialize the widget: call the inherited initialization and
@@ -749,25 +1977,54 @@ class ContextHandler(SettingsHandler):
            pickle."""
         super().read_defaults_file(settings_file)
         self.global_contexts = pickle.load(settings_file)
-        self._migrate_contexts(self.global_contexts)
+        try:
+            usage = pickle.load(settings_file)
+        except EOFError:  # written without usage statistics
+            usage = []
+        for context, stats in zip(self.global_contexts, usage):
+            context.__dict__.update(stats)
+        self.defaults_outdated |= any(
+            self._is_outdated(context.values)
+            for context in self.global_contexts)
+        if not self._migrate_contexts(self.global_contexts,
+                                      _file_source(settings_file)):
+            # keep the stored contexts, so they can be migrated later
+            self.defaults_migration_failed = True
         # remove schema_only settings introduced by the migration
         for context in self.global_contexts:
             self._remove_schema_only(context.values)
 
-    def _migrate_contexts(self, contexts):
-        i = 0
+    def _migrate_contexts(self, contexts, source=None):
+        """Migrate contexts and remove those that are incompatible or cannot
+        be migrated; return `False` if migration of any context failed.
+
+        `source` identifies the stored list for the migration cache; contexts
+        that are copied from a :obj:`CopyOnWriteList` are identified by the
+        stored contexts."""
+        success = True
+        i = position = 0
         while i < len(contexts):
+            stored = _stored_item(contexts, i)
             context = contexts[i]
+            if source is not None:
+                context_source = (source, position)
+            else:
+                context_source = stored if stored is not context else None
+            position += 1
             try:
-                self.widget_class.migrate_context(
-                    context, context.values.pop(VERSION_KEY, 0))
+                _migration_cache.migrate(
+                    self.widget_class, self.widget_class.migrate_context,
+                    context, context.values.pop(VERSION_KEY, 0),
+                    context_source)
             except IncompatibleContext:
                 del contexts[i]
             except Exception:  # pylint: disable=broad-except
                 sys.excepthook(*sys.exc_info())
                 del contexts[i]
+                success = False
             else:
                 i += 1
+        return success
 
     def write_defaults_file(self, settings_file):
         """Call the inherited method, then add global context to the pickle."""
@@ -781,6 +2038,9 @@ class ContextHandler(SettingsHandler):
 
         pickle.dump([add_version(context) for context in self.global_contexts],
                     settings_file, protocol=PICKLE_PROTOCOL)
+        # Usage statistics are not pickled with contexts
+        pickle.dump([context.usage() for context in self.global_contexts],
+                    settings_file, protocol=PICKLE_PROTOCOL)
 
     def pack_data(self, widget):
         """Call the inherited method, then add local contexts to the dict."""
@@ -811,7 +2071,7 @@ class ContextHandler(SettingsHandler):
             if context not in globs:
                 new_contexts.append(context)
         globs[:0] = reversed(new_contexts)
-        del globs[self.MAX_SAVED_CONTEXTS:]
+        self.CONTEXT_EVICTION.evict(globs, self.MAX_SAVED_CONTEXTS)
 
         # Save non-context settings. Do not call super().update_defaults, so that
         # settingsAboutToBePacked is emitted once.
@@ -846,44 +2106,110 @@ class ContextHandler(SettingsHandler):
         """
         raise NotImplementedError
 
+    def fingerprint(self, *args):
+        """Return a hashable fingerprint of the data passed in additional
+        arguments, or `None` if stored contexts are not to be indexed.
+
+        If a handler defines fingerprints, stored contexts are indexed by
+        their fingerprints (see :obj:`context_fingerprint`), and
+        :obj:`find_or_create_context` scores only contexts whose fingerprint
+        equals the fingerprint of the data. A perfect match is thus found
+        with a dictionary lookup instead of calling :obj:`match` for every
+        stored context. Equal fingerprints must therefore be a necessary
+        condition for a match; handlers whose :obj:`match` can succeed for
+        data with different fingerprints must use coarser fingerprints.
+
+        The default implementation returns `None`.
+        """
+        return None
+
+    def context_fingerprint(self, context):
+        """Return the fingerprint of a stored `context`; it must equal the
+        :obj:`fingerprint` of data for which the context was created, and must
+        not change during the context's lifetime.
+
+        Contexts without a fingerprint (`None`, returned by the default
+        implementation) are scored for any data.
+        """
+        return None
+
     def find_or_create_context(self, widget, *args):
         """Find the best matching context or create a new one if nothing
         useful is found. The returned context is moved to or added to the top
         of the context list."""
+        fingerprint = self.fingerprint(*args)
+        if fingerprint is None:
+            local_candidates = global_candidates = None
+        else:
+            local_index = self._local_indices.get(widget)
+            if local_index is None:
+                local_index = self._local_indices[widget] = _ContextIndex()
+            local_candidates = local_index.candidates(
+                self, widget.context_settings, fingerprint)
+            global_candidates = self._global_index.candidates(
+                self, self.global_contexts, fingerprint)
 
         # First search the contexts that were already used in this widget instance
-        best_context, best_score = self.find_context(widget.context_settings, args, move_up=True)
+        best_context, best_score = self.find_context(
+            widget.context_settings, args, move_up=True,
+            candidates=local_candidates)
+        if best_context is not None and local_candidates is not None:
+            # candidates are indexed without copying stored contexts; the
+            # context moved to the top is the private copy
+            found, best_context = best_context, widget.context_settings[0]
+            local_index.moved_to_top(self, widget.context_settings,
+                                     best_context, found)
         # If the exact data was used, reuse the context
         if best_score == self.PERFECT_MATCH:
+            best_context.record_use()
             return best_context, False
 
         # Otherwise check if a better match is available in global_contexts
-        best_context, best_score = self.find_context(self.global_contexts, args,
-                                                     best_score, best_context)
+        best_context, best_score = self.find_context(
+            self.global_contexts, args, best_score, best_context,
+            candidates=global_candidates)
         if best_context:
+            best_context.record_use()
             context = self.clone_context(best_context, *args)
         else:
             context = self.new_context(*args)
+        context.record_use()
         # Store context in widget instance. It will be pushed to global_contexts
         # when (if) update defaults is called.
         self.add_context(widget.context_settings, context)
+        if local_candidates is not None:
+            local_index.moved_to_top(self, widget.context_settings, context)
         return context, best_context is None
 
-    def find_context(self, known_contexts, args, best_score=0, best_context=None, move_up=False):
+    def find_context(self, known_contexts, args, best_score=0, best_context=None,
+                     move_up=False, candidates=None):
         """Search the given list of contexts and return the context
          which best matches the given args.
 
         best_score and best_context can be used to provide base_values.
+
+        If given, `candidates` are the contexts from `known_contexts` (in
+        their order in the list) that are considered; other contexts are
+        skipped.
         """
 
-        best_idx = None
-        for i, context in enumerate(known_contexts):
+        best_idx = found = None
+        if candidates is None:
+            candidates = enumerate(known_contexts)
+        else:
+            candidates = ((None, context) for context in candidates)
+        for i, context in candidates:
             score = self.match(context, *args)
             if score > best_score:  # NO_MATCH is not OK!
                 best_context, best_score, best_idx = context, score, i
+                found = True
                 if score == self.PERFECT_MATCH:
                     break
-        if best_idx is not None and move_up:
+        if found and move_up:
+            if best_idx is None:
+                best_idx = next(
+                    i for i, context in enumerate(list.__iter__(known_contexts))
+                    if context is best_context)
             self.move_context_up(known_contexts, best_idx)
         return best_context, best_score
 
@@ -895,7 +2221,7 @@ class ContextHandler(SettingsHandler):
     def add_context(self, contexts, setting):
         """Add the context to the top of the list."""
         contexts.insert(0, setting)
-        del contexts[self.MAX_SAVED_CONTEXTS:]
+        self.CONTEXT_EVICTION.evict(contexts, self.MAX_SAVED_CONTEXTS)
 
     def clone_context(self, old_context, *args):
         """Construct a copy of the context settings suitable for the context
@@ -906,11 +2232,8 @@ class ContextHandler(SettingsHandler):
         context = self.new_context(*args)
         context.values = copy.deepcopy(old_context.values)
 
-        traverse = self.provider.traverse_settings
-        for setting, data, _ in traverse(data=context.values):
-            if not isinstance(setting, ContextSetting):
-                continue
-
+        for setting, data, _ in self.provider.plan.traverse(
+                context.values, None, context_only=True):
             self.filter_value(setting, data, *args)
         return context
 
@@ -937,9 +2260,9 @@ class ContextHandler(SettingsHandler):
 
         widget.retrieveSpecificSettings()
 
-        for setting, data, instance in \
-                self.provider.traverse_settings(data=context.values, instance=widget):
-            if not isinstance(setting, ContextSetting) or setting.name not in data:
+        for setting, data, instance in self.provider.plan.traverse(
+                context.values, widget, context_only=True):
+            if setting.name not in data:
                 continue
             value = self.decode_setting(setting, data[setting.name], *args)
             _apply_setting(setting, instance, value)
@@ -986,10 +2309,14 @@ class ContextHandler(SettingsHandler):
 
     def encode_setting(self, context, setting, value):
         """Encode value to be stored in settings dict"""
+        if getattr(setting, "compress", False):
+            return CompressedValue.encode(value)
         return copy.copy(value)
 
     def decode_setting(self, setting, value, *args):
         """Decode settings value from the setting dict format"""
+        if isinstance(value, CompressedValue):
+            return value.decode()
         return value
 
 
@@ -1,12 +1,17 @@
 import pickle
+from collections import namedtuple
 from copy import copy, deepcopy
 from io import BytesIO
 from unittest import TestCase
 from unittest.mock import Mock, patch, call
+
+import numpy as np
 from AnyQt.QtCore import pyqtSignal as Signal, QObject
 from orangewidget.settings import (
     ContextHandler, ContextSetting, Context, Setting, SettingsPrinter,
-    VERSION_KEY, IncompatibleContext, SettingProvider)
+    VERSION_KEY, IncompatibleContext, SettingProvider, CopyOnWriteDict,
+    CopyOnWriteList, LRUContextEviction, LFUContextEviction,
+    SizeContextEviction, CompressedValue)
 from orangewidget.tests.base import override_default_settings
 
 __author__ = 'anze'
@@ -112,6 +117,25 @@ class TestContextHandler(TestCase):
             self.assertEqual(handler.defaults, {'value': 42, 'setting': 5})
             self.assertEqual(handler.global_contexts[0].values, {'context_setting': 5})
 
+    def test_read_defaults_failed_migration_is_not_written(self):
+        handler = ContextHandler()
+        handler.widget_class = SimpleWidget
+        handler.provider = SettingProvider(SimpleWidget)
+
+        def migrate_context(context, _):
+            raise ValueError
+
+        with patch.object(SimpleWidget, "migrate_context", migrate_context), \
+                patch.object(ContextHandler, "write_defaults") as write, \
+                patch("orangewidget.settings.settings_writer", Mock()), \
+                patch("sys.excepthook"), \
+                override_default_settings(SimpleWidget, {"value": 42},
+                                          [DummyContext()],
+                                          handler=ContextHandler):
+            handler.read_defaults()
+            self.assertEqual(handler.global_contexts, [])
+            write.assert_not_called()
+
     def test_initialize(self):
         handler = ContextHandler()
         handler.provider = Mock()
@@ -170,6 +194,28 @@ class TestContextHandler(TestCase):
                 all(context.foo == i
                     for i, context in enumerate(contexts)))
 
+    def test_migrate_contexts_reuses_migrations(self):
+        handler = ContextHandler()
+        handler.bind(SimpleWidget)
+        migrated = []
+
+        def migrate_context(context, _):
+            migrated.append(context.foo)
+            if context.foo == 13:
+                raise IncompatibleContext()
+            context.values["bar"] = context.foo
+
+        stored = dict(context_settings=[Context(foo=13), Context(foo=1)])
+        with patch.object(SimpleWidget, "migrate_context", migrate_context):
+            for _ in range(2):
+                widget = SimpleWidget()
+                handler.initialize(widget, CopyOnWriteDict(stored))
+                self.assertEqual(widget.context_settings,
+                                 [Context(foo=1, values=dict(bar=1))])
+                widget.context_settings[0].values["bar"] = 2
+        self.assertEqual(migrated, [13, 1])
+        self.assertEqual(stored["context_settings"][1].values, {})
+
     def test_fast_save(self):
         handler = ContextHandler()
         handler.bind(SimpleWidget)
@@ -210,6 +256,66 @@ class TestContextHandler(TestCase):
         self.assertEqual([c.i for c in widget.context_settings], [5, 2])
         self.assertEqual([c.i for c in handler.global_contexts], [3, 7])
 
+    def test_find_or_create_context_indexed(self):
+        widget = SimpleWidget()
+        handler = ContextHandler()
+        handler.match = Mock(
+            side_effect=lambda context, i: 2 if context.i == i else 1)
+        handler.clone_context = lambda context, i: copy(context)
+        handler.fingerprint = lambda i: i % 3
+        handler.context_fingerprint = Mock(
+            side_effect=lambda context: context.i % 3 if context.i else None)
+
+        c0, c1, c2, c3, c4, c5, c6, c7 = (Context(i=i) for i in range(8))
+        widget.context_settings = [c2, c5, c0]
+        handler.global_contexts = [c3, c7, c4, c1]
+
+        # only contexts with the same fingerprint and those without
+        # fingerprint are scored
+        context, new = handler.find_or_create_context(widget, 4)
+        self.assertEqual(context.i, 4)
+        self.assertFalse(new)
+        self.assertEqual([c.args[0].i for c in handler.match.call_args_list],
+                         [0, 7, 4])
+        self.assertEqual([c.i for c in widget.context_settings], [4, 0, 2, 5])
+
+        # the perfect match is moved up
+        handler.match.reset_mock()
+        context, new = handler.find_or_create_context(widget, 5)
+        self.assertIs(context, c5)
+        self.assertEqual([c.args[0].i for c in handler.match.call_args_list],
+                         [0, 2, 5])
+        self.assertEqual([c.i for c in widget.context_settings], [5, 4, 0, 2])
+
+        # fingerprints of indexed contexts are not recomputed
+        handler.context_fingerprint.reset_mock()
+        handler.find_or_create_context(widget, 2)
+        self.assertEqual([c.i for c in widget.context_settings], [2, 5, 4, 0])
+        handler.context_fingerprint.assert_not_called()
+
+        # moving contexts up does not require rebuilding the index
+        index = handler._local_indices[widget]
+        with patch.object(index, "rebuild") as rebuild:
+            handler.find_or_create_context(widget, 4)
+            handler.find_or_create_context(widget, 0)
+        rebuild.assert_not_called()
+        self.assertEqual([c.i for c in widget.context_settings], [0, 4, 2, 5])
+
+        # the index follows changes of the list
+        widget.context_settings.append(c7)
+        handler.match.reset_mock()
+        context, new = handler.find_or_create_context(widget, 7)
+        self.assertIs(context, c7)
+        self.assertEqual([c.args[0].i for c in handler.match.call_args_list],
+                         [0, 4, 7])
+
+        widget.context_settings = [c6, c1]
+        handler.match.reset_mock()
+        context, new = handler.find_or_create_context(widget, 1)
+        self.assertIs(context, c1)
+        self.assertEqual([c.args[0].i for c in handler.match.call_args_list],
+                         [1])
+
     def test_pack_settings_stores_version(self):
         handler = ContextHandler()
         handler.bind(SimpleWidget)
@@ -302,6 +408,305 @@ class TestContextHandler(TestCase):
         self.assertFalse('schema_only_context_setting' in global_values["component"])
 
 
+class DomainContextHandler(ContextHandler):
+    """A handler with contexts of different sizes"""
+    def new_context(self, i):
+        return Context(i=i, domain=["var{}".format(j)
+                                    for j in range(i % 7 * 100)])
+
+    def match(self, context, i):
+        return (context.i == i) * self.PERFECT_MATCH
+
+
+class TestContextEviction(TestCase):
+    @staticmethod
+    def contexts(*usage):
+        return [Context(i=i, last_used=last_used, use_count=use_count)
+                for i, (last_used, use_count) in enumerate(usage)]
+
+    def test_record_use(self):
+        handler = DomainContextHandler()
+        handler.bind(SimpleWidget)
+        handler.global_contexts = []
+        widget = SimpleWidget()
+        handler.initialize(widget)
+        context, _ = handler.find_or_create_context(widget, 1)
+        self.assertEqual(context.use_count, 1)
+        self.assertGreater(context.last_used, 0)
+        context.estimated_size = 42
+        self.assertEqual(context, handler.new_context(1))
+
+        handler.find_or_create_context(widget, 1)
+        self.assertEqual(context.use_count, 2)
+        self.assertIsNone(context.estimated_size)
+
+    def test_usage_is_not_pickled(self):
+        context = Context(i=1, last_used=5, use_count=2, estimated_size=42)
+        restored = pickle.loads(pickle.dumps(context))
+        self.assertEqual(restored.__dict__, {"values": {}, "i": 1})
+        self.assertEqual(restored, context)
+        self.assertEqual(context, restored)
+        self.assertNotEqual(context, Context(i=2, last_used=5))
+
+    def test_copies_keep_usage(self):
+        contexts = [Context(i=i, last_used=i, use_count=2, data="x" * 1000)
+                    for i in range(5)]
+        size = SizeContextEviction.estimate_size(contexts[0])
+        SizeContextEviction(2.5 * size).evict(contexts, 50)
+        self.assertEqual([c.i for c in contexts], [0, 4])
+        for context in contexts:
+            usage = context.usage()
+            self.assertEqual(
+                set(usage), {"last_used", "use_count", "estimated_size"})
+            for copied in (copy(context), deepcopy(context)):
+                self.assertEqual(copied.usage(), usage)
+                self.assertEqual(copied, context)
+            self.assertIsNot(deepcopy(context).values, context.values)
+
+    def test_usage_in_defaults_file(self):
+        handler = DomainContextHandler()
+        handler.bind(SimpleWidget)
+        handler.global_contexts = [Context(i=0, last_used=5, use_count=2),
+                                   Context(i=1)]
+        buffer = BytesIO()
+        handler.write_defaults_file(buffer)
+        buffer.seek(0)
+        handler.read_defaults_file(buffer)
+        self.assertEqual([c.usage() for c in handler.global_contexts],
+                         [{"last_used": 5, "use_count": 2}, {}])
+
+        # files without usage statistics
+        buffer = BytesIO()
+        pickle.dump({}, buffer)
+        pickle.dump([Context(i=0)], buffer)
+        buffer.seek(0)
+        handler.read_defaults_file(buffer)
+        self.assertEqual(handler.global_contexts[0].usage(), {})
+
+    def test_lru(self):
+        contexts = self.contexts((5, 1), (4, 9), (1, 9), (3, 1), (2, 1))
+        LRUContextEviction().evict(contexts, 3)
+        self.assertEqual([c.i for c in contexts], [0, 1, 3])
+
+    def test_lfu(self):
+        contexts = self.contexts((0, 1), (4, 9), (1, 9), (3, 1), (2, 1))
+        LFUContextEviction().evict(contexts, 3)
+        # the first (current) context is always kept
+        self.assertEqual([c.i for c in contexts], [0, 1, 2])
+
+    def test_size(self):
+        contexts = [Context(i=i, last_used=i, data="x" * 1000)
+                    for i in range(5)]
+        size = SizeContextEviction.estimate_size(contexts[0])
+        SizeContextEviction(2.5 * size).evict(contexts, 50)
+        self.assertEqual([c.i for c in contexts], [0, 4])
+
+    def test_size_on_disk_is_bounded(self):
+        def saved_size():
+            buffer = BytesIO()
+            handler.write_defaults_file(buffer)
+            return len(buffer.getvalue())
+
+        max_bytes = 20000
+        for eviction, bounded in ((None, False),
+                                  (SizeContextEviction(max_bytes), True)):
+            handler = DomainContextHandler()
+            if eviction is not None:
+                handler.CONTEXT_EVICTION = eviction
+            handler.bind(SimpleWidget)
+            handler.global_contexts = []
+            with patch.object(handler, "write_defaults"):
+                for i in range(200):
+                    widget = SimpleWidget()
+                    widget.retrieveSpecificSettings = Mock()
+                    handler.initialize(widget)
+                    for j in (i, i // 2, i % 13):
+                        handler.open_context(widget, j)
+                        handler.close_context(widget)
+                    handler.update_defaults(widget)
+                    if bounded:
+                        self.assertLess(saved_size(), max_bytes + 1000)
+            self.assertEqual(saved_size() < max_bytes, bounded)
+
+
+class IntList(list):
+    pass
+
+
+Row = namedtuple("Row", ["c{}".format(i)
+                         for i in range(CompressedValue.threshold)])
+
+
+class TestCompressedValue(TestCase):
+    def assertRoundTrip(self, value, kind):
+        encoded = CompressedValue.encode(value)
+        self.assertIsInstance(encoded, CompressedValue)
+        self.assertEqual(encoded.kind, kind)
+        encoded = pickle.loads(pickle.dumps(encoded))
+        decoded = encoded.decode()
+        self.assertIs(type(decoded), type(value))
+        if isinstance(value, np.ndarray):
+            np.testing.assert_equal(decoded, value)
+            self.assertEqual(decoded.dtype, value.dtype)
+            self.assertTrue(decoded.flags.writeable)
+        else:
+            self.assertEqual(decoded, value)
+        return encoded
+
+    def test_ranges(self):
+        indices = set(range(100000)) - {5, 500, 50000}
+        encoded = self.assertRoundTrip(indices, "ranges")
+        self.assertLess(len(encoded.data), 100)
+        self.assertRoundTrip(frozenset(range(-1500, 1500, 3)), "ranges")
+        self.assertRoundTrip([5, 6, 7, 1, 2] * 1000, "ranges")
+        self.assertRoundTrip(tuple(range(2000, 0, -1)), "ranges")
+        self.assertRoundTrip([2 ** 70] * 1000, "pickle")
+
+    def test_ranges_keep_booleans(self):
+        value = [True, False] * 1000 + [5]
+        decoded = self.assertRoundTrip(value, "pickle").decode()
+        self.assertIs(decoded[0], True)
+        self.assertRoundTrip([np.bool_(True)] + [5] * 1000, "pickle")
+
+    def test_ranges_keep_subclasses(self):
+        self.assertRoundTrip(Row(*range(CompressedValue.threshold)), "pickle")
+        self.assertRoundTrip(IntList(range(2000)), "pickle")
+
+    def test_array(self):
+        self.assertRoundTrip(np.arange(5000, dtype=float).reshape(50, 100),
+                             "array")
+        self.assertRoundTrip(np.zeros(2000, dtype=">i2"), "array")
+        self.assertRoundTrip(np.array(["a"] * 2000, dtype=object), "pickle")
+
+    def test_pickle(self):
+        self.assertRoundTrip([("attr{}".format(i), 2) for i in range(2000)],
+                             "pickle")
+        self.assertRoundTrip({i: str(i) for i in range(2000)}, "pickle")
+
+    def test_small_values_are_copied(self):
+        for value in ([1, 2], {1, 2}, np.arange(10), "abc", 42):
+            encoded = CompressedValue.encode(value)
+            self.assertNotIsInstance(encoded, CompressedValue)
+            self.assertIs(type(encoded), type(value))
+
+    def test_handler(self):
+        handler = ContextHandler()
+        value = set(range(2000))
+        setting = ContextSetting(set())
+        self.assertEqual(handler.encode_setting(None, setting, value), value)
+        setting = ContextSetting(set(), compress=True)
+        encoded = handler.encode_setting(None, setting, value)
+        self.assertEqual(encoded, CompressedValue.encode(value))
+        self.assertEqual(handler.decode_setting(setting, encoded), value)
+        self.assertEqual(handler.decode_setting(setting, [1]), [1])
+
+
+class Uncopyable:
+    def __deepcopy__(self, memo):
+        raise AssertionError("stored value was copied")
+
+
+class TestCopyOnWrite(TestCase):
+    @staticmethod
+    def stored_settings():
+        return dict(
+            setting=[1, 2],
+            component=dict(int_setting=5),
+            context_settings=[
+                Context(attrs={"a": 1}, values=dict(context_setting=[i],
+                                                   foo=[i], **{VERSION_KEY: 1}))
+                for i in range(3)])
+
+    def test_initialize_does_not_change_stored_settings(self):
+        handler = ContextHandler()
+        handler.bind(SimpleWidget)
+        stored = self.stored_settings()
+        contexts = stored["context_settings"]
+        widget = SimpleWidget()
+        handler.initialize(widget, CopyOnWriteDict(stored))
+        self.assertEqual(widget.setting, [1, 2])
+        self.assertEqual(widget.component.int_setting, 5)
+        self.assertIsInstance(widget.context_settings, CopyOnWriteList)
+        self.assertEqual(len(widget.context_settings), 3)
+
+        widget.setting.append(3)
+        context = widget.context_settings[1]
+        context.values["context_setting"].append(42)
+        context.values["bar"] = 1
+        del widget.context_settings[0]
+        widget.context_settings.insert(0, Context())
+        self.assertEqual(stored, self.stored_settings())
+        self.assertEqual(contexts, stored["context_settings"])
+
+        # contexts' descriptions are shared; values are copied on access
+        self.assertIs(context.attrs, contexts[1].attrs)
+        self.assertIsNot(context.values, contexts[1].values)
+        self.assertIs(dict.__getitem__(context.values, "foo"),
+                      contexts[1].values["foo"])
+        self.assertNotIn(VERSION_KEY, context.values)
+
+    def test_unused_values_are_shared(self):
+        handler = ContextHandler()
+        handler.bind(SimpleWidget)
+        stored = self.stored_settings()
+        stored["unused"] = Uncopyable()
+        data = handler._add_defaults(CopyOnWriteDict(stored))
+        self.assertIs(dict.__getitem__(data, "unused"), stored["unused"])
+        self.assertIs(dict.__getitem__(data, "context_settings"),
+                      stored["context_settings"])
+
+        widget = SimpleWidget()
+        handler.initialize(widget, CopyOnWriteDict(stored))
+        self.assertEqual(widget.setting, [1, 2])
+
+    def test_index_does_not_copy_stored_contexts(self):
+        handler = ContextHandler()
+        handler.match = \
+            lambda context, i: handler.PERFECT_MATCH if context.i == i else 0
+        handler.fingerprint = lambda i: i
+        handler.context_fingerprint = lambda context: context.i
+        stored = [Context(i=i) for i in range(5)]
+        widget = SimpleWidget()
+        widget.context_settings = contexts = CopyOnWriteList(stored)
+
+        context, new = handler.find_or_create_context(widget, 3)
+        self.assertFalse(new)
+        self.assertEqual(context.i, 3)
+        self.assertIsNot(context, stored[3])
+        self.assertEqual(stored[3].use_count, 0)
+        # only the used context was copied
+        self.assertEqual(
+            [list.__getitem__(contexts, i) for i in range(5)],
+            [context] + stored[:3] + stored[4:])
+        self.assertTrue(all(list.__getitem__(contexts, i) is stored[j]
+                            for i, j in zip(range(1, 5), (0, 1, 2, 4))))
+
+        # the index follows contexts copied by the widget
+        copied = contexts[2]
+        self.assertEqual(handler.find_or_create_context(widget, 1),
+                         (copied, False))
+        self.assertIs(contexts[0], copied)
+        self.assertEqual(handler.find_or_create_context(widget, 3),
+                         (context, False))
+
+    def test_copies_are_plain(self):
+        stored = self.stored_settings()
+        data = CopyOnWriteDict(stored)
+        contexts = data["context_settings"]
+        self.assertIsInstance(contexts[0].values, CopyOnWriteDict)
+        for copied in (pickle.loads(pickle.dumps(data)), deepcopy(data)):
+            self.assertIs(type(copied), dict)
+            self.assertIs(type(copied["context_settings"]), list)
+            self.assertIs(type(copied["context_settings"][0].values), dict)
+            self.assertEqual(copied, stored)
+        copied = copy(data)
+        self.assertIs(type(copied), dict)
+        self.assertIs(copied["context_settings"], contexts)
+        self.assertIs(type(dict(data)), dict)
+        self.assertIs(type(list(contexts)), list)
+        self.assertIs(list(contexts)[0], contexts[0])
+
+
 class TestSettingsPrinter(TestCase):
     def test_formats_contexts(self):
         settings = dict(key1=1, key2=2,
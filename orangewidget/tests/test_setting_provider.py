@@ -1,4 +1,5 @@
 import unittest
+from orangewidget.gui import OWComponent
 from orangewidget.settings import Setting, SettingProvider
 
 SHOW_ZOOM_TOOLBAR = "show_zoom_toolbar"
@@ -120,6 +121,16 @@ class SettingProviderTestCase(unittest.TestCase):
             },
         })
 
+    def test_plan(self):
+        plan = default_provider.plan
+        self.assertIs(plan, default_provider.plan)
+        self.assertEqual(
+            [(parent, name, provider) for parent, name, provider, *_
+             in plan.groups],
+            [(-1, None, default_provider),
+             (0, GRAPH, default_provider.providers[GRAPH]),
+             (0, ZOOM_TOOLBAR, default_provider.providers[ZOOM_TOOLBAR])])
+
     def test_unpack_settings(self):
         widget = Widget()
         default_provider.unpack(widget, {
@@ -274,6 +285,77 @@ class SettingProviderTestCase(unittest.TestCase):
                 self.assertEqual(provider.settings[name].default, value)
 
 
+class PackCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        class Component(OWComponent):
+            int_setting = Setting(1)
+            list_setting = Setting([])
+
+            def __init__(self):
+                super().__init__()
+                provider.providers["component"].initialize(self)
+
+        class CachedWidget(OWComponent):
+            str_setting = Setting("a")
+            component = SettingProvider(Component)
+
+            def __init__(self):
+                super().__init__()
+                provider.initialize(self)
+                self.component = Component()
+
+        provider = SettingProvider(CachedWidget)
+        self.provider = provider
+        self.widget = CachedWidget()
+
+    def test_pack_reuses_values(self):
+        provider, widget = self.provider, self.widget
+        packed = provider.pack(widget)
+        self.assertEqual(
+            packed,
+            {"str_setting": "a",
+             "component": {"int_setting": 1, "list_setting": []}})
+        self.assertEqual(provider.pack_statistics(), (0, 2))
+
+        self.assertEqual(provider.pack(widget), packed)
+        self.assertEqual(provider.pack_statistics(), (2, 2))
+
+        # packed dicts are not shared between packs
+        provider.pack(widget)["component"]["int_setting"] = 42
+        self.assertEqual(provider.pack(widget), packed)
+
+    def test_pack_reads_changed_values(self):
+        provider, widget = self.provider, self.widget
+        provider.pack(widget)
+
+        widget.component.int_setting = 2
+        widget.component.list_setting.append(3)
+        self.assertEqual(
+            provider.pack(widget),
+            {"str_setting": "a",
+             "component": {"int_setting": 2, "list_setting": [3]}})
+        # only the component whose setting was assigned is re-read
+        self.assertEqual(provider.pack_statistics(), (1, 3))
+
+        widget.component.list_setting = [4]
+        widget.str_setting = "b"
+        self.assertEqual(
+            provider.pack(widget),
+            {"str_setting": "b",
+             "component": {"int_setting": 2, "list_setting": [4]}})
+        self.assertEqual(provider.pack_statistics(), (1, 5))
+
+    def test_pack_with_packer_does_not_use_cache(self):
+        provider, widget = self.provider, self.widget
+        provider.pack(widget)
+
+        def packer(setting, instance):
+            yield setting.name, getattr(instance, setting.name)
+
+        provider.pack(widget, packer=packer)
+        self.assertEqual(provider.pack_statistics(), (0, 2))
+
+
 def initialize_settings(instance):
     """This is usually done in Widget's new,
     but we avoid all that complications for tests."""
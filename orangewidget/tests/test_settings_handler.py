@@ -1,7 +1,9 @@
 # pylint: disable=protected-access
+import logging
 import os
 import pickle
-from tempfile import mkstemp, NamedTemporaryFile
+import threading
+from tempfile import mkstemp, NamedTemporaryFile, TemporaryDirectory
 
 import unittest
 from unittest.mock import patch, Mock
@@ -11,7 +13,9 @@ from AnyQt.QtCore import pyqtSignal as Signal, QObject
 
 from orangewidget.tests.base import named_file, override_default_settings
 from orangewidget.settings import SettingsHandler, Setting, SettingProvider,\
-    VERSION_KEY, rename_setting, Context
+    VERSION_KEY, rename_setting, Context, SettingsWriter, set_settings_writer,\
+    SettingsStore, set_settings_store, migration_statistics, \
+    clear_migration_cache, _migration_cache, CopyOnWriteDict
 
 
 class SettingHandlerTestCase(unittest.TestCase):
@@ -353,6 +357,294 @@ class SettingHandlerTestCase(unittest.TestCase):
         self.assertEqual(2, fn.call_count)
 
 
+class MigrationCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        clear_migration_cache()
+
+    def tearDown(self):
+        clear_migration_cache()
+
+    def test_initialize_reuses_migrations(self):
+        handler = SettingsHandler()
+        with override_default_settings(SimpleWidget):
+            handler.bind(SimpleWidget)
+
+        versions = []
+
+        def migrate_settings(settings, version):
+            versions.append(version)
+            settings["setting"] = settings.pop("value")
+
+        stored = {"value": 5, "list_setting": [1]}
+        with patch.object(SimpleWidget, "migrate_settings", migrate_settings):
+            for _ in range(3):
+                widget = SimpleWidget()
+                handler.initialize(widget, CopyOnWriteDict(stored))
+                self.assertEqual(widget.setting, 5)
+                self.assertEqual(widget.list_setting, [1])
+                widget.list_setting.append(2)
+            self.assertEqual(stored, {"value": 5, "list_setting": [1]})
+            # pickles are keyed by their content
+            for _ in range(2):
+                handler.initialize(SimpleWidget(), pickle.dumps({"value": 6}))
+            # settings with unknown source and up-to-date settings are not
+            # cached
+            handler.initialize(SimpleWidget(), {"value": 5})
+            handler.initialize(SimpleWidget(), {"value": 5, VERSION_KEY: 1})
+            self.assertEqual(versions, [0, 0, 0, 1])
+
+        stats = migration_statistics()[handler._get_settings_key()]
+        self.assertEqual(stats.migrations, 7)
+        self.assertEqual(stats.cache_hits, 3)
+        self.assertGreater(stats.time, 0)
+
+    def test_cache_is_bounded(self):
+        handler = SettingsHandler()
+        with override_default_settings(SimpleWidget):
+            handler.bind(SimpleWidget)
+
+        def migrate_settings(settings, version):
+            settings["setting"] = settings.pop("value")
+
+        stored = [{"value": i} for i in range(20)]
+        with patch.object(SimpleWidget, "migrate_settings", migrate_settings), \
+                patch.object(_migration_cache, "maxsize", 10):
+            for data in stored:
+                handler.initialize(SimpleWidget(), CopyOnWriteDict(data))
+            self.assertEqual(len(_migration_cache.results), 10)
+            # the most recent results are kept
+            handler.initialize(SimpleWidget(), CopyOnWriteDict(stored[19]))
+            handler.initialize(SimpleWidget(), CopyOnWriteDict(stored[0]))
+        stats = migration_statistics()[handler._get_settings_key()]
+        self.assertEqual(stats.cache_hits, 1)
+
+    def test_read_defaults_reuses_migrations(self):
+        handler = SettingsHandler()
+        handler.widget_class = SimpleWidget
+        handler.provider = SettingProvider(SimpleWidget)
+
+        migrate_settings = Mock()
+        with patch.object(SimpleWidget, "migrate_settings", migrate_settings), \
+                override_default_settings(SimpleWidget, {"value": 42}):
+            handler.read_defaults()
+            handler.read_defaults()
+            migrate_settings.assert_called_once()
+            self.assertEqual(handler.defaults, {"value": 42})
+
+    def test_failed_migration_keeps_stored_defaults(self):
+        handler = SettingsHandler()
+        handler.widget_class = SimpleWidget
+        handler.provider = SettingProvider(SimpleWidget)
+
+        def migrate_settings(settings, version):
+            raise ValueError
+
+        with override_default_settings(SimpleWidget, {"old_name": 5}), \
+                patch.object(SimpleWidget, "migrate_settings",
+                             migrate_settings), \
+                patch("sys.excepthook"):
+            handler.read_defaults()
+            self.assertEqual(handler.defaults, {})
+            with open(handler._get_settings_filename(), "rb") as f:
+                self.assertEqual(pickle.load(f),
+                                 {"old_name": 5})
+
+    def test_read_defaults_writes_migrated_defaults(self):
+        handler = SettingsHandler()
+        handler.widget_class = SimpleWidget
+        handler.provider = SettingProvider(SimpleWidget)
+
+        with override_default_settings(SimpleWidget, {"value": 42}):
+            # without a writer, defaults are not written at class set-up
+            with patch.object(SettingsHandler, "write_defaults") as write:
+                handler.read_defaults()
+                write.assert_not_called()
+
+            writer = SettingsWriter()
+            set_settings_writer(writer)
+            try:
+                handler.read_defaults()
+                self.assertTrue(writer.flush(5))
+            finally:
+                set_settings_writer(None)
+            with open(handler._get_settings_filename(), "rb") as f:
+                self.assertEqual(pickle.load(f),
+                                 {"value": 42, VERSION_KEY: 1})
+
+            with patch.object(SettingsHandler, "write_defaults") as write:
+                handler.read_defaults()
+                write.assert_not_called()
+
+
+class SettingsWriterTestCase(unittest.TestCase):
+    def test_write(self):
+        writer = SettingsWriter()
+        with TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "widgets", "a.pickle")
+            writer.write(filename, b"foo")
+            self.assertTrue(writer.flush(5))
+            with open(filename, "rb") as f:
+                self.assertEqual(f.read(), b"foo")
+            # temporary files are removed
+            self.assertEqual(os.listdir(os.path.dirname(filename)),
+                             ["a.pickle"])
+        self.assertEqual(writer.written, 1)
+
+    def test_write_coalesces(self):
+        writer = SettingsWriter()
+        started, resume = threading.Event(), threading.Event()
+        written = []
+
+        def write_file(filename, data):
+            started.set()
+            resume.wait(5)
+            written.append((filename, data))
+            return True
+
+        writer._write_file = write_file
+        writer.write("a", b"1")
+        started.wait(5)
+        # the first write is in progress; the rest are queued
+        writer.write("a", b"2")
+        writer.write("b", b"1")
+        writer.write("a", b"3")
+        self.assertFalse(writer.flush(0.01))
+        resume.set()
+        self.assertTrue(writer.flush(5))
+        self.assertEqual(written, [("a", b"1"), ("b", b"1"), ("a", b"3")])
+        self.assertEqual(writer.written, 3)
+        self.assertEqual(writer.coalesced, 1)
+
+    def test_write_error(self):
+        writer = SettingsWriter()
+        written = []
+
+        def write(target, data):
+            if data == b"1":
+                raise pickle.PicklingError
+            written.append((target, data))
+            return True
+
+        with self.assertLogs("orangewidget.settings", logging.ERROR):
+            writer.write("a", b"1", write)
+            self.assertTrue(writer.flush(5))
+        # the writer still works
+        writer.write("a", b"2", write)
+        self.assertTrue(writer.flush(5))
+        self.assertEqual(written, [("a", b"2")])
+        self.assertEqual(writer.written, 1)
+
+    def test_write_defaults_uses_writer(self):
+        handler = SettingsHandler()
+        handler.widget_class = SimpleWidget
+        handler.defaults = {'a': 5}
+        handler._get_settings_filename = lambda: "foo.pickle"
+        writer = Mock()
+        set_settings_writer(writer)
+        try:
+            handler.write_defaults()
+        finally:
+            set_settings_writer(None)
+        writer.write.assert_called_once()
+        filename, data = writer.write.call_args[0]
+        self.assertEqual(filename, "foo.pickle")
+        self.assertEqual(pickle.loads(data),
+                         {'a': 5, VERSION_KEY: SimpleWidget.settings_version})
+        writer.flush.assert_called_once_with()
+
+
+class SettingsStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "settings.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_read_write(self):
+        store = SettingsStore(self.filename)
+        self.assertIsNone(store.read("a"))
+        self.assertTrue(store.write("a", b"foo"))
+        self.assertTrue(store.write("b", b"bar"))
+        self.assertTrue(store.write("a", b"baz"))
+        self.assertEqual(store.read("a"), b"baz")
+        self.assertEqual(store.keys(), ["a", "b"])
+        store.close()
+
+        # another process (connection) sees the same data
+        other = SettingsStore(self.filename)
+        self.assertEqual(other.read("b"), b"bar")
+        other.clear()
+        self.assertEqual(other.keys(), [])
+        self.assertIsNone(store.read("a"))
+        store.close()
+        other.close()
+
+    def test_clear_discard_writes(self):
+        store = SettingsStore(self.filename)
+        store.write("a", b"foo")
+        store.clear(discard_writes=True)
+        self.assertFalse(store.write("a", b"foo"))
+        self.assertIsNone(store.read("a"))
+        store.close()
+
+    def test_import_legacy(self):
+        legacy = os.path.join(self.tmpdir.name, "legacy")
+        os.makedirs(legacy)
+        for name, data in (("a.b.pickle", b"foo"), ("c.pickle", b"bar"),
+                           ("DELETE_ON_START", b"")):
+            with open(os.path.join(legacy, name), "wb") as f:
+                f.write(data)
+        store = SettingsStore(self.filename, legacy)
+        self.assertEqual(store.keys(), ["a.b", "c"])
+        self.assertEqual(store.read("a.b"), b"foo")
+        store.write("c", b"baz")
+        store.close()
+
+        # files are imported only once
+        store = SettingsStore(self.filename, legacy)
+        self.assertEqual(store.read("c"), b"baz")
+        store.close()
+
+    def test_corrupt_database(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"not a database" * 100)
+        store = SettingsStore(self.filename)
+        with self.assertLogs("orangewidget.settings", logging.ERROR):
+            self.assertEqual(store.keys(), [])
+        with self.assertLogs("orangewidget.settings", logging.ERROR):
+            self.assertFalse(store.clear(discard_writes=True))
+        with self.assertLogs("orangewidget.settings", logging.ERROR):
+            self.assertIsNone(store.read("a"))
+        store.close()
+
+    def test_settings_handler(self):
+        store = SettingsStore(self.filename)
+        set_settings_store(store)
+        try:
+            handler = SettingsHandler.create(SimpleWidget)
+            handler.defaults["setting"] = 13
+            handler.write_defaults()
+            self.assertEqual(store.keys(), [handler._get_settings_key()])
+
+            handler = SettingsHandler.create(SimpleWidget)
+            self.assertEqual(handler.defaults["setting"], 13)
+
+            # with a writer, the store is written in the background
+            writer = SettingsWriter()
+            set_settings_writer(writer)
+            handler.defaults["setting"] = 15
+            handler.write_defaults()
+            self.assertTrue(writer.flush(5))
+            self.assertEqual(writer.written, 1)
+            handler = SettingsHandler.create(SimpleWidget)
+            self.assertEqual(handler.defaults["setting"], 15)
+        finally:
+            set_settings_writer(None)
+            set_settings_store(None)
+            store.close()
+
+
 class Component:
     int_setting = Setting(42)
     schema_only_setting = Setting("only", schema_only=True)
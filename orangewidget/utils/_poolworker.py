@@ -0,0 +1,28 @@
+"""
+Functions that run in worker processes of `ProcessPool`.
+
+This module is imported by worker processes, so it must not import Qt.
+"""
+import os
+
+#: A barrier shared by all workers of the pool, set by `initialize`
+_barrier = None
+
+
+def initialize(barrier, initializer, initargs):
+    """Initialize a worker process and call the user's `initializer`."""
+    global _barrier
+    _barrier = barrier
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def wait_for_workers(timeout):
+    """
+    Wait until this function runs in all workers and return the process id.
+
+    A worker that runs it is blocked, so each call runs in a different
+    worker.
+    """
+    _barrier.wait(timeout)
+    return os.getpid()
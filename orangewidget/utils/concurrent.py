@@ -3,22 +3,31 @@ General helper functions and classes for PyQt concurrent programming
 """
 # TODO: Rename the module to something that does not conflict with stdlib
 # concurrent
-from typing import Callable, Any, List, Optional
+from typing import Callable, Any, List, Optional, Set, Dict, NamedTuple
+import os
+import sys
+import time
 import threading
 import logging
 import warnings
 import weakref
+import multiprocessing
+from collections import deque
 from functools import partial
+from types import SimpleNamespace
 import concurrent.futures
 from concurrent.futures import Future, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 from AnyQt.QtCore import (
     Qt, QObject, QMetaObject, QThreadPool, QThread, QRunnable, QSemaphore,
-    QCoreApplication, QEvent, Q_ARG,
+    QCoreApplication, QEvent, QTimer, Q_ARG,
     pyqtSignal as Signal, pyqtSlot as Slot
 )
 from AnyQt import sip
 
+from orangewidget.utils import sharedarrays, _poolworker
+
 _log = logging.getLogger(__name__)
 
 
@@ -113,6 +122,603 @@ class FutureRunnable(QRunnable):
             log.critical("Exception in worker thread.", exc_info=True)
 
 
+class TaskState(QObject, PyOwned):
+    """
+    The state of a background task, shared by the task (in a worker thread)
+    and the GUI thread.
+
+    The task reports progress and partial results with `set_progress` and
+    `set_partial_result`, and checks `is_interruption_requested` to stop
+    early. Updates are forwarded to the thread of this object (by
+    `progressChanged` and `partialResultReady`) at most every `interval`
+    milliseconds; only the latest values are emitted.
+
+    The state must be created in the GUI thread; see :obj:`start_task`.
+
+    Parameters
+    ----------
+    interval : int
+        The minimal interval (in ms) between emissions of updates
+    parent : Optional[QObject]
+        Parent object
+
+    Example
+    -------
+    >>> def task(state, n):
+    ...     for i in range(n):
+    ...         if state.is_interruption_requested():
+    ...             return None
+    ...         state.set_progress(100 * i / n)
+    ...     return n
+    >>> future = start_task(task, 1000)
+    >>> future.state.progressChanged.connect(widget.progressBarSet)
+    """
+    #: Signal emitted with the progress (in percents) set by the task;
+    #: can be connected to `ProgressBarMixin.progressBarSet`
+    progressChanged = Signal(float)
+
+    #: Signal emitted with the partial result set by the task
+    partialResultReady = Signal(object)
+
+    def __init__(self, interval=100, parent=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.__interruption_requested = False
+        self.__lock = threading.Lock()
+        # latest values not yet emitted, by signal name
+        self.__pending = {}  # type: Dict[str, Any]
+        self.__posted = False
+        self.__timer = QTimer(self, singleShot=True, interval=interval)
+        self.__timer.timeout.connect(self.__emitpending)
+        self.__schedule_emit = methodinvoke(self, "__emitpending", ())
+
+    def is_interruption_requested(self):
+        # type: () -> bool
+        """Should the task stop (e.g. because its future was cancelled)."""
+        return self.__interruption_requested
+
+    def request_interruption(self):
+        """Request the task to stop."""
+        self.__interruption_requested = True
+
+    def set_progress(self, progress):
+        # type: (float) -> None
+        """Set the progress of the task, in percents."""
+        self.__set_pending("progressChanged", float(progress))
+
+    def set_partial_result(self, result):
+        # type: (Any) -> None
+        """Set a partial result of the task."""
+        self.__set_pending("partialResultReady", result)
+
+    def __set_pending(self, name, value):
+        with self.__lock:
+            self.__pending[name] = value
+            post = not self.__posted
+            self.__posted = True
+        if post:
+            try:
+                self.__schedule_emit()
+            except RuntimeError:  # pragma: no cover
+                # the C++ object was deleted; nobody is listening
+                pass
+
+    @Slot()
+    def __emitpending(self):
+        assert QThread.currentThread() is self.thread()
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+            if not pending and not self.__timer.isActive():
+                self.__posted = False
+        if not pending:
+            return
+        # updates set meanwhile are emitted on timeout
+        self.__timer.start()
+        if "progressChanged" in pending:
+            self.progressChanged.emit(pending["progressChanged"])
+        if "partialResultReady" in pending:
+            self.partialResultReady.emit(pending["partialResultReady"])
+
+    def flush(self):
+        """
+        Emit the pending updates now.
+
+        Must only be called from the thread of this object.
+        """
+        if QThread.currentThread() is not self.thread():
+            raise RuntimeError("`flush()` called from a wrong thread.")
+        self.__emitpending()
+
+
+class TaskFuture(Future):
+    """
+    A `Future` of a task started with :obj:`start_task`. Cancelling the
+    future also requests interruption of the task, if it is already
+    running.
+    """
+    def __init__(self, state):
+        # type: (TaskState) -> None
+        super().__init__()
+        #: The state of the task
+        self.state = state
+
+    def cancel(self):
+        """
+        Reimplemented from `Future.cancel`.
+
+        If the task is already running, it can not be cancelled, but it is
+        requested to stop, and the method returns `False`.
+        """
+        self.state.request_interruption()
+        return super().cancel()
+
+
+def start_task(func, *args, pool=None, interval=100, **kwargs):
+    # type: (Callable, Any, Optional[QThreadPool], int, Any) -> TaskFuture
+    """
+    Run `func(state, *args, **kwargs)` in a thread of `pool` (by default,
+    the global thread pool), where `state` is a new :class:`TaskState`,
+    and return a future for its result.
+
+    Must be called from the GUI thread. The state is available as the
+    future's `state` attribute and forwards updates at most every
+    `interval` ms.
+    """
+    state = TaskState(interval=interval)
+    future = TaskFuture(state)
+    runnable = FutureRunnable(future, func, (state,) + args, kwargs)
+    if pool is None:
+        pool = QThreadPool.globalInstance()
+    pool.start(runnable)
+    return future
+
+
+class ProcessPool:
+    """
+    A pool of worker processes for CPU-bound tasks.
+
+    Unlike `FutureRunnable` in a `QThreadPool`, tasks run in separate
+    processes and are not limited by the GIL. `submit` returns a
+    `concurrent.futures.Future`, which can be watched by `FutureWatcher`
+    and `FutureSetWatcher`.
+
+    Worker processes are started with the 'spawn' method (forking a
+    process with a running Qt application is not safe), so functions,
+    arguments and results must be picklable; functions must be importable,
+    i.e. defined at the module level. The workers are reused for
+    subsequent tasks; `warm_up` starts them in advance. If a worker dies,
+    the pending futures fail with `BrokenProcessPool` and the next `submit`
+    starts new workers.
+
+    An exception raised by a task is set on its future; its `__cause__`
+    contains the formatted traceback from the worker. Large numpy arrays
+    can be returned without pickling with `submit_shared`.
+
+    Parameters
+    ----------
+    max_workers : Optional[int]
+        The number of worker processes (default: the number of CPUs)
+    initializer : Optional[Callable]
+        A function called in each worker process when it starts (not
+        supported on Python 3.6)
+    initargs : tuple
+        Arguments for `initializer`
+    context : str
+        The multiprocessing start method
+
+    Example
+    -------
+    >>> pool = ProcessPool(max_workers=2)
+    >>> watcher = FutureWatcher(pool.submit(pow, 2, 10))
+    >>> watcher.resultReady.connect(print)
+    """
+    #: Arrays smaller than this (in bytes) are pickled by `submit_shared`
+    shared_array_min_size = sharedarrays.DEFAULT_MIN_SIZE
+
+    def __init__(self, max_workers=None, initializer=None, initargs=(),
+                 context="spawn"):
+        # type: (Optional[int], Optional[Callable], tuple, str) -> None
+        if initializer is not None and sys.version_info < (3, 7):
+            raise RuntimeError("'initializer' requires Python 3.7")
+        self.__max_workers = max_workers or os.cpu_count() or 1
+        self.__initializer = initializer
+        self.__initargs = tuple(initargs)
+        self.__context = context
+        self.__executor = None  # type: Optional[concurrent.futures.Executor]
+        self.__barrier = None
+        # warm-up tasks that did not finish in time
+        self.__warm_up_pending = []  # type: List[Future]
+        self.__futures = weakref.WeakSet()  # type: Set[Future]
+        self.__lock = threading.Lock()
+
+    @property
+    def max_workers(self):
+        # type: () -> int
+        """The number of worker processes."""
+        return self.__max_workers
+
+    def __get_executor(self):
+        if self.__executor is not None:
+            return self.__executor
+        if sys.version_info >= (3, 7):
+            context = multiprocessing.get_context(self.__context)
+            self.__barrier = context.Barrier(self.__max_workers)
+            kwargs = dict(
+                mp_context=context, initializer=_poolworker.initialize,
+                initargs=(self.__barrier, self.__initializer, self.__initargs))
+        else:  # pragma: no cover
+            kwargs = {}
+        self.__executor = concurrent.futures.ProcessPoolExecutor(
+            self.__max_workers, **kwargs)
+        return self.__executor
+
+    def submit(self, func, *args, **kwargs):
+        # type: (Callable, Any, Any) -> Future
+        """
+        Schedule `func(*args, **kwargs)` to run in a worker process and
+        return a `Future` for its result.
+        """
+        with self.__lock:
+            try:
+                future = self.__get_executor().submit(func, *args, **kwargs)
+            except BrokenProcessPool:
+                # the broken executor has already stopped its workers
+                _log.warning("A worker process died; restarting the pool.")
+                self.__executor = None
+                future = self.__get_executor().submit(func, *args, **kwargs)
+            self.__futures.add(future)
+        return future
+
+    def submit_shared(self, func, *args, **kwargs):
+        # type: (Callable, Any, Any) -> Future
+        """
+        Like `submit`, but transfer numpy arrays (of at least
+        `shared_array_min_size` bytes) in the result through shared memory
+        instead of pickling them. The result contains arrays that are
+        views into shared memory, which is released when they are garbage
+        collected.
+
+        See :mod:`orangewidget.utils.sharedarrays` for supported results
+        and platforms; on platforms without shared memory this is the same
+        as `submit`.
+        """
+        if not sharedarrays.SHARED_MEMORY_SUPPORTED:  # pragma: no cover
+            return self.submit(func, *args, **kwargs)
+        inner = self.submit(sharedarrays.call_sharing_arrays, func, args,
+                            kwargs, self.shared_array_min_size)
+        outer = Future()
+
+        def on_outer_done(f):
+            if f.cancelled():
+                inner.cancel()
+
+        def on_inner_done(f):
+            if f.cancelled():
+                outer.cancel()
+                return
+            if f.exception() is not None:
+                if outer.set_running_or_notify_cancel():
+                    outer.set_exception(f.exception())
+                return
+            if not outer.set_running_or_notify_cancel():
+                # nobody will use the result
+                sharedarrays.release_arrays(f.result())
+                return
+            try:
+                result = sharedarrays.restore_arrays(f.result())
+            except BaseException as ex:  # pylint: disable=broad-except
+                outer.set_exception(ex)
+            else:
+                outer.set_result(result)
+
+        outer.add_done_callback(on_outer_done)
+        inner.add_done_callback(on_inner_done)
+        return outer
+
+    def warm_up(self, timeout=None):
+        # type: (Optional[float]) -> Set[int]
+        """
+        Start the worker processes (if not running already) and wait until
+        all of them are ready. Return the process ids of the workers that
+        were ready within `timeout` seconds.
+        """
+        with self.__lock:
+            self.__get_executor()
+            barrier = self.__barrier
+        if barrier is None:  # pragma: no cover
+            futures = [self.submit(os.getpid)
+                       for _ in range(self.__max_workers)]
+            done, _ = concurrent.futures.wait(futures, timeout)
+            return {f.result() for f in done if f.exception() is None}
+
+        # tasks of a previous warm-up fail on the broken barrier; it must
+        # not be reset before they run
+        _, pending = concurrent.futures.wait(self.__warm_up_pending, timeout)
+        self.__warm_up_pending = list(pending)
+        if pending:
+            return set()
+        if barrier.broken:
+            barrier.reset()
+        futures = [self.submit(_poolworker.wait_for_workers, timeout)
+                   for _ in range(self.__max_workers)]
+        done, pending = concurrent.futures.wait(futures, timeout)
+        if pending:
+            # release the workers that are waiting for the others
+            self.__barrier.abort()
+            self.__warm_up_pending = [f for f in pending if not f.cancel()]
+        return {f.result() for f in done if f.exception() is None}
+
+    def cancel_pending(self):
+        # type: () -> int
+        """
+        Cancel the tasks that have not started yet and return their number.
+
+        Tasks already running in workers cannot be cancelled.
+        """
+        with self.__lock:
+            futures = list(self.__futures)
+        return sum(future.cancel() for future in futures)
+
+    def shutdown(self, wait=True):
+        # type: (bool) -> None
+        """
+        Cancel the pending tasks and stop the worker processes.
+
+        The pool can still be used; the next `submit` starts new workers.
+        """
+        self.cancel_pending()
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_process_pool = None  # type: Optional[ProcessPool]
+
+
+def process_pool():
+    # type: () -> ProcessPool
+    """
+    Return a process pool shared by all widgets, with a worker for each
+    CPU.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPool()
+    return _process_pool
+
+
+ExecutorStatistics = NamedTuple(
+    "ExecutorStatistics", (("queued", int),
+                           ("running", int),
+                           ("started", int),
+                           ("mean_wait", float),
+                           ("max_wait", float)))
+ExecutorStatistics.__doc__ = """
+Tasks of an owner in `FairShareExecutor`: the number of queued, running and
+started tasks, and the mean and the maximal time (in seconds) that started
+tasks waited in the queue."""
+
+
+class _QueuedTask:
+    __slots__ = ("owner", "future", "func", "args", "kwargs", "submitted")
+
+    def __init__(self, owner, future, func, args, kwargs):
+        self.owner = owner
+        self.future = future
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted = time.perf_counter()
+
+
+class _FairShareRunnable(FutureRunnable):
+    def __init__(self, task, on_done):
+        # type: (_QueuedTask, Callable[[_QueuedTask], None]) -> None
+        super().__init__(task.future, task.func, task.args, task.kwargs)
+        self.__queued = task
+        self.__on_done = on_done
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.__on_done(self.__queued)
+
+
+class FairShareExecutor(concurrent.futures.Executor):
+    """
+    An executor that runs tasks of different owners (e.g. widgets) in a
+    `QThreadPool` with fair sharing of threads.
+
+    Each owner has its own queue. When a thread is free, the next task is
+    taken from the queues in turns (round robin), skipping owners that
+    already run as many tasks as allowed by their quota, so an owner with
+    many tasks can not starve the others.
+
+    Parameters
+    ----------
+    max_workers : Optional[int]
+        The number of threads (default: `QThread.idealThreadCount()`)
+    quota : Optional[int]
+        The default maximal number of concurrently running tasks of a
+        single owner; `None` for no limit (except `max_workers`)
+    """
+    def __init__(self, max_workers=None, quota=None):
+        # type: (Optional[int], Optional[int]) -> None
+        super().__init__()
+        self.__max_workers = max_workers or QThread.idealThreadCount()
+        self.__pool = QThreadPool()
+        self.__pool.setMaxThreadCount(self.__max_workers)
+        self.__default_quota = quota
+        self.__lock = threading.Lock()
+        self.__shutdown = False
+        self.__queues = {}  # type: Dict[Any, deque]
+        # owners with queued tasks, in the order of their turns
+        self.__turns = deque()  # type: deque
+        self.__quotas = {}  # type: Dict[Any, int]
+        self.__running = {}  # type: Dict[Any, int]
+        self.__nrunning = 0
+        # owner -> [started, total wait, max wait]
+        self.__waits = {}  # type: Dict[Any, List]
+
+    @property
+    def max_workers(self):
+        # type: () -> int
+        """The number of threads."""
+        return self.__max_workers
+
+    def set_quota(self, owner, quota):
+        # type: (Any, Optional[int]) -> None
+        """
+        Set the maximal number of concurrently running tasks of the `owner`;
+        `None` resets it to the default.
+        """
+        with self.__lock:
+            if quota is None:
+                self.__quotas.pop(owner, None)
+            else:
+                self.__quotas[owner] = quota
+        self.__dispatch()
+
+    def quota(self, owner):
+        # type: (Any) -> Optional[int]
+        """Return the quota of the `owner`."""
+        return self.__quotas.get(owner, self.__default_quota)
+
+    def submit(self, func, *args, **kwargs):
+        # type: (Callable, Any, Any) -> Future
+        """
+        Reimplemented from `Executor.submit`.
+
+        Submit the task without an owner; such tasks share a queue.
+        """
+        return self.submit_for(None, func, *args, **kwargs)
+
+    def submit_for(self, owner, func, *args, **kwargs):
+        # type: (Any, Callable, Any, Any) -> Future
+        """
+        Schedule `func(*args, **kwargs)` as a task of the `owner` (a
+        hashable object, e.g. a widget) and return a `Future` for its
+        result.
+        """
+        future = Future()
+        task = _QueuedTask(owner, future, func, args, kwargs)
+        with self.__lock:
+            if self.__shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            queue = self.__queues.get(owner)
+            if queue is None:
+                queue = self.__queues[owner] = deque()
+                self.__turns.append(owner)
+            queue.append(task)
+        self.__dispatch()
+        return future
+
+    def cancel(self, owner):
+        # type: (Any) -> int
+        """
+        Cancel the queued tasks of the `owner` and return their number.
+        Running tasks are not affected.
+        """
+        with self.__lock:
+            queue = self.__queues.pop(owner, ())
+            if queue:
+                self.__turns.remove(owner)
+        return sum(task.future.cancel() for task in queue)
+
+    def __next_task(self):
+        # type: () -> Optional[_QueuedTask]
+        # Must be called with the lock held
+        turns = self.__turns
+        for _ in range(len(turns)):
+            owner = turns[0]
+            turns.rotate(-1)
+            quota = self.quota(owner)
+            if quota is not None and self.__running.get(owner, 0) >= quota:
+                continue
+            queue = self.__queues[owner]
+            task = None
+            while queue and task is None:
+                task = queue.popleft()
+                if task.future.cancelled():
+                    task = None
+            if not queue:
+                del self.__queues[owner]
+                turns.remove(owner)
+            if task is not None:
+                return task
+        return None
+
+    def __dispatch(self):
+        start = []
+        with self.__lock:
+            while self.__nrunning < self.__max_workers:
+                task = self.__next_task()
+                if task is None:
+                    break
+                owner = task.owner
+                self.__running[owner] = self.__running.get(owner, 0) + 1
+                self.__nrunning += 1
+                wait = time.perf_counter() - task.submitted
+                waits = self.__waits.setdefault(owner, [0, 0., 0.])
+                waits[0] += 1
+                waits[1] += wait
+                waits[2] = max(waits[2], wait)
+                start.append(task)
+        for task in start:
+            self.__pool.start(_FairShareRunnable(task, self.__task_done))
+
+    def __task_done(self, task):
+        # type: (_QueuedTask) -> None
+        with self.__lock:
+            owner = task.owner
+            self.__running[owner] -= 1
+            if not self.__running[owner]:
+                del self.__running[owner]
+            self.__nrunning -= 1
+        self.__dispatch()
+
+    def statistics(self):
+        # type: () -> Dict[Any, ExecutorStatistics]
+        """
+        Return statistics of tasks by owners that have queued or running
+        tasks or have started any.
+        """
+        with self.__lock:
+            owners = set(self.__queues) | set(self.__running) \
+                | set(self.__waits)
+            stats = {}
+            for owner in owners:
+                queued = sum(not task.future.cancelled()
+                             for task in self.__queues.get(owner, ()))
+                started, total, max_wait = \
+                    self.__waits.get(owner, (0, 0., 0.))
+                stats[owner] = ExecutorStatistics(
+                    queued, self.__running.get(owner, 0), started,
+                    total / started if started else 0., max_wait)
+        return stats
+
+    def forget(self, owner):
+        """Remove the statistics of an `owner` (e.g. a deleted widget)."""
+        with self.__lock:
+            self.__waits.pop(owner, None)
+
+    def shutdown(self, wait=True):
+        """
+        Reimplemented from `Executor.shutdown`.
+
+        Cancel queued tasks and, if `wait` is `True`, wait for the running
+        tasks to finish.
+        """
+        with self.__lock:
+            self.__shutdown = True
+            owners = list(self.__queues)
+        for owner in owners:
+            self.cancel(owner)
+        if wait:
+            self.__pool.waitForDone()
+
+
 class FutureWatcher(QObject, PyOwned):
     """
     An `QObject` watching the state changes of a `concurrent.futures.Future`
@@ -293,6 +899,11 @@ class FutureSetWatcher(QObject, PyOwned):
     An event loop must be running, otherwise the notifier signals will
     not be emitted.
 
+    Note
+    ----
+    When watching many (e.g. thousands of) short tasks, use `setBatchMode`
+    to report completed futures in batches with `doneBatch`.
+
     Parameters
     ----------
     parent : QObject
@@ -335,6 +946,10 @@ class FutureSetWatcher(QObject, PyOwned):
     #: Signal reporting the current completed count
     progressChanged = Signal([int, int])
 
+    #: Signal emitted in batched mode with the indices and the futures that
+    #: completed since the previous emission.
+    doneBatch = Signal([list, list])
+
     #: Signal emitted when all the futures have completed.
     doneAll = Signal()
 
@@ -343,9 +958,32 @@ class FutureSetWatcher(QObject, PyOwned):
         self.__futures = None
         self.__semaphore = None
         self.__countdone = 0
+        self.__batch = None  # type: Optional[SimpleNamespace]
         if futures is not None:
             self.setFutures(futures)
 
+    def setBatchMode(self, interval=50, size=1000, emitPerFuture=False):
+        # type: (int, int, bool) -> None
+        """
+        Report completed futures in batches instead of one by one.
+
+        Completed futures are collected and reported at most every
+        `interval` milliseconds, or sooner when `size` futures complete,
+        with a single `doneBatch` and `progressChanged` emission. This keeps
+        the event loop responsive when watching a large number of short
+        tasks. Per-future signals (`doneAt`, `resultReadyAt`, ...) are only
+        emitted if `emitPerFuture` is `True`.
+
+        Must be called before `setFutures`.
+        """
+        if self.__futures is not None:
+            raise RuntimeError("futures are already set")
+        timer = QTimer(self, singleShot=True, interval=interval)
+        timer.timeout.connect(self.__drain)
+        self.__batch = SimpleNamespace(
+            size=size, emit_per_future=emitPerFuture, timer=timer,
+            lock=threading.Lock(), pending=[], posted=False)
+
     def setFutures(self, futures):
         # type: (List[Future]) -> None
         """
@@ -361,7 +999,14 @@ class FutureSetWatcher(QObject, PyOwned):
             raise RuntimeError("already set")
         self.__futures = []
         selfweakref = weakref.ref(self)
-        schedule_emit = methodinvoke(self, "__emitpending", (int, Future))
+        if self.__batch is not None:
+            # the callbacks must not hold a (strong) reference to self
+            def schedule_emit(index, f):
+                watcher = selfweakref()
+                if watcher is not None:
+                    watcher.__schedule_drain(index, f)
+        else:
+            schedule_emit = methodinvoke(self, "__emitpending", (int, Future))
 
         # Semaphore counting the number of future that have enqueued
         # done notifications. Used for the `wait` implementation.
@@ -390,16 +1035,8 @@ class FutureSetWatcher(QObject, PyOwned):
             # `futures` was an empty sequence.
             methodinvoke(self, "doneAll", ())()
 
-    @Slot(int, Future)
-    def __emitpending(self, index, future):
+    def __emitfuture(self, index, future):
         # type: (int, Future) -> None
-        assert QThread.currentThread() is self.thread()
-        assert self.__futures[index] is future
-        assert future.done()
-        assert self.__countdone < len(self.__futures)
-        self.__futures[index] = None
-        self.__countdone += 1
-
         if future.cancelled():
             self.cancelledAt.emit(index, future)
             self.doneAt.emit(index, future)
@@ -413,9 +1050,61 @@ class FutureSetWatcher(QObject, PyOwned):
         else:
             assert False
 
+    @Slot(int, Future)
+    def __emitpending(self, index, future):
+        # type: (int, Future) -> None
+        assert QThread.currentThread() is self.thread()
+        assert self.__futures[index] is future
+        assert future.done()
+        assert self.__countdone < len(self.__futures)
+        self.__futures[index] = None
+        self.__countdone += 1
+
+        self.__emitfuture(index, future)
+
+        self.progressChanged.emit(self.__countdone, len(self.__futures))
+
+        if self.__countdone == len(self.__futures):
+            self.doneAll.emit()
+
+    def __schedule_drain(self, index, future):
+        # type: (int, Future) -> None
+        # Called from any thread; post a drain for the first pending future
+        # and when a batch is full, otherwise the timer drains the futures.
+        batch = self.__batch
+        with batch.lock:
+            batch.pending.append((index, future))
+            post = not batch.posted or len(batch.pending) == batch.size
+            batch.posted = True
+        if post:
+            methodinvoke(self, "__drain", ())()
+
+    @Slot()
+    def __drain(self):
+        assert QThread.currentThread() is self.thread()
+        batch = self.__batch
+        with batch.lock:
+            pending, batch.pending = batch.pending, []
+            if not pending and not batch.timer.isActive():
+                batch.posted = False
+        if not pending:
+            return
+        # do not drain again for `interval`; futures completed meanwhile
+        # are drained on timeout
+        batch.timer.start()
+        for index, future in pending:
+            assert self.__futures[index] is future
+            self.__futures[index] = None
+        self.__countdone += len(pending)
+        if batch.emit_per_future:
+            for index, future in pending:
+                self.__emitfuture(index, future)
+        indices, futures = map(list, zip(*pending))
+        self.doneBatch.emit(indices, futures)
         self.progressChanged.emit(self.__countdone, len(self.__futures))
 
         if self.__countdone == len(self.__futures):
+            batch.timer.stop()
             self.doneAll.emit()
 
     def flush(self):
@@ -430,6 +1119,9 @@ class FutureSetWatcher(QObject, PyOwned):
         # NOTE: QEvent.MetaCall is the event implementing the
         # `Qt.QueuedConnection` method invocation.
         QCoreApplication.sendPostedEvents(self, QEvent.MetaCall)
+        if self.__batch is not None:
+            # also the futures that wait for the timer
+            self.__drain()
 
     def wait(self):
         """
@@ -0,0 +1,180 @@
+"""
+Transfer of numpy arrays from worker processes through shared memory.
+
+A task run with :obj:`call_sharing_arrays` copies large arrays in its
+result into shared memory segments and returns their descriptions instead
+of the arrays, so they are not pickled. :obj:`restore_arrays` replaces the
+descriptions with arrays that are views into the segments, without copying.
+A segment is released when the last array that uses it is garbage
+collected.
+
+Shared memory requires Python 3.8 and a POSIX system (see
+:obj:`SHARED_MEMORY_SUPPORTED`); elsewhere, results are pickled.
+
+This module is imported by worker processes, so it must not import Qt.
+"""
+import os
+from typing import NamedTuple, Any, Callable, Iterable, Tuple
+
+import numpy as np
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # Python < 3.8
+    SharedMemory = None
+
+__all__ = [
+    "SHARED_MEMORY_SUPPORTED", "SharedArray", "call_sharing_arrays",
+    "restore_arrays", "release_arrays",
+]
+
+#: Can arrays be transferred through shared memory
+SHARED_MEMORY_SUPPORTED = SharedMemory is not None and os.name == "posix"
+
+#: Arrays smaller than this (in bytes) are pickled
+DEFAULT_MIN_SIZE = 1 << 20
+
+
+SharedArray = NamedTuple(
+    "SharedArray", (("name", str),
+                    ("shape", Tuple[int, ...]),
+                    ("dtype", np.dtype)))
+SharedArray.__doc__ = """
+Description of an array in a shared memory segment with the given name.
+"""
+
+
+class _Segment:
+    """
+    An attached shared memory segment that exposes an array through
+    `__array_interface__`. Arrays created from it keep it as their base,
+    so it is closed when the last of them is garbage collected.
+    """
+    def __init__(self, shared):
+        # type: (SharedArray) -> None
+        self.shm = SharedMemory(shared.name)
+        # the segment's name can be removed right away; the memory is freed
+        # when it is also unmapped
+        self.shm.unlink()
+        dtype = shared.dtype
+        raw = np.frombuffer(self.shm.buf, np.uint8,
+                            count=int(np.prod(shared.shape)) * dtype.itemsize)
+        self.__array_interface__ = dict(
+            version=3, shape=tuple(shared.shape), typestr=dtype.str,
+            data=(raw.ctypes.data, False))
+        if dtype.fields is not None:
+            self.__array_interface__["descr"] = dtype.descr
+        del raw
+
+    def __del__(self):
+        self.shm.close()
+
+
+def _share(obj, min_size, shared):
+    # Descriptions of created segments are appended to `shared`, so they
+    # can be released if sharing a later array fails
+    if isinstance(obj, np.ndarray) and not obj.dtype.hasobject \
+            and obj.nbytes >= max(min_size, 1):
+        shm = SharedMemory(create=True, size=obj.nbytes)
+        try:
+            np.ndarray(obj.shape, obj.dtype, buffer=shm.buf)[...] = obj
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        description = SharedArray(shm.name, obj.shape, obj.dtype)
+        shared.append(description)
+        return description
+    elif type(obj) in (tuple, list):
+        return type(obj)(_share(item, min_size, shared) for item in obj)
+    elif type(obj) is dict:
+        return {key: _share(value, min_size, shared)
+                for key, value in obj.items()}
+    return obj
+
+
+def _shared_arrays(obj):
+    # type: (Any) -> Iterable[SharedArray]
+    if isinstance(obj, SharedArray):
+        yield obj
+    elif type(obj) in (tuple, list):
+        for item in obj:
+            yield from _shared_arrays(item)
+    elif type(obj) is dict:
+        for value in obj.values():
+            yield from _shared_arrays(value)
+
+
+def _release_quietly(descriptions):
+    # type: (Iterable[SharedArray]) -> None
+    # Release segments while handling another error, which must not be
+    # masked if a segment is already gone
+    for description in descriptions:
+        try:
+            release_arrays(description)
+        except OSError:
+            pass
+
+
+def call_sharing_arrays(func, args, kwargs, min_size=DEFAULT_MIN_SIZE):
+    # type: (Callable, tuple, dict, int) -> Any
+    """
+    Call `func(*args, **kwargs)` and put arrays with at least `min_size`
+    bytes into shared memory. Arrays are found in the result and in
+    (nested) tuples, lists and dictionaries.
+
+    To be called in a worker process; the result must be passed to
+    :obj:`restore_arrays` or :obj:`release_arrays` in the main process.
+    If sharing fails, the segments that were already created are released.
+    """
+    result = func(*args, **kwargs)
+    shared = []
+    try:
+        return _share(result, min_size, shared)
+    except BaseException:
+        _release_quietly(shared)
+        raise
+
+
+def _restore(obj, restored):
+    if isinstance(obj, SharedArray):
+        array = np.asarray(_Segment(obj))
+        restored.add(obj.name)
+        return array
+    elif type(obj) in (tuple, list):
+        return type(obj)(_restore(item, restored) for item in obj)
+    elif type(obj) is dict:
+        return {key: _restore(value, restored) for key, value in obj.items()}
+    return obj
+
+
+def restore_arrays(obj):
+    # type: (Any) -> Any
+    """
+    Replace `SharedArray` descriptions in `obj` with arrays in shared
+    memory.
+
+    If restoring fails, the segments that were not restored yet are
+    released; those already restored are freed with their arrays.
+    """
+    restored = set()
+    try:
+        return _restore(obj, restored)
+    except BaseException:
+        _release_quietly(shared for shared in _shared_arrays(obj)
+                         if shared.name not in restored)
+        raise
+
+
+def release_arrays(obj):
+    # type: (Any) -> None
+    """
+    Free the shared memory of `SharedArray` descriptions in `obj` (e.g.
+    results of cancelled tasks).
+    """
+    for shared in _shared_arrays(obj):
+        shm = SharedMemory(shared.name)
+        shm.close()
+        shm.unlink()
+
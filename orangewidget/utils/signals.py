@@ -1,20 +1,22 @@
 import copy
 import itertools
 import warnings
+from contextlib import contextmanager
 from functools import singledispatch
 import inspect
 from typing import (
     NamedTuple, Union, Optional, Iterable, Dict, Tuple, Any, Sequence,
-    Callable
+    Callable, List
 )
 
-from AnyQt.QtCore import Qt
+from AnyQt.QtCore import Qt, QTimer
 
 from orangecanvas.registry.description import (
     InputSignal, OutputSignal, Single, Multiple, Default, NonDefault,
     Explicit, Dynamic
 )
 from orangewidget.workflow.utils import WeakKeyDefaultDict
+from orangewidget.utils.tracing import signal_tracer, payload_type
 
 
 # increasing counter for ensuring the order of Input/Output definitions
@@ -27,6 +29,21 @@ PartialSummary = NamedTuple(
     "PartialSummary", (("summary", Union[None, str, int]),
                        ("details", Optional[str])))
 
+InputChange = NamedTuple(
+    "InputChange", (("kind", str),
+                    ("index", int),
+                    ("value", Any)))
+InputChange.__doc__ = """
+A change of a `MultiInput`, passed to its bulk handler: `kind` is
+"insert", "set" or "remove" and `index` is the position of the
+connection at the time of the change (the changes are applied in order).
+`value` is `None` for removals."""
+
+CoalescingStatistics = NamedTuple(
+    "CoalescingStatistics", (("sent", int),
+                             ("delivered", int),
+                             ("dropped", int)))
+
 
 def base_summarize(_) -> PartialSummary:
     return PartialSummary(None, None)
@@ -238,6 +255,17 @@ class MultiInput(Input):
             "Remove value at index"
             ...
 
+    A widget can also register a bulk handler, which then receives all
+    changes of the input within one propagation step (e.g. all connections
+    when a workflow is loaded) in a single call, as a list of
+    :class:`InputChange`. The insert, set and remove handlers are not called
+    for these changes::
+
+        @Inputs.values.bulk
+        def update_values(self, changes: List[InputChange]):
+            for kind, index, value in changes:
+                ...
+
     Parameters
     ----------
     filter_none: bool
@@ -251,6 +279,7 @@ class MultiInput(Input):
     """
     insert_handler: str = None
     remove_handler: str = None
+    bulk_handler: str = None
 
     def __init__(self, *args, filter_none=False, **kwargs):
         multiple = kwargs.pop("multiple", True)
@@ -302,6 +331,26 @@ class MultiInput(Input):
         self.remove_handler = method.__name__
         return summarize_wrapper if self.auto_summary else method
 
+    def bulk(self, method):
+        """Register the method as the bulk handler"""
+        def summarize_wrapper(widget, changes):
+            if summarize_wrapper is getattr(type(widget), method.__name__):
+                ids = self.__get_summary_ids(widget)
+                for kind, index, value in changes:
+                    if kind == "remove":
+                        id_ = ids.pop(index)
+                        widget.set_partial_input_summary(
+                            self.name, summarize(None), id=id_)
+                        continue
+                    if kind == "insert":
+                        ids.insert(index, next(self.__id_gen))
+                    widget.set_partial_input_summary(
+                        self.name, summarize(value), id=ids[index],
+                        index=index)
+            method(widget, changes)
+        self.bulk_handler = method.__name__
+        return summarize_wrapper if self.auto_summary else method
+
     def bound_signal(self, widget):
         if self.insert_handler is None:
             raise RuntimeError('insert_handler is not set')
@@ -369,27 +418,110 @@ class Output(OutputSignal, _Signal):
         setting this argument will also silence warnings for types without
         the summary function and for types defined with a fully qualified
         string instead of an actual type object.
+    coalesce (int, optional):
+        if set, values sent within this many milliseconds after a delivery
+        are not passed to the signal manager immediately; only the latest
+        of them is delivered when the interval elapses, and the others are
+        dropped. This is useful for outputs that are sent repeatedly, for
+        instance while the user drags a slider. (default: `None`, values
+        are delivered immediately)
     """
     def __init__(self, name, type, id=None, doc=None, replaces=None, *,
                  default=False, explicit=False, dynamic=True,
-                 auto_summary=None):
+                 auto_summary=None, coalesce=None):
         flags = self.get_flags(False, default, explicit, dynamic)
         super().__init__(name, type, flags, id, doc, replaces or [])
         self.auto_summary = can_summarize(type, name, auto_summary)
+        self.coalesce = coalesce
         self.widget = None
         self._seq_id = next(_counter)
+        self._pending = {}
+        self._timer = None
+        self._sent = self._delivered = 0
+
+    def bound_signal(self, widget):
+        new_signal = super().bound_signal(widget)
+        new_signal._pending = {}
+        new_signal._timer = None
+        new_signal._sent = new_signal._delivered = 0
+        return new_signal
 
-    def send(self, value, *args, **kwargs):
-        """Emit the signal through signal manager."""
+    def send(self, value, *args, version=None, **kwargs):
+        """
+        Emit the signal through signal manager.
+
+        If `version` is given, the signal manager may skip delivering the
+        value on links that already hold a value sent with an equal version.
+        A widget can thus re-send an unchanged output, for instance after
+        re-applying the same settings, without triggering recomputation in
+        downstream widgets. The version must change whenever the value does.
+        """
         assert self.widget is not None
         id = _parse_call_id_arg(*args, **kwargs)
+        if self.coalesce is None:
+            self._deliver(value, id, version)
+            return
+
+        self._sent += 1
+        timer = self._timer
+        if timer is None:
+            timer = self._timer = QTimer(
+                self.widget, singleShot=True, interval=self.coalesce)
+            timer.timeout.connect(self.__on_timeout)
+        if timer.isActive():
+            # the latest value replaces the pending one, if any
+            self._pending[id] = (value, version)
+        else:
+            self._deliver(value, id, version)
+            timer.start()
+
+    def flush(self):
+        """Deliver the pending value, if any, immediately."""
+        if self._timer is not None:
+            self._timer.stop()
+        pending, self._pending = self._pending, {}
+        for id, (value, version) in pending.items():
+            self._deliver(value, id, version)
+
+    def coalescing_statistics(self):
+        # type: () -> CoalescingStatistics
+        """
+        Return the number of values sent on the output, delivered to the
+        signal manager and dropped because they were superseded.
+        """
+        pending = len(self._pending)
+        return CoalescingStatistics(
+            self._sent, self._delivered,
+            self._sent - self._delivered - pending)
+
+    def __on_timeout(self):
+        if self._pending:
+            self.flush()
+            # start a new interval
+            self._timer.start()
+
+    def _deliver(self, value, id, version=None):
+        if self.coalesce is not None:
+            self._delivered += 1
+        tracer = signal_tracer(self.widget)
+        if tracer is None:
+            self.__send(value, id, version)
+        else:
+            with tracer.span("send", "output", node=self.widget.captionTitle,
+                             channel=self.name, type=payload_type(value)):
+                self.__send(value, id, version)
+
+    def __send(self, value, id, version):
         signal_manager = self.widget.signalManager
         if signal_manager is not None:
             if id is not None:
                 extra_args = (id,)
             else:
                 extra_args = ()
-            signal_manager.send(self.widget, self.name, value, *extra_args)
+            # pass version only when given, for signal managers without it
+            extra_kwargs = {"version": version} if version is not None else {}
+            signal_manager.send(self.widget, self.name, value, *extra_args,
+                                **extra_kwargs)
         if self.auto_summary:
             self.widget.set_partial_output_summary(
                 self.name, summarize(value), id=id)
@@ -413,6 +545,8 @@ class WidgetSignalsMixin:
     def __init__(self):
         self.input_summaries = {}
         self.output_summaries = {}
+        self.__dirty_summaries = []
+        self.__summary_updates_deferred = 0
         self._bind_signals()
 
     def _bind_signals(self):
@@ -445,6 +579,18 @@ class WidgetSignalsMixin:
                 extra_args = ()
             self.signalManager.send(self, signalName, value, *extra_args)
 
+    def coalescing_statistics(self):
+        # type: () -> Dict[str, CoalescingStatistics]
+        """
+        Return statistics of outputs that coalesce values, by output names.
+
+        See `Output` (argument `coalesce`) and
+        `Output.coalescing_statistics`.
+        """
+        return {output.name: output.coalescing_statistics()
+                for output in vars(self.Outputs).values()
+                if isinstance(output, Output) and output.coalesce is not None}
+
     def handleNewSignals(self):
         """
         Invoked by the workflow signal propagation manager after all
@@ -516,16 +662,43 @@ class WidgetSignalsMixin:
         return list(sorted(signals, key=lambda s: s._seq_id))
 
     def update_summaries(self):
+        """Update input and output summaries, including any pending changes"""
+        self.__dirty_summaries = []
         self._update_summary(self.input_summaries)
         self._update_summary(self.output_summaries)
 
+    @contextmanager
+    def deferred_summary_updates(self):
+        """
+        A context manager within which changed input and output summaries
+        are not rendered until the (outermost) context exits.
+
+        Signal managers deliver a batch of inputs within it, so a summary
+        of a widget with many inputs is rendered once, not for each input.
+        """
+        self.__summary_updates_deferred += 1
+        try:
+            yield
+        finally:
+            self.__summary_updates_deferred -= 1
+            if not self.__summary_updates_deferred:
+                dirty, self.__dirty_summaries = self.__dirty_summaries, []
+                for summaries in dirty:
+                    self._update_summary(summaries)
+
     def set_partial_input_summary(self, name, partial_summary, *, id=None, index=None):
         self.__set_part_summary(self.input_summaries[name], id, partial_summary, index=index)
-        self._update_summary(self.input_summaries)
+        self.__schedule_summary_update(self.input_summaries)
 
     def set_partial_output_summary(self, name, partial_summary, *, id=None):
         self.__set_part_summary(self.output_summaries[name], id, partial_summary)
-        self._update_summary(self.output_summaries)
+        self.__schedule_summary_update(self.output_summaries)
+
+    def __schedule_summary_update(self, summaries):
+        if not self.__summary_updates_deferred:
+            self._update_summary(summaries)
+        elif not any(dirty is summaries for dirty in self.__dirty_summaries):
+            self.__dirty_summaries.append(summaries)
 
     @staticmethod
     def __set_part_summary(summary, id, partial_summary, index=None):
@@ -628,6 +801,36 @@ def get_widget_inputs(
     return state
 
 
+@contextmanager
+def collect_input_changes(input: MultiInput, widget: WidgetSignalsMixin):
+    """
+    Collect the changes of a `MultiInput` instead of calling its insert,
+    set and remove handlers. Yield the list of collected
+    :class:`InputChange`, which can be passed to the bulk handler with
+    :func:`notify_input_changes`.
+    """
+    collecting = widget.__dict__.setdefault(
+        "_WidgetSignalsMixin__input_changes", {}
+    )
+    changes: List[InputChange] = []
+    collecting[input.name] = changes
+    try:
+        yield changes
+    finally:
+        del collecting[input.name]
+
+
+def notify_input_changes(
+        input: MultiInput, widget: WidgetSignalsMixin,
+        changes: List[InputChange]
+) -> None:
+    """
+    Call the bulk handler of the `input` with `changes`.
+    """
+    handler = getattr(widget, input.bulk_handler)
+    _call_input_handler(input, widget, handler, (changes, ), changes)
+
+
 @singledispatch
 def notify_input_helper(
         input: Input, widget: WidgetSignalsMixin, obj, key=None, index=-1
@@ -647,7 +850,7 @@ def set_input_helper(
         args = (obj,)
     else:
         args = (obj, key)
-    handler(*args)
+    _call_input_handler(input, widget, handler, args, obj)
 
 
 @notify_input_helper.register(MultiInput)
@@ -745,6 +948,13 @@ def set_multi_input_helper(
             remove = False
             index = local_index(key, inputs, filter_f)
 
+    assert index is not None
+    collecting = widget.__dict__.get("_WidgetSignalsMixin__input_changes")
+    if collecting and input.name in collecting:
+        kind = "insert" if new else "remove" if remove else "set"
+        collecting[input.name].append(
+            InputChange(kind, index, None if remove else obj))
+        return
     if new:
         handler = input.insert_handler
         args = (index, obj)
@@ -754,6 +964,16 @@ def set_multi_input_helper(
     else:
         handler = input.handler
         args = (index, obj)
-    assert index is not None
     handler = getattr(widget, handler)
-    handler(*args)
+    _call_input_handler(input, widget, handler, args, obj)
+
+
+def _call_input_handler(input, widget, handler, args, obj):
+    tracer = signal_tracer(widget)
+    if tracer is None:
+        handler(*args)
+    else:
+        with tracer.span(handler.__name__, "input",
+                         node=widget.captionTitle, channel=input.name,
+                         type=payload_type(obj)):
+            handler(*args)
@@ -1,3 +1,6 @@
+import gc
+import os
+import time
 import unittest
 import unittest.mock
 import threading
@@ -5,17 +8,23 @@ import random
 import weakref
 
 from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import concurrent.futures
+
+import numpy as np
 from types import SimpleNamespace
 from typing import Iterable, Set
 
 from AnyQt.QtCore import (
-    Qt, QObject, QCoreApplication, QThread, QEventLoop, QTimer, pyqtSlot,
-    pyqtSignal
+    Qt, QObject, QCoreApplication, QThread, QThreadPool, QEventLoop, QTimer,
+    pyqtSlot, pyqtSignal
 )
 from AnyQt.QtTest import QSignalSpy
 
+from orangewidget.utils import sharedarrays
 from orangewidget.utils.concurrent import (
-    FutureWatcher, FutureSetWatcher, methodinvoke, PyOwned
+    FutureWatcher, FutureSetWatcher, methodinvoke, PyOwned, ProcessPool,
+    FairShareExecutor, start_task
 )
 
 
@@ -115,6 +124,278 @@ class TestFutureWatcher(CoreAppTestCase):
         self.assertEqual(list(spy.cancelled), [[f]])
 
 
+class TestTaskState(CoreAppTestCase):
+    def test_progress(self):
+        def task(state, n):
+            for i in range(n):
+                state.set_progress(100 * (i + 1) / n)
+                state.set_partial_result(i)
+            return n
+
+        future = start_task(task, 10000, interval=10)
+        progress = QSignalSpy(future.state.progressChanged)
+        partial = QSignalSpy(future.state.partialResultReady)
+        watcher = FutureWatcher(future)
+        done = QSignalSpy(watcher.done)
+        self.assertTrue(done.wait())
+        self.assertEqual(future.result(), 10000)
+        future.state.flush()
+        # updates are throttled, but the last ones are emitted
+        self.assertLess(len(progress), 10000)
+        self.assertEqual(list(progress)[-1], [100.])
+        self.assertEqual(list(partial)[-1], [9999])
+
+    def test_progress_bar(self):
+        def task(state):
+            state.set_progress(42)
+
+        widget = SimpleNamespace(progressBarSet=unittest.mock.Mock())
+        future = start_task(task)
+        future.state.progressChanged.connect(widget.progressBarSet)
+        future.result(10)
+        self.assertTrue(QSignalSpy(future.state.progressChanged).wait())
+        widget.progressBarSet.assert_called_once_with(42.)
+
+    def test_cancel(self):
+        started = threading.Event()
+
+        def task(state):
+            started.set()
+            while not state.is_interruption_requested():
+                time.sleep(0.001)
+            return "interrupted"
+
+        pool = QThreadPool()
+        pool.setMaxThreadCount(1)
+        f1 = start_task(task, pool=pool)
+        f2 = start_task(task, pool=pool)
+        started.wait(10)
+        # f2 is not running yet and is cancelled
+        self.assertTrue(f2.cancel())
+        self.assertTrue(f2.cancelled())
+        # f1 is running and is interrupted
+        self.assertFalse(f1.cancel())
+        self.assertTrue(f1.state.is_interruption_requested())
+        self.assertEqual(f1.result(10), "interrupted")
+        pool.waitForDone()
+
+
+class TestFairShareExecutor(CoreAppTestCase):
+    def test_fair_share(self):
+        executor = FairShareExecutor(max_workers=1)
+        ev = threading.Event()
+        order = []
+        blocker = executor.submit_for("a", ev.wait, 10)
+        fs = [executor.submit_for("a", order.append, "a{}".format(i))
+              for i in range(1, 6)]
+        fs += [executor.submit_for("b", order.append, "b{}".format(i))
+               for i in range(1, 3)]
+        stats = executor.statistics()
+        self.assertEqual(stats["a"].queued, 5)
+        self.assertEqual(stats["a"].running, 1)
+        self.assertEqual(stats["b"].queued, 2)
+        ev.set()
+        concurrent.futures.wait(fs + [blocker], 10)
+        self.assertEqual(order, ["a1", "b1", "a2", "b2", "a3", "a4", "a5"])
+        stats = executor.statistics()
+        self.assertEqual(stats["a"].started, 6)
+        self.assertEqual(stats["b"].queued, 0)
+        self.assertGreater(stats["b"].max_wait, 0)
+        executor.shutdown()
+
+    def test_quota(self):
+        executor = FairShareExecutor(max_workers=4, quota=2)
+        executor.set_quota("a", 1)
+        ev = threading.Event()
+        fs = [executor.submit_for(owner, ev.wait, 10)
+              for owner in "aaabbb"]
+        stats = executor.statistics()
+        self.assertEqual(stats["a"].running, 1)
+        self.assertEqual(stats["b"].running, 2)
+        self.assertEqual(executor.quota("a"), 1)
+        self.assertEqual(executor.quota("b"), 2)
+        ev.set()
+        concurrent.futures.wait(fs, 10)
+        self.assertTrue(all(f.result() for f in fs))
+        executor.shutdown()
+
+    def test_cancel(self):
+        executor = FairShareExecutor(max_workers=1)
+        ev = threading.Event()
+        running = executor.submit_for("a", ev.wait, 10)
+        queued = [executor.submit_for("a", pow, 2, i) for i in range(3)]
+        other = executor.submit_for("b", pow, 2, 2)
+        self.assertEqual(executor.cancel("a"), 3)
+        self.assertTrue(all(f.cancelled() for f in queued))
+        self.assertFalse(running.cancelled())
+        ev.set()
+        self.assertEqual(other.result(10), 4)
+        executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            executor.submit(pow, 2, 2)
+
+
+class TestProcessPool(CoreAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = ProcessPool(max_workers=2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        super().tearDown()
+
+    def test_submit(self):
+        pool = self.pool
+        pids = pool.warm_up()
+        self.assertEqual(len(pids), pool.max_workers)
+        self.assertNotIn(os.getpid(), pids)
+
+        watcher = FutureWatcher(pool.submit(pow, 2, 10))
+        spy = QSignalSpy(watcher.resultReady)
+        self.assertTrue(spy.wait())
+        self.assertEqual(list(spy), [[1024]])
+
+        fs = [pool.submit(os.getpid) for _ in range(4)]
+        watcher = FutureSetWatcher(fs)
+        spy = QSignalSpy(watcher.doneAll)
+        self.assertTrue(spy.wait())
+        # workers are reused
+        self.assertLessEqual({f.result() for f in fs}, pids)
+        self.assertEqual(pool.warm_up(), pids)
+
+    def test_warm_up_timeout(self):
+        pool = self.pool
+        pool.warm_up()
+        busy = pool.submit(time.sleep, 1)
+        # one worker is busy, so the other waits for it in vain
+        self.assertEqual(pool.warm_up(timeout=0.2), set())
+        busy.result(timeout=10)
+        self.assertEqual(len(pool.warm_up(timeout=10)), pool.max_workers)
+
+    def test_exception(self):
+        watcher = FutureWatcher(self.pool.submit(int, "x"))
+        spy = QSignalSpy(watcher.exceptionReady)
+        self.assertTrue(spy.wait())
+        ex = spy[0][0]
+        self.assertIsInstance(ex, ValueError)
+        self.assertIn("Traceback", str(ex.__cause__))
+
+    def test_cancel(self):
+        fs = [self.pool.submit(time.sleep, 0.5) for _ in range(6)]
+        self.assertGreater(self.pool.cancel_pending(), 0)
+        cancelled = [f for f in fs if f.cancelled()]
+        self.assertTrue(cancelled)
+        watcher = FutureWatcher(cancelled[0])
+        spy = QSignalSpy(watcher.cancelled)
+        self.assertTrue(spy.wait())
+
+    @unittest.skipUnless(sharedarrays.SHARED_MEMORY_SUPPORTED,
+                         "shared memory is not supported")
+    def test_submit_shared(self):
+        pool = self.pool
+        pool.warm_up()
+        dtype = np.dtype([("a", int), ("b", float)])
+        watcher = FutureWatcher(pool.submit_shared(
+            dict, x=np.arange(10 ** 6),
+            y=[np.zeros(3), np.ones(10 ** 6, dtype)]))
+        spy = QSignalSpy(watcher.resultReady)
+        self.assertTrue(spy.wait())
+        result = spy[0][0]
+        x, (y, z) = result["x"], result["y"]
+        np.testing.assert_equal(x, np.arange(10 ** 6))
+        self.assertIsInstance(x.base, sharedarrays._Segment)
+        # small arrays are pickled
+        self.assertIsNone(y.base)
+        self.assertEqual(z.dtype, dtype)
+        self.assertEqual(z[0], np.ones(1, dtype)[0])
+
+        f = pool.submit_shared(int, "x")
+        self.assertRaises(ValueError, f.result, timeout=10)
+
+    @unittest.skipUnless(sharedarrays.SHARED_MEMORY_SUPPORTED
+                         and os.path.exists("/proc/self/statm"),
+                         "shared memory or /proc is not available")
+    def test_submit_shared_memory(self):
+        def rss():
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+        size = 100 * 2 ** 20
+        self.pool.warm_up()
+        before = rss()
+        start = time.perf_counter()
+        a = self.pool.submit_shared(np.ones, size, np.uint8).result(60)
+        elapsed = time.perf_counter() - start
+        # the array is mapped, not copied into the process
+        self.assertLess(rss() - before, size // 4)
+        self.assertEqual(a.nbytes, size)
+        self.assertEqual(a[-1], 1)
+        self.assertLess(elapsed, 30)
+
+    @unittest.skipUnless(sharedarrays.SHARED_MEMORY_SUPPORTED
+                         and os.path.isdir("/dev/shm"),
+                         "shared memory is not available in /dev/shm")
+    def test_submit_shared_cancel(self):
+        def segments():
+            return {name for name in os.listdir("/dev/shm")
+                    if name.startswith("psm_")}
+
+        existing = segments()
+        fs = [self.pool.submit_shared(np.ones, 2 ** 20) for _ in range(4)]
+        for f in fs:
+            f.cancel()
+        # wait for the tasks that could not be cancelled
+        self.pool.shutdown(wait=True)
+        self.assertTrue(all(f.cancelled() for f in fs))
+        # their results were released
+        self.assertEqual(segments() - existing, set())
+
+    def test_broken_pool(self):
+        f = self.pool.submit(os._exit, 1)
+        with self.assertRaises(BrokenProcessPool):
+            f.result(timeout=10)
+        self.assertEqual(self.pool.submit(pow, 2, 3).result(timeout=10), 8)
+
+
+@unittest.skipUnless(sharedarrays.SHARED_MEMORY_SUPPORTED,
+                     "shared memory is not supported")
+class TestSharedArrays(unittest.TestCase):
+    def assertReleased(self, name):
+        with self.assertRaises(FileNotFoundError):
+            sharedarrays.SharedMemory(name)
+
+    def test_share_failure_releases_segments(self):
+        created = []
+        original = sharedarrays.SharedMemory
+
+        def shared_memory(name=None, create=False, size=0):
+            if not create:
+                return original(name)
+            if len(created) == 2:
+                raise OSError("no space left")
+            shm = original(create=create, size=size)
+            created.append(shm.name)
+            return shm
+
+        with unittest.mock.patch.object(sharedarrays, "SharedMemory",
+                                        shared_memory):
+            with self.assertRaises(OSError):
+                sharedarrays.call_sharing_arrays(
+                    list, ([np.ones(10)] * 3,), {}, min_size=1)
+        self.assertEqual(len(created), 2)
+        for name in created:
+            self.assertReleased(name)
+
+    def test_restore_failure_releases_segments(self):
+        shared = sharedarrays.call_sharing_arrays(
+            list, ([np.ones(10)] * 3,), {}, min_size=1)
+        shared[1] = shared[1]._replace(name=shared[1].name + "x")
+        with self.assertRaises(FileNotFoundError):
+            sharedarrays.restore_arrays(shared)
+        for description in shared:
+            self.assertReleased(description.name)
+
+
 class TestFutureSetWatcher(CoreAppTestCase):
     def test_watcher(self):
         def spies(w):
@@ -221,6 +502,54 @@ class TestFutureSetWatcher(CoreAppTestCase):
                 self.assertRaises(RuntimeError):
             watcher.flush()
 
+    def test_batch_mode(self):
+        executor = ThreadPoolExecutor(max_workers=4)
+        n = 1000
+        futures = [executor.submit(pow, i, 2) for i in range(n)]
+        watcher = FutureSetWatcher()
+        watcher.setBatchMode(interval=20, size=100)
+        watcher.setFutures(futures)
+        batches = QSignalSpy(watcher.doneBatch)
+        progress = QSignalSpy(watcher.progressChanged)
+        done_at = QSignalSpy(watcher.doneAt)
+        done_all = QSignalSpy(watcher.doneAll)
+        self.assertTrue(done_all.wait())
+        self.assertLess(len(batches), n)
+        indices = [i for batch, _ in batches for i in batch]
+        self.assertEqual(sorted(indices), list(range(n)))
+        self.assertTrue(all(f is futures[i]
+                            for batch, fs in batches
+                            for i, f in zip(batch, fs)))
+        self.assertEqual(len(progress), len(batches))
+        self.assertEqual(list(progress)[-1], [n, n])
+        self.assertEqual(len(done_at), 0)
+        with self.assertRaises(RuntimeError):
+            watcher.setBatchMode()
+
+        # per-future signals on request; flush drains waiting futures
+        futures = [executor.submit(pow, i, 2) for i in range(10)]
+        watcher = FutureSetWatcher()
+        watcher.setBatchMode(interval=10000, emitPerFuture=True)
+        watcher.setFutures(futures)
+        results = QSignalSpy(watcher.resultReadyAt)
+        done_all = QSignalSpy(watcher.doneAll)
+        watcher.wait()
+        watcher.flush()
+        self.assertEqual(list(done_all), [[]])
+        self.assertEqual(sorted(map(tuple, results)),
+                         [(i, i ** 2) for i in range(10)])
+
+    def test_batch_mode_does_not_keep_watcher(self):
+        future = Future()
+        watcher = FutureSetWatcher()
+        watcher.setBatchMode()
+        watcher.setFutures([future])
+        wref = weakref.ref(watcher)
+        del watcher
+        gc.collect()
+        self.assertIsNone(wref())
+        future.set_result(1)
+
 
 class TestPyOwned(CoreAppTestCase):
     def test_py_owned(self):
@@ -8,12 +8,14 @@
 import unittest
 from unittest.mock import patch, MagicMock
 
+from AnyQt.QtTest import QTest
+
 from orangewidget.widget import \
     Single, Multiple, Default, NonDefault, Explicit, Dynamic
-from orangewidget.tests.base import GuiTest
+from orangewidget.tests.base import GuiTest, WidgetTest
 from orangewidget.utils.signals import _Signal, Input, Output, \
     WidgetSignalsMixin, InputSignal, OutputSignal, MultiInput, summarize, \
-    PartialSummary
+    PartialSummary, CoalescingStatistics
 from orangewidget.widget import OWBaseWidget
 
 
@@ -112,6 +114,49 @@ class WidgetSignalsMixinTest(GuiTest):
         self.assertEqual(widget.Outputs.an_output.widget, widget)
         self.assertIsNone(MockWidget.Outputs.an_output.widget)
 
+    def test_coalesce_outputs(self):
+        class MockWidget(OWBaseWidget):
+            name = "foo"
+
+            class Outputs:
+                coalesced = Output("coalesced", int, coalesce=10)
+                immediate = Output("immediate", int)
+
+        widget = MockWidget()
+        widget.signalManager = manager = MagicMock()
+        coalesced = widget.Outputs.coalesced
+
+        def sent():
+            values = [args[2] for args, _ in manager.send.call_args_list]
+            manager.send.reset_mock()
+            return values
+
+        # the first value is delivered immediately, the latest of the
+        # subsequent values when the interval elapses
+        for i in range(5):
+            coalesced.send(i)
+        self.assertEqual(sent(), [0])
+        self.assertEqual(widget.coalescing_statistics(),
+                         {"coalesced": CoalescingStatistics(5, 1, 3)})
+        self.assertTrue(QTest.qWaitFor(lambda: manager.send.called, 1000))
+        self.assertEqual(sent(), [4])
+        self.assertEqual(coalesced.coalescing_statistics(),
+                         CoalescingStatistics(5, 2, 3))
+
+        coalesced.send(5)
+        coalesced.send(6)
+        self.assertEqual(sent(), [])
+        coalesced.flush()
+        self.assertEqual(sent(), [6])
+        self.assertEqual(coalesced.coalescing_statistics(),
+                         CoalescingStatistics(7, 3, 4))
+
+        for i in range(5):
+            widget.Outputs.immediate.send(i)
+        self.assertEqual(sent(), list(range(5)))
+        self.assertNotIn("immediate", widget.coalescing_statistics())
+        widget.deleteLater()
+
     def test_checking_invalid_inputs(self):
         with self.assertRaises(ValueError):
             class MockWidget(OWBaseWidget):
@@ -256,6 +301,61 @@ class WidgetSignalsMixinTest(GuiTest):
             list(w.input_summaries["A"].values()),
             [PartialSummary("00", None), PartialSummary("11", None)])
 
+    def test_summaries_are_deferred(self):
+        w = SummarizedWidget()
+        w.signalManager = MagicMock()
+        with patch.object(w, "_update_summary") as update_summary:
+            with w.deferred_summary_updates():
+                for i in range(10):
+                    w.set_a(Str(i))
+                    w.Outputs.output_a.send(Str(i))
+                with w.deferred_summary_updates():
+                    w.set_a(Str(42))
+                update_summary.assert_not_called()
+            self.assertEqual(update_summary.call_count, 2)
+
+            # changes outside the context are rendered immediately
+            update_summary.reset_mock()
+            w.set_a(Str(42))
+            self.assertEqual(update_summary.call_count, 2)
+
+        with w.deferred_summary_updates():
+            w.set_a(Str(7))
+        self.assertEqual(w.info._StateInfo__input_summary.brief, "7")
+        w.deleteLater()
+
+
+class Str(str):
+    pass
+
+
+@summarize.register(Str)
+def summarize_str(s):
+    return PartialSummary(str(s), None)
+
+
+class SummarizedWidget(OWBaseWidget):
+    name = "foo"
+
+    class Inputs:
+        input_a = Input("A", Str)
+
+    class Outputs:
+        output_a = Output("A", Str)
+
+    @Inputs.input_a
+    def set_a(self, a):
+        self.Outputs.output_a.send(a and Str(a * 2))
+
+
+class SummaryAfterSendTest(WidgetTest):
+    def test_summary_after_send_signal(self):
+        w = self.create_widget(SummarizedWidget)
+        self.send_signal(w.Inputs.input_a, Str(5))
+        self.assertEqual(w.info._StateInfo__input_summary.brief, "5")
+        self.assertEqual(w.info._StateInfo__output_summary.brief, "55")
+        self.assertEqual(self.get_output(w.Outputs.output_a, widget=w), "55")
+
 
 if __name__ == "__main__":
     unittest.main()
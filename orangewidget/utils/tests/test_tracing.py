@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+
+from orangewidget.utils.tracing import SignalTracer, TraceTotals
+
+
+class TestSignalTracer(unittest.TestCase):
+    def test_span(self):
+        tracer = SignalTracer()
+        with tracer.span("process signals", "node", node="A", signals=2):
+            with tracer.span("set_a", "input", node="A", channel="X",
+                             type="int"):
+                pass
+        with self.assertRaises(ValueError), \
+                tracer.span("Update", "link", link="B -> A", node="A"):
+            raise ValueError
+        inner, outer, link = tracer.events
+        self.assertEqual(outer["name"], "process signals")
+        self.assertEqual(outer["ph"], "X")
+        self.assertEqual(outer["args"], {"node": "A", "signals": 2})
+        self.assertLessEqual(outer["ts"], inner["ts"])
+        self.assertGreaterEqual(outer["dur"], inner["dur"])
+        self.assertEqual(link["cat"], "link")
+
+        tracer.clear()
+        self.assertEqual(tracer.events, [])
+
+    def test_summary(self):
+        tracer = SignalTracer()
+        tracer.events = [
+            dict(name="process signals", cat="node", ph="X", ts=0, dur=3e6,
+                 pid=1, tid=1, args=dict(node="A")),
+            dict(name="Update", cat="link", ph="X", ts=0, dur=2e6,
+                 pid=1, tid=1, args=dict(link="B -> A", node="A")),
+            dict(name="set_a", cat="input", ph="X", ts=0, dur=2e6,
+                 pid=1, tid=1, args=dict(node="A")),
+            dict(name="send", cat="output", ph="X", ts=3e6, dur=1e6,
+                 pid=1, tid=1, args=dict(node="A")),
+            dict(name="process signals", cat="node", ph="X", ts=4e6, dur=1e6,
+                 pid=1, tid=1, args=dict(node="A")),
+        ]
+        self.assertEqual(
+            tracer.summary(),
+            {"nodes": {"A": TraceTotals(2, 4.)},
+             "links": {"B -> A": TraceTotals(1, 2.)},
+             "outputs": {"A": TraceTotals(1, 1.)}})
+
+    def test_write(self):
+        tracer = SignalTracer()
+        with tracer.span("send", "output", node="A", channel="X"):
+            pass
+        fd, filename = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        tracer.write(filename)
+        with open(filename) as f:
+            trace = json.load(f)
+        self.assertEqual(trace["traceEvents"], tracer.events)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+Tracing of signal propagation.
+
+When a tracer is set (see :obj:`set_signal_tracer`), the signal manager,
+input handlers and outputs record the time spent in
+
+- processing signals for a node (category "node"),
+- delivering a signal on a link (category "link"),
+- calling an input handler or `handleNewSignals` (category "input"),
+- sending a value on an output (category "output").
+
+The trace can be saved as JSON in Chrome's trace event format, which can be
+opened in chrome://tracing or https://ui.perfetto.dev, and summarized by
+nodes and links with :obj:`SignalTracer.summary`.
+
+Tracing is enabled by setting the environment variable
+`ORANGE_TRACE_SIGNALS` to the name of the file into which the trace is
+written at exit, or by setting the workflow environment key
+`"trace-signals"` (see :obj:`WidgetsSignalManager`). The latter traces
+only the signals of that workflow and does not affect the global tracer.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import NamedTuple, Optional, Dict, List, Any
+
+log = logging.getLogger(__name__)
+
+__all__ = [
+    "SignalTracer", "TraceTotals", "set_signal_tracer", "signal_tracer",
+    "payload_type",
+]
+
+#: Environment variable with the name of the file for the trace
+TRACE_ENV_VAR = "ORANGE_TRACE_SIGNALS"
+
+
+TraceTotals = NamedTuple(
+    "TraceTotals", (("count", int),
+                    ("time", float)))
+
+
+class SignalTracer:
+    """
+    Recorder of spans (intervals with name, category and arguments) of
+    signal propagation.
+    """
+    def __init__(self):
+        self.events = []  # type: List[Dict[str, Any]]
+        self.__lock = threading.Lock()
+        self.__pid = os.getpid()
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """
+        Record the wall time of the code in the `with` block.
+
+        Parameters
+        ----------
+        name : str
+            name of the span, shown in the trace viewer
+        category : str
+            category of the span: "node", "link", "input" or "output"
+        **args
+            additional data: node, channel, link, type of payload...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = dict(name=name, cat=category, ph="X",
+                         ts=start * 1e6, dur=(end - start) * 1e6,
+                         pid=self.__pid, tid=threading.get_ident(),
+                         args=args)
+            with self.__lock:
+                self.events.append(event)
+
+    def clear(self):
+        """Remove recorded spans."""
+        with self.__lock:
+            self.events = []
+
+    def chrome_trace(self):
+        # type: () -> Dict[str, Any]
+        """Return the trace in Chrome's trace event format."""
+        with self.__lock:
+            events = list(self.events)
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def write(self, filename):
+        """Write the trace in Chrome's trace event format to a file."""
+        with open(filename, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self):
+        # type: () -> Dict[str, Dict[str, TraceTotals]]
+        """
+        Return the number of spans and their total time (in seconds) for
+        processing signals by nodes, delivering signals by links, and
+        sending outputs by nodes.
+
+        Returns
+        -------
+        summary : dict
+            a dictionary with keys "nodes", "links" and "outputs"; the
+            values are dictionaries mapping names of nodes or links to
+            `TraceTotals`
+        """
+        keys = {"node": ("nodes", "node"), "link": ("links", "link"),
+                "output": ("outputs", "node")}
+        totals = {kind: defaultdict(lambda: [0, 0.])
+                  for kind, _ in keys.values()}
+        with self.__lock:
+            events = list(self.events)
+        for event in events:
+            if event["cat"] not in keys:
+                # input handlers are included in nodes and links
+                continue
+            kind, arg = keys[event["cat"]]
+            counts = totals[kind][event["args"][arg]]
+            counts[0] += 1
+            counts[1] += event["dur"] / 1e6
+        return {kind: {key: TraceTotals(*counts)
+                       for key, counts in values.items()}
+                for kind, values in totals.items()}
+
+
+_tracer = None  # type: Optional[SignalTracer]
+
+
+def set_signal_tracer(tracer):
+    # type: (Optional[SignalTracer]) -> None
+    """Set the tracer of signal propagation, or `None` to disable tracing."""
+    global _tracer
+    _tracer = tracer
+
+
+def signal_tracer(widget=None):
+    # type: (Any) -> Optional[SignalTracer]
+    """
+    Return the current tracer, or `None` if tracing is disabled.
+
+    If `widget` is given and its signal manager has a tracer of its own
+    (see :obj:`WidgetsSignalManager.tracer`), return that tracer instead of
+    the global one.
+
+    Traced code checks for the tracer before computing span's arguments, so
+    tracing has almost no overhead when disabled.
+    """
+    if widget is not None:
+        manager_tracer = getattr(widget.signalManager, "tracer", None)
+        if manager_tracer is not None:
+            tracer = manager_tracer()
+            if tracer is None or isinstance(tracer, SignalTracer):
+                return tracer
+    return _tracer
+
+
+def payload_type(value):
+    # type: (Any) -> str
+    """Return the name of the value's type, for arguments of spans."""
+    return type(value).__qualname__
+
+
+def _trace_from_environment():
+    filename = os.environ.get(TRACE_ENV_VAR)
+    if not filename:
+        return
+    tracer = SignalTracer()
+    set_signal_tracer(tracer)
+
+    def write():
+        try:
+            tracer.write(filename)
+        except OSError as ex:
+            log.error("Could not write signal trace to %s (%s).",
+                      filename, ex)
+
+    atexit.register(write)
+
+
+_trace_from_environment()
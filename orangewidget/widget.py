@@ -275,6 +275,8 @@ class OWBaseWidget(QDialog, OWComponent, Report, ProgressBarMixin,
     progressBarValueChanged = Signal(float)
     messageActivated = Signal(Msg)
     messageDeactivated = Signal(Msg)
+    #: Emitted with `True` when the widget is shown and `False` when hidden
+    visibilityChanged = Signal(bool)
 
     savedWidgetGeometry = settings.Setting(None)
     controlAreaVisible = settings.Setting(True, schema_only=True)
@@ -1024,6 +1026,7 @@ class OWBaseWidget(QDialog, OWComponent, Report, ProgressBarMixin,
         if self.save_position:
             self.__updateSavedGeometry()
         QDialog.hideEvent(self, event)
+        self.visibilityChanged.emit(False)
 
     def closeEvent(self, event):
         """Overloaded to save the geometry when the widget is closed
@@ -1075,6 +1078,7 @@ class OWBaseWidget(QDialog, OWComponent, Report, ProgressBarMixin,
             self.setAttribute(Qt.WA_Resized, True)
             self.__was_shown = True
         self.__quicktipOnce()
+        self.visibilityChanged.emit(True)
 
     def setCaption(self, caption):
         # save caption title in case progressbar will change it
@@ -0,0 +1,284 @@
+"""
+Headless execution of workflows.
+
+:class:`BatchRunner` loads saved workflows (.ows files), creates their
+widgets without showing them, processes signals until all nodes are
+finished and reports time spent by each node. One runner (and process) can
+run a workflow many times, e.g. for different input files.
+
+The module can also be run as a script::
+
+    python -m orangewidget.workflow.batch workflow.ows [input ...]
+
+For each input, the workflow is run with the path of the input in the
+workflow environment key `"input"` (widgets can read it with
+`self.workflowEnv()`). If the environment variable `QT_QPA_PLATFORM` is
+not set, Qt's offscreen platform is used.
+
+By default, batch runs do not save widgets' settings as the user's
+defaults (see the workflow environment key `"save-settings"`).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import NamedTuple, Optional, List, Dict, Any
+
+from AnyQt.QtCore import QCoreApplication, QEventLoop, QTimer, QEvent
+
+from orangecanvas.registry import WidgetRegistry
+from orangecanvas.scheme import SchemeNode
+from orangecanvas.scheme.node import UserMessage
+from orangecanvas.scheme.readwrite import scheme_load
+
+from orangewidget.workflow.widgetsscheme import WidgetsScheme
+
+log = logging.getLogger(__name__)
+
+__all__ = ["BatchRunner", "RunResult", "NodeTiming", "main"]
+
+#: Key of errors in loading the workflow in `RunResult.errors`
+WORKFLOW_ERRORS = "(workflow)"
+
+
+NodeTiming = NamedTuple(
+    "NodeTiming", (("node", str),
+                   ("created", float),
+                   ("processing", float),
+                   ("updates", int)))
+NodeTiming.__doc__ = """
+Time (in seconds) spent by a node for creating the widget and for
+processing inputs (in `updates` updates)."""
+
+RunResult = NamedTuple(
+    "RunResult", (("filename", str),
+                  ("env", Dict[str, Any]),
+                  ("time", float),
+                  ("finished", bool),
+                  ("nodes", List[NodeTiming]),
+                  ("errors", Dict[str, List[str]])))
+RunResult.__doc__ = """
+Result of a run of a workflow: total time, whether all nodes finished
+before the timeout, timings of nodes and error messages by nodes (errors
+in loading the workflow are under `WORKFLOW_ERRORS`)."""
+
+
+class BatchRunner:
+    """
+    Runner of workflows without a GUI.
+
+    Parameters
+    ----------
+    registry : WidgetRegistry
+        registry with descriptions of widgets in workflows
+    timeout : Optional[float]
+        maximal time (in seconds) for a single run; `None` for no limit
+    save_settings : bool
+        save widgets' settings as the user's defaults when the workflow is
+        disposed
+    """
+    #: Interval (in seconds) of checking whether the workflow finished
+    poll_interval = 0.01
+
+    def __init__(self, registry, timeout=None, save_settings=False):
+        # type: (WidgetRegistry, Optional[float], bool) -> None
+        self.registry = registry
+        self.timeout = timeout
+        self.save_settings = save_settings
+
+    def run(self, filename, env=None):
+        # type: (str, Optional[Dict[str, Any]]) -> RunResult
+        """
+        Load and run the workflow from `filename`.
+
+        Parameters
+        ----------
+        filename : str
+            a saved workflow
+        env : Optional[Dict[str, Any]]
+            additional workflow environment, e.g. `{"input": path}`
+
+        Returns
+        -------
+        result : RunResult
+
+        Errors in loading, running or disposing the workflow are not
+        raised but reported in the result's `errors` under
+        `WORKFLOW_ERRORS`; the run is then not finished.
+        """
+        env = dict(env or {})
+        env.setdefault("basedir", os.path.dirname(os.path.abspath(filename)))
+        env.setdefault("save-settings", self.save_settings)
+        start = time.perf_counter()
+        workflow = WidgetsScheme(env=env)
+        workflow_errors = []  # type: List[str]
+        node_errors = {}  # type: Dict[str, List[str]]
+        nodes = []  # type: List[NodeTiming]
+        finished = False
+
+        def load_error(exc):
+            log.error("Error loading workflow %s: %s", filename, exc)
+            workflow_errors.append("{}: {}".format(type(exc).__name__, exc))
+
+        def run_error(exc):
+            log.error("Error running workflow %s", filename, exc_info=exc)
+            workflow_errors.append("{}: {}".format(type(exc).__name__, exc))
+
+        try:
+            with open(filename, "rb") as f:
+                scheme_load(workflow, f, registry=self.registry,
+                            error_handler=load_error)
+            created = self._create_widgets(workflow)
+            processing = self._track_processing(workflow)
+            finished = self._wait(workflow, start)
+            nodes = [NodeTiming(node.title, created[node],
+                                *processing.get(node, (0., 0)))
+                     for node in workflow.nodes]
+            for node in workflow.nodes:
+                messages = self._error_messages(node)
+                if messages:
+                    node_errors[node.title] = messages
+        except Exception as ex:  # pylint: disable=broad-except
+            finished = False
+            run_error(ex)
+        try:
+            self._dispose(workflow)
+        except Exception as ex:  # pylint: disable=broad-except
+            finished = False
+            run_error(ex)
+        errors = {WORKFLOW_ERRORS: workflow_errors} if workflow_errors else {}
+        errors.update(node_errors)
+        return RunResult(filename, env, time.perf_counter() - start,
+                         finished, nodes, errors)
+
+    def run_inputs(self, filename, inputs, key="input"):
+        # type: (str, List[str], str) -> List[RunResult]
+        """
+        Run the workflow for each of `inputs`, which is given in the
+        workflow environment under `key`. A failed run is reported in its
+        result and does not stop the remaining runs.
+        """
+        return [self.run(filename, {key: input}) for input in inputs]
+
+    @staticmethod
+    def _create_widgets(workflow):
+        # type: (WidgetsScheme) -> Dict[SchemeNode, float]
+        created = {}
+        for node in workflow.nodes:
+            t0 = time.perf_counter()
+            workflow.widget_for_node(node)
+            created[node] = time.perf_counter() - t0
+        return created
+
+    @staticmethod
+    def _track_processing(workflow):
+        # type: (WidgetsScheme) -> Dict[SchemeNode, List]
+        processing = {}  # type: Dict[SchemeNode, List]
+        started = {}  # type: Dict[SchemeNode, float]
+        manager = workflow.signal_manager
+
+        def on_started(node):
+            started[node] = time.perf_counter()
+
+        def on_finished(node):
+            timing = processing.setdefault(node, [0., 0])
+            timing[0] += time.perf_counter() - started.pop(node)
+            timing[1] += 1
+
+        manager.processingStarted[SchemeNode].connect(on_started)
+        manager.processingFinished[SchemeNode].connect(on_finished)
+        return processing
+
+    def _wait(self, workflow, start):
+        # type: (WidgetsScheme, float) -> bool
+        # A workflow is finished when it is idle in two consecutive checks,
+        # so widgets that defer sending outputs are waited for.
+        loop = QEventLoop()
+        idle = 0
+        while idle < 2:
+            if self.timeout is not None \
+                    and time.perf_counter() - start > self.timeout:
+                return False
+            QTimer.singleShot(int(self.poll_interval * 1000), loop.quit)
+            loop.exec()
+            idle = idle + 1 if self._is_idle(workflow) else 0
+        return True
+
+    @staticmethod
+    def _is_idle(workflow):
+        # type: (WidgetsScheme) -> bool
+        manager = workflow.signal_manager
+        if manager.has_pending() \
+                or manager.runtime_state() != manager.Waiting:
+            return False
+        return all(manager.is_ready(node)
+                   and not manager.is_invalidated(node)
+                   and not manager.is_active(node)
+                   for node in workflow.nodes)
+
+    @staticmethod
+    def _error_messages(node):
+        # type: (SchemeNode) -> List[str]
+        # messages without contents are placeholders for cleared messages
+        return [message.contents for message in node.state_messages()
+                if message.severity == UserMessage.Error and message.contents]
+
+    @staticmethod
+    def _dispose(workflow):
+        workflow.clear()
+        workflow.executor.shutdown(wait=False)
+        workflow.deleteLater()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m orangewidget.workflow.batch",
+        description="Run a workflow without GUI")
+    parser.add_argument("workflow", help="workflow (.ows) file")
+    parser.add_argument("inputs", nargs="*",
+                        help="inputs; the workflow is run for each of them")
+    parser.add_argument("--input-key", default="input",
+                        help="workflow environment key for inputs")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="maximal time of a single run (in seconds)")
+    parser.add_argument("-o", "--output",
+                        help="file for results in JSON (default: stdout)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from AnyQt.QtWidgets import QApplication
+    from orangewidget.workflow.config import Config
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    app.setOrganizationDomain(Config.OrganizationDomain)
+    app.setApplicationName(Config.ApplicationName)
+    app.setApplicationVersion(Config.ApplicationVersion)
+
+    registry = WidgetRegistry()
+    Config.widget_discovery(registry).run(Config.widgets_entry_points())
+
+    runner = BatchRunner(registry, timeout=args.timeout)
+    if args.inputs:
+        results = runner.run_inputs(args.workflow, args.inputs,
+                                    args.input_key)
+    else:
+        results = [runner.run(args.workflow)]
+
+    output = [dict(result._asdict(),
+                   nodes=[node._asdict() for node in result.nodes])
+              for result in results]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=1)
+    else:
+        json.dump(output, sys.stdout, indent=1)
+    return 0 if all(result.finished and not result.errors
+                    for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
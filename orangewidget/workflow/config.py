@@ -33,6 +33,23 @@ class Config(config.Default):
     except ImportError:
         ApplicationVersion = "0.0.0"
 
+    #: Store all widgets' default settings in a single sqlite database (see
+    #: :obj:`orangewidget.settings.SettingsStore`) instead of a pickle file
+    #: per widget class
+    UseSettingsStore = False
+
+    def init(self):
+        super().init()
+        # Write widgets' default settings in a background thread, so closing
+        # (large) workflows does not block the GUI
+        from orangewidget.settings import (
+            SettingsWriter, set_settings_writer, SettingsStore,
+            set_settings_store
+        )
+        set_settings_writer(SettingsWriter())
+        if self.UseSettingsStore:
+            set_settings_store(SettingsStore())
+
     @staticmethod
     def widgets_entry_points():
         """
@@ -163,17 +163,22 @@ class OWCanvasMainWindow(CanvasMainWindow):
         )
         res = mb.exec()
         if res == QMessageBox.Ok:
-            # Touch a finely crafted file inside the settings directory.
-            # The existence of this file is checked by the canvas main
-            # function and is deleted there.
-            from orangewidget.settings import widget_settings_dir
-            dirname = widget_settings_dir()
-            try:
-                os.makedirs(dirname, exist_ok=True)
-            except (FileExistsError, PermissionError):
-                return
-            with open(os.path.join(dirname, "DELETE_ON_START"), "a"):
-                pass
+            from orangewidget.settings import \
+                widget_settings_dir, settings_store
+            store = settings_store()
+            # Clear the store and ignore the settings that widgets store
+            # when they are closed before the restart
+            if store is None or not store.clear(discard_writes=True):
+                # Touch a finely crafted file inside the settings directory.
+                # The existence of this file is checked by the canvas main
+                # function and is deleted there.
+                dirname = widget_settings_dir()
+                try:
+                    os.makedirs(dirname, exist_ok=True)
+                except (FileExistsError, PermissionError):
+                    return
+                with open(os.path.join(dirname, "DELETE_ON_START"), "a"):
+                    pass
 
             def restart():
                 quit_temp_val = QApplication.quitOnLastWindowClosed()
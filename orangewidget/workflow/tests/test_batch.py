@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from orangecanvas.registry import WidgetRegistry, WidgetDescription
+from orangecanvas.registry.description import CategoryDescription
+from orangecanvas.scheme.readwrite import scheme_to_ows_stream
+
+from orangewidget import widget
+from orangewidget.settings import Setting
+from orangewidget.tests.base import GuiTest
+from orangewidget.workflow.batch import BatchRunner, WORKFLOW_ERRORS
+from orangewidget.workflow.widgetsscheme import WidgetsScheme
+
+
+class Constant(widget.OWBaseWidget):
+    name = "Constant"
+    category = "Test"
+    value = Setting(0)
+
+    class Outputs:
+        out = widget.Output("Value", int, auto_summary=False)
+
+    def __init__(self):
+        super().__init__()
+        self.Outputs.out.send(
+            self.value + int(self.workflowEnv().get("input", 0)))
+
+
+class Collect(widget.OWBaseWidget):
+    name = "Collect"
+    category = "Test"
+    values = []
+
+    class Inputs:
+        value = widget.Input("Value", int, auto_summary=False)
+
+    @Inputs.value
+    def set_value(self, value):
+        if value == 13:
+            self.error("Unlucky")
+        Collect.values.append(value)
+
+
+def widget_description(class_):
+    return WidgetDescription(**class_.get_widget_description())
+
+
+class TestBatchRunner(GuiTest):
+    def setUp(self):
+        self.registry = WidgetRegistry()
+        self.registry.register_category(CategoryDescription("Test"))
+        for class_ in (Constant, Collect):
+            self.registry.register_widget(widget_description(class_))
+
+        workflow = WidgetsScheme()
+        constant = workflow.new_node(
+            self.registry.widget(Constant.get_widget_description()
+                                 ["qualified_name"]),
+            properties={"value": 10})
+        collect = workflow.new_node(self.registry.widget(
+            Collect.get_widget_description()["qualified_name"]))
+        workflow.new_link(constant, "Value", collect, "Value")
+        fd, self.filename = tempfile.mkstemp(suffix=".ows")
+        os.close(fd)
+        self.addCleanup(os.remove, self.filename)
+        with open(self.filename, "wb") as f:
+            scheme_to_ows_stream(workflow, f)
+        workflow.clear()
+        Collect.values = []
+
+    def test_run(self):
+        runner = BatchRunner(self.registry, timeout=10)
+        results = runner.run_inputs(self.filename, ["1", "3"])
+        self.assertEqual(Collect.values, [11, 13])
+        self.assertEqual(len(results), 2)
+        for result, input in zip(results, ["1", "3"]):
+            self.assertTrue(result.finished)
+            self.assertEqual(result.env["input"], input)
+            self.assertEqual(
+                [timing.node for timing in result.nodes],
+                ["Constant", "Collect"])
+            constant, collect = result.nodes
+            self.assertEqual(constant.updates, 0)
+            self.assertEqual(collect.updates, 1)
+            self.assertGreater(collect.processing, 0)
+        self.assertEqual(results[0].errors, {})
+        self.assertEqual(results[1].errors, {"Collect": ["Unlucky"]})
+
+    def test_timeout(self):
+        runner = BatchRunner(self.registry, timeout=0)
+        result = runner.run(self.filename)
+        self.assertFalse(result.finished)
+
+    def test_failed_run(self):
+        runner = BatchRunner(self.registry, timeout=10)
+        wait = runner._wait
+
+        def wait_or_fail(workflow, start):
+            if workflow.runtime_env()["input"] == "1":
+                raise RuntimeError("boom")
+            return wait(workflow, start)
+
+        with patch.object(runner, "_wait", wait_or_fail), \
+                self.assertLogs("orangewidget.workflow.batch", "ERROR"):
+            results = runner.run_inputs(self.filename, ["1", "2"])
+        self.assertFalse(results[0].finished)
+        self.assertEqual(results[0].errors,
+                         {WORKFLOW_ERRORS: ["RuntimeError: boom"]})
+        self.assertTrue(results[1].finished)
+        self.assertEqual(results[1].errors, {})
+
+        with self.assertLogs("orangewidget.workflow.batch", "ERROR"):
+            result = runner.run(self.filename + ".missing")
+        self.assertFalse(result.finished)
+        self.assertEqual(list(result.errors), [WORKFLOW_ERRORS])
+
+    def test_settings_are_not_saved(self):
+        with patch.object(widget.OWBaseWidget, "saveSettings") as save:
+            BatchRunner(self.registry, timeout=10).run(self.filename)
+            save.assert_not_called()
+            BatchRunner(self.registry, timeout=10, save_settings=True) \
+                .run(self.filename)
+            self.assertEqual(save.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,12 @@
+import concurrent.futures
+import json
+import os
+import tempfile
 import unittest
 import unittest.mock
 import logging
+import threading
+import time
 
 from types import SimpleNamespace
 from typing import Type
@@ -10,10 +16,19 @@ from AnyQt.QtWidgets import QAction
 from AnyQt.QtTest import QSignalSpy
 
 from orangecanvas.registry import WidgetDescription
-from orangecanvas.scheme import SchemeNode
+from orangecanvas.scheme import SchemeNode, SchemeLink
+from orangecanvas.scheme.signalmanager import Signal
 from orangewidget.report.owreport import OWReport
-from orangewidget.settings import Setting
-from orangewidget.workflow.widgetsscheme import OWWidgetManager, WidgetsScheme
+from orangewidget.settings import (
+    Setting, SettingsHandler, SettingsWriter, set_settings_writer
+)
+from orangewidget.utils.tracing import (
+    SignalTracer, set_signal_tracer, signal_tracer
+)
+from orangewidget.workflow.widgetsscheme import (
+    OWWidgetManager, WidgetsScheme, WidgetsSignalManager, SchedulingPolicy,
+    _InputSlots
+)
 from orangewidget import widget
 from orangewidget.tests.base import GuiTest
 
@@ -90,6 +105,36 @@ class MakeList(widget.OWBaseWidget, openclass=True):
         self.Outputs.out.send(list(self.inputs))
 
 
+class MakeListBulk(MakeList):
+    name = "List (bulk)"
+
+    class Inputs:
+        element = widget.MultiInput("Element", object)
+
+    @Inputs.element
+    def set_element(self, index, el):
+        super().set_element(index, el)
+
+    @Inputs.element.insert
+    def insert_element(self, index, el):
+        super().insert_element(index, el)
+
+    @Inputs.element.remove
+    def remove_element(self, index):
+        super().remove_element(index)
+
+    @Inputs.element.bulk
+    def update_elements(self, changes):
+        self.events.append(("bulk", len(changes)))
+        for kind, index, el in changes:
+            if kind == "insert":
+                self.inputs.insert(index, el)
+            elif kind == "set":
+                self.inputs[index] = el
+            else:
+                self.inputs.pop(index)
+
+
 class AdderAsync(Adder):
     def handleNewSignals(self):
         self.setBlocking(True)
@@ -234,6 +279,44 @@ class TestWidgetScheme(GuiTest):
         model.set_report_view(None)
 
 
+class TestSettingsWriter(GuiTest):
+    def test_close_large_workflow(self):
+        writer = SettingsWriter()
+        writer_threads = set()
+
+        def write_file(filename, data):
+            # simulate a slow (network) file system
+            writer_threads.add(threading.current_thread())
+            time.sleep(0.01)
+            return True
+
+        writer._write_file = write_file
+        set_settings_writer(writer)
+        self.addCleanup(set_settings_writer, None)
+
+        model = WidgetsScheme()
+        for _ in range(300):
+            model.widget_for_node(model.new_node(widget_description(Number)))
+
+        blocked = 0
+        write_defaults = SettingsHandler.write_defaults
+
+        def timed_write_defaults(handler):
+            nonlocal blocked
+            t0 = time.perf_counter()
+            write_defaults(handler)
+            blocked += time.perf_counter() - t0
+
+        with unittest.mock.patch.object(
+                SettingsHandler, "write_defaults", timed_write_defaults):
+            model.clear()
+        # writing the same file 300 times would block for at least 3s
+        self.assertLess(blocked, 1)
+        self.assertTrue(writer.flush(10))
+        self.assertEqual(writer.written + writer.coalesced, 300)
+        self.assertNotIn(threading.main_thread(), writer_threads)
+
+
 class TestWidgetManager(GuiTest):
     def test_state_tracking(self):
         model, widgets = create_workflow()
@@ -422,6 +505,34 @@ class TestSignalManager(GuiTest):
         w1.Outputs.out.send(None)
         check_inputs([None, -42])
 
+    def test_multi_input_bulk(self):
+        model = WidgetsScheme()
+        list_node = model.new_node(widget_description(MakeListBulk))
+        list_ = model.widget_for_node(list_node)
+        nodes = [model.new_node(widget_description(Number)) for _ in range(3)]
+        numbers = [model.widget_for_node(node) for node in nodes]
+        links = [model.new_link(node, "X", list_node, "Element")
+                 for node in nodes]
+        sm = model.signal_manager
+        for i, number in enumerate(numbers):
+            number.Outputs.out.send(i)
+        sm.process_node(list_node)
+        self.assertEqual(list_.inputs, [0, 1, 2])
+        self.assertEqual(list_.events, [("bulk", 3)])
+
+        list_.events.clear()
+        numbers[1].Outputs.out.send(42)
+        model.remove_link(links[0])
+        sm.process_node(list_node)
+        self.assertEqual(list_.inputs, [42, 2])
+        self.assertEqual(list_.events, [("bulk", 2)])
+
+        list_.events.clear()
+        model.insert_link(0, links[0])
+        sm.process_node(list_node)
+        self.assertEqual(list_.inputs, [0, 42, 2])
+        self.assertEqual(list_.events, [("bulk", 1)])
+
     @unittest.mock.patch.object(MakeList.Inputs.element, "filter_none", True)
     def test_multi_input_filter_none(self):
         # Test MultiInput.filter_none
@@ -548,6 +659,244 @@ class TestSignalManager(GuiTest):
         check_inputs([])
         check_events([("remove", 0)])
 
+    def test_link_order(self):
+        model, widgets = create_workflow_2()
+        sm = model.signal_manager
+        l1, l2 = model.find_links(sink_node=widgets.list_node)
+        order = sm.link_order(widgets.list_node)
+        self.assertEqual(order, {l1: 0, l2: 1})
+        with unittest.mock.patch.object(model, "find_links") as find_links:
+            self.assertIs(sm.link_order(widgets.list_node), order)
+            find_links.assert_not_called()
+
+        model.remove_link(l1)
+        self.assertEqual(sm.link_order(widgets.list_node), {l2: 0})
+        model.insert_link(0, l1)
+        self.assertEqual(sm.link_order(widgets.list_node), {l1: 0, l2: 1})
+        # changes of links to other nodes do not invalidate the order
+        order = sm.link_order(widgets.list_node)
+        show_node = model.new_node(widget_description(Show))
+        model.new_link(widgets.w1_node, "X", show_node, "X")
+        self.assertIs(sm.link_order(widgets.list_node), order)
+
+        model.remove_node(widgets.w1_node)
+        self.assertEqual(sm.link_order(widgets.list_node), {l2: 0})
+
+    def test_scheduling_policy(self):
+        model = WidgetsScheme()
+        sm = model.signal_manager
+        source = model.new_node(widget_description(Number))
+        s1, s2 = nodes = [model.new_node(widget_description(Show))
+                          for _ in range(2)]
+        for node in nodes:
+            model.new_link(source, "X", node, "X")
+        w1, w2 = map(model.widget_for_node, nodes)
+        model.widget_for_node(source).Outputs.out.send(1)
+        self.assertEqual(sm.node_update_front(), [s1, s2])
+
+        sm.set_scheduling_policy(SchedulingPolicy())
+        w2.show()
+        self.assertEqual(sm.node_update_front(), [s2, s1])
+        sm.set_node_priority(s1, 1)
+        self.assertEqual(sm.node_update_front(), [s1, s2])
+        sm.set_node_priority(s1, 0)
+        w2.hide()
+        self.assertEqual(sm.node_update_front(), [s1, s2])
+
+        self.assertIsNone(sm.processing_time(s1))
+        sm.process_node(s1)
+        sm.process_node(s2)
+        self.assertIsNotNone(sm.processing_time(s1))
+        # hidden nodes that were updated before are deferred
+        sm.set_scheduling_policy(SchedulingPolicy(defer_threshold=0))
+        w1.show()
+        model.widget_for_node(source).Outputs.out.send(2)
+        self.assertEqual(sm.node_update_front(), [s1])
+        sm.process_node(s1)
+        # ... until no other nodes can be updated
+        self.assertEqual(sm.node_update_front(), [s2])
+        sm.process_node(s2)
+        self.assertEqual(w2.x, 2)
+        w1.hide()
+        # showing a widget requests an update of deferred nodes
+        with unittest.mock.patch.object(sm, "post_update_request") as post:
+            w1.show()
+            post.assert_called_once()
+            w1.hide()
+            post.assert_called_once()
+
+    def test_executor(self):
+        model, widgets = create_workflow()
+        executor = model.executor
+        self.assertIs(widgets.add.workflowEnv()["executor"], executor)
+        ev = threading.Event()
+        add = widgets.add
+        running = [executor.submit_for(add, ev.wait, 10)
+                   for _ in range(executor.max_workers)]
+        queued = executor.submit_for(add, pow, 2, 2)
+        show_queued = executor.submit_for(widgets.show, pow, 2, 2)
+        # delivery of inputs does not cancel tasks
+        widgets.w1.Outputs.out.send(1)
+        model.signal_manager.process_node(widgets.add_node)
+        self.assertFalse(queued.cancelled())
+        # invalidated inputs cancel the tasks queued for previous inputs
+        widgets.w1.Outputs.out.invalidate()
+        self.assertTrue(queued.cancelled())
+        self.assertFalse(show_queued.cancelled())
+        model.remove_node(widgets.show_node)
+        self.assertTrue(show_queued.cancelled())
+        self.assertNotIn(widgets.show, executor.statistics())
+        ev.set()
+        concurrent.futures.wait(running, 10)
+
+    def test_send_resolves_outputs_once(self):
+        model, widgets = create_workflow()
+        sm = model.signal_manager
+        manager = model.widget_manager
+        node, w1 = widgets.w1_node, widgets.w1
+        with unittest.mock.patch.object(
+                manager, "node_for_widget",
+                wraps=manager.node_for_widget) as node_for_widget, \
+                unittest.mock.patch.object(
+                    node, "output_channel",
+                    wraps=node.output_channel) as output_channel:
+            for i in range(10):
+                w1.Outputs.out.send(i)
+            self.assertEqual(node_for_widget.call_count, 1)
+            self.assertEqual(output_channel.call_count, 1)
+            link = model.find_links(node, sink_node=widgets.add_node)[0]
+            self.assertEqual(list(sm.link_contents(link).values()), [9])
+
+            # removing the node invalidates the cached output
+            model.remove_node(node)
+            node_for_widget.reset_mock()
+            w1.Outputs.out.send(42)
+            node_for_widget.assert_called_once_with(w1)
+
+    def test_without_workflow(self):
+        sm = WidgetsSignalManager(None)
+        widget = unittest.mock.Mock(captionTitle="w")
+        sm.send(widget, "out", 1)
+        self.assertEqual(sm.suppressed_deliveries(), {})
+
+        model, widgets = create_workflow()
+        sm.set_workflow(model)
+        self.assertEqual(sm.link_order(widgets.add_node),
+                         {link: i for i, link in enumerate(
+                             model.find_links(sink_node=widgets.add_node))})
+
+    def test_trace_signals(self):
+        model, widgets = create_workflow()
+        self.addCleanup(set_signal_tracer, None)
+        fd, filename = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        model.set_runtime_env("trace-signals", filename)
+        tracer = model.signal_manager.tracer()
+        self.assertIsNotNone(tracer)
+        self.assertIsNone(signal_tracer())
+        self.assertIs(signal_tracer(widgets.add), tracer)
+
+        spy = QSignalSpy(widgets.add_node.state_changed)
+        widgets.w1.Outputs.out.send(42)
+        widgets.w2.Outputs.out.send(-42)
+        self.assertTrue(spy.wait())
+        self.assertEqual(widgets.add.a, 42)
+        summary = tracer.summary()
+        self.assertEqual(summary["nodes"][widgets.add_node.title].count, 1)
+        links = {name: totals.count
+                 for name, totals in summary["links"].items()}
+        self.assertEqual(links["W1 (X) -> Adder (A)"], 1)
+        self.assertEqual(links["W1 (X) -> Adder (B)"], 1)
+        # both sources are titled W1
+        self.assertEqual(summary["outputs"]["W1"].count, 2)
+        inputs = {(event["name"], event["args"].get("type"))
+                  for event in tracer.events
+                  if event["cat"] == "input"
+                  and event["args"]["node"] == "Adder"}
+        self.assertEqual(
+            inputs,
+            {("seta", "int"), ("setb", "int"), ("handleNewSignals", None)})
+
+        model.set_runtime_env("trace-signals", None)
+        self.assertIsNone(model.signal_manager.tracer())
+        with open(filename) as f:
+            self.assertEqual(json.load(f)["traceEvents"], tracer.events)
+
+    def test_trace_signals_per_workflow(self):
+        global_tracer = SignalTracer()
+        set_signal_tracer(global_tracer)
+        self.addCleanup(set_signal_tracer, None)
+        model1, widgets1 = create_workflow()
+        model2, widgets2 = create_workflow()
+
+        model1.set_runtime_env("trace-signals", True)
+        tracer = model1.signal_manager.tracer()
+        self.assertIsNot(tracer, global_tracer)
+        self.assertIs(model2.signal_manager.tracer(), global_tracer)
+        self.assertIs(signal_tracer(widgets1.add), tracer)
+        self.assertIs(signal_tracer(widgets2.add), global_tracer)
+
+        widgets2.w1.Outputs.out.send(42)
+        model2.signal_manager.process_queued()
+        self.assertEqual(tracer.events, [])
+        self.assertNotEqual(global_tracer.events, [])
+
+        model2.set_runtime_env("trace-signals", None)
+        self.assertIs(model1.signal_manager.tracer(), tracer)
+        model1.set_runtime_env("trace-signals", None)
+        self.assertIs(model1.signal_manager.tracer(), global_tracer)
+        self.assertIs(signal_tracer(), global_tracer)
+
+    def test_skip_unchanged(self):
+        model, widgets = create_workflow()
+        sm = model.signal_manager
+        w1, add = widgets.w1, widgets.add
+        link = model.find_links(widgets.w1_node, sink_node=widgets.add_node)[0]
+
+        def deliveries():
+            sm.process_queued()
+            values = [args[0] for args, _ in seta.call_args_list]
+            seta.reset_mock()
+            return values
+
+        with unittest.mock.patch.object(add, "seta") as seta:
+            w1.Outputs.out.send(42, version=1)
+            self.assertEqual(deliveries(), [42])
+            w1.Outputs.out.send(42, version=1)
+            self.assertEqual(deliveries(), [])
+            self.assertEqual(sm.suppressed_deliveries(), {link: 1})
+
+            w1.Outputs.out.send(43, version=2)
+            self.assertEqual(deliveries(), [43])
+            # values without versions are always delivered and reset version
+            w1.Outputs.out.send(43)
+            self.assertEqual(deliveries(), [43])
+            w1.Outputs.out.send(43, version=2)
+            self.assertEqual(deliveries(), [43])
+
+            # invalidated outputs wait for a new value
+            w1.Outputs.out.invalidate()
+            w1.Outputs.out.send(43, version=2)
+            self.assertEqual(deliveries(), [43])
+            self.assertEqual(sm.suppressed_deliveries(), {link: 1})
+
+            # versions are kept by links: the sink of a new link does not
+            # hold the version yet
+            model.remove_link(model.find_links(widgets.w2_node)[0])
+            link_b = model.new_link(widgets.w1_node, "X",
+                                    widgets.add_node, "B")
+            sm.process_queued()
+            seta.reset_mock()
+            w1.Outputs.out.send(43, version=2)
+            self.assertEqual(deliveries(), [43])
+            w1.Outputs.out.send(43, version=2)
+            self.assertEqual(deliveries(), [])
+            self.assertEqual(sm.suppressed_deliveries(), {link: 2, link_b: 1})
+
+        model.remove_link(link)
+        self.assertEqual(sm.suppressed_deliveries(), {link_b: 1})
+
     def test_old_style_input(self):
         model, widgets = create_workflow()
         show_node = model.new_node(widget_description(OldStyleShow))
@@ -557,3 +906,45 @@ class TestSignalManager(GuiTest):
         spy = QSignalSpy(show_node.state_changed)
         spy.wait()
         self.assertEqual(show.x, 1)
+
+
+class TestInputSlots(unittest.TestCase):
+    def test_input_slots(self):
+        source = SchemeNode(widget_description(Number))
+        sink = SchemeNode(widget_description(Adder))
+        a1, a2, a3, b1, b2 = links = [
+            SchemeLink(source, "X", sink, channel)
+            for channel in "AAABB"]
+        slots = _InputSlots()
+
+        def check(expected):
+            self.assertEqual([s.link for s in slots], expected)
+            for i, link in enumerate(expected):
+                self.assertEqual(slots.index(link), i)
+                self.assertEqual(
+                    slots.local_index(link),
+                    [l for l in expected
+                     if l.sink_channel == link.sink_channel].index(link))
+
+        self.assertEqual(slots.insert(-1, Signal.New(a1, 1)), 0)
+        self.assertEqual(slots.insert(1, Signal.New(b1, 2)), 0)
+        self.assertEqual(slots.insert(2, Signal.New(a3, 3)), 1)
+        check([a1, b1, a3])
+        # insert before links to the same and other inputs
+        self.assertEqual(slots.insert(1, Signal.New(a2, 4)), 1)
+        self.assertEqual(slots.insert(0, Signal.New(b2, 5)), 0)
+        check([b2, a1, a2, b1, a3])
+        self.assertEqual(len(slots), 5)
+        self.assertTrue(all(link in slots for link in links))
+
+        slots.replace(Signal.Update(a2, 6))
+        self.assertEqual([s.value for s in slots], [5, 1, 6, 2, 3])
+
+        self.assertEqual(slots.remove(a1), 0)
+        check([b2, a2, b1, a3])
+        self.assertEqual(slots.remove(b2), 0)
+        check([a2, b1, a3])
+        self.assertEqual(slots.remove(a3), 1)
+        check([a2, b1])
+        self.assertNotIn(a1, slots)
+        self.assertIsNone(slots.local_index(a1))
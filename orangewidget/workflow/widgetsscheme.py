@@ -21,15 +21,17 @@ companion :class:`WidgetsSignalManager` class.
 import copy
 import logging
 import enum
+import time
 import types
 import warnings
+from collections import defaultdict
 from functools import singledispatch
 from itertools import count
 
 from urllib.parse import urlencode
 from weakref import finalize
 
-from typing import Optional, Dict, Any, List, Mapping, overload
+from typing import Optional, Dict, Any, List, Mapping, Tuple, overload
 
 from AnyQt.QtWidgets import QWidget, QAction
 from AnyQt.QtGui import QWhatsThisClickedEvent
@@ -42,17 +44,24 @@ from orangecanvas.registry import WidgetDescription, OutputSignal
 from orangecanvas.scheme.signalmanager import (
     SignalManager, Signal, compress_signals
 )
-from orangecanvas.scheme import Scheme, SchemeNode
+from orangecanvas.scheme import Scheme, SchemeNode, SchemeLink
 from orangecanvas.scheme.node import UserMessage
 from orangecanvas.scheme.widgetmanager import WidgetManager as _WidgetManager
 from orangecanvas.utils import name_lookup
 from orangecanvas.resources import icon_loader
-from orangewidget.utils.signals import get_input_meta, notify_input_helper
+from orangewidget.utils.concurrent import FairShareExecutor
+from orangewidget.utils.signals import (
+    get_input_meta, notify_input_helper, collect_input_changes,
+    notify_input_changes
+)
+from orangewidget.utils.tracing import (
+    SignalTracer, signal_tracer, payload_type
+)
 
-from orangewidget.widget import OWBaseWidget, Input
+from orangewidget.widget import OWBaseWidget, Input, MultiInput
 from orangewidget.report.owreport import OWReport
-from orangewidget.settings import SettingsPrinter
-from orangewidget.workflow.utils import index_of, WeakKeyDefaultDict
+from orangewidget.settings import SettingsPrinter, CopyOnWriteDict
+from orangewidget.workflow.utils import WeakKeyDefaultDict
 
 log = logging.getLogger(__name__)
 
@@ -65,10 +74,18 @@ class WidgetsScheme(Scheme):
     (creation/deletion, etc.) of `OWBaseWidget` instances corresponding to
     the nodes in the scheme. The inter-widget signal propagation is
     delegated to an instance of `WidgetsSignalManager`.
+
+    Widgets can run background tasks in the workflow's
+    :class:`FairShareExecutor`, available in the workflow environment
+    under `"executor"`, with `executor.submit_for(self, func, ...)`. Threads
+    are shared fairly among widgets; a widget's queued tasks are cancelled
+    when its inputs are invalidated or it is removed.
     """
     def __init__(self, parent=None, title=None, description=None, env={},
                  **kwargs):
         super().__init__(parent, title, description, env=env, **kwargs)
+        self.executor = FairShareExecutor()
+        self.set_runtime_env("executor", self.executor)
         self.widget_manager = WidgetManager()
         self.signal_manager = WidgetsSignalManager(self)
         self.widget_manager.set_scheme(self)
@@ -158,6 +175,7 @@ class WidgetsScheme(Scheme):
             if self.__report_view is not None:
                 self.__report_view.close()
             self.signal_manager.stop()
+            self.executor.shutdown(wait=False)
         return super().event(event)
 
 
@@ -192,6 +210,9 @@ class OWWidgetManager(_WidgetManager):
     This class handles the lifetime of OWBaseWidget instances in a
     :class:`WidgetsScheme`.
 
+    Settings of deleted widgets are saved as the user's defaults, unless
+    the workflow environment key `"save-settings"` is set to `False` (e.g.
+    in headless runs).
     """
     InputUpdate, BlockingUpdate, ProcessingUpdate, Initializing = ProcessingState
 
@@ -328,9 +349,13 @@ class OWWidgetManager(_WidgetManager):
 
             widget.close()
             # Save settings to user global settings.
-            widget.saveSettings()
+            self.__save_settings(widget)
             # Notify the widget it will be deleted.
             widget.onDeleteWidget()
+            executor = getattr(self.scheme(), "executor", None)
+            if executor is not None:
+                executor.cancel(widget)
+                executor.forget(widget)
             # Un befriend the report view
             del widget._Report__report_view
 
@@ -405,7 +430,9 @@ class OWWidgetManager(_WidgetManager):
                 None,
                 captionTitle=node.title,
                 signal_manager=signal_manager,
-                stored_settings=copy.deepcopy(node.properties),
+                # NOTE: stored settings are copied only when (and if) they
+                # are used, so node.properties remains unchanged.
+                stored_settings=CopyOnWriteDict(node.properties),
                 # NOTE: env is a view of the real env and reflects
                 # changes to the environment.
                 env=self.scheme().runtime_env()
@@ -450,10 +477,22 @@ class OWWidgetManager(_WidgetManager):
         widget.setCaption(node.title)
         # befriend class Report
         widget._Report__report_view = self.scheme().report_view
+        # nodes of shown widgets can be scheduled differently
+        widget.visibilityChanged.connect(self.__on_widget_visibility_changed)
 
         self.__update_item(item)
         return widget
 
+    def is_widget_visible(self, node):
+        # type: (SchemeNode) -> bool
+        """
+        Is the widget for the node created and visible. Unlike
+        `widget_for_node`, this does not create the widget.
+        """
+        item = self.__item_for_node.get(node)
+        return item is not None and item.widget is not None \
+            and item.widget.isVisible()
+
     def node_processing_state(self, node):
         """
         Return the processing state flags for the node.
@@ -509,12 +548,18 @@ class OWWidgetManager(_WidgetManager):
                 widget = item.widget
                 if widget is not None:
                     widget.close()
-                    widget.saveSettings()
+                    self.__save_settings(widget)
                     widget.onDeleteWidget()
                     widget.deleteLater()
 
         return super().eventFilter(receiver, event)
 
+    @Slot(bool)
+    def __on_widget_visibility_changed(self, visible):
+        if visible:
+            # the scheduling policy may have deferred the widget's update
+            self.signal_manager().post_update_request()
+
     def __on_help_request(self):
         """
         Help shortcut was pressed. We send a `QWhatsThisClickedEvent` to
@@ -649,6 +694,11 @@ class OWWidgetManager(_WidgetManager):
             item.state, ProcessingState.ProcessingUpdate, progress)
         self.signal_manager().post_update_request()
 
+    def __save_settings(self, widget):
+        # type: (OWBaseWidget) -> None
+        if self.__scheme.runtime_env().get("save-settings", True):
+            widget.saveSettings()
+
     def __update_node_processing_state(self, node):
         """
         Update the `node.processing_state` to reflect the widget state.
@@ -704,51 +754,331 @@ def user_message_from_state(message_group):
         data={"content-type": "text/html"})
 
 
+_BoundOutputs = Tuple[SchemeNode, Dict[str, OutputSignal]]
+_OutputLinks = Dict[Tuple[SchemeNode, OutputSignal], List[SchemeLink]]
+
+
+class SchedulingPolicy:
+    """
+    A policy for the order in which `WidgetsSignalManager` updates nodes.
+
+    Nodes that are ready for update (they have no pending or invalidated
+    ancestors) are updated in the order of decreasing priority; nodes with
+    equal priorities remain in the topological order. The default priority
+    puts nodes marked with a positive priority (see
+    :obj:`WidgetsSignalManager.set_node_priority`) first and nodes with
+    visible widgets second.
+
+    If `defer_threshold` is given, nodes with hidden widgets and no
+    positive priority, whose last update took at least `defer_threshold`
+    seconds (see :obj:`WidgetsSignalManager.processing_time`), are deferred
+    until their widgets are shown or no other nodes can be updated.
+
+    Parameters
+    ----------
+    defer_threshold : Optional[float]
+        the time of update (in seconds) above which hidden nodes are
+        deferred; `None` (default) disables deferring
+    """
+    def __init__(self, defer_threshold=None):
+        # type: (Optional[float]) -> None
+        self.defer_threshold = defer_threshold
+
+    def priority(self, manager, node):
+        # type: (WidgetsSignalManager, SchemeNode) -> Any
+        """
+        Return the priority (a sortable key) of the `node`.
+        """
+        widget_manager = manager.scheme().widget_manager
+        return (manager.node_priority(node),
+                widget_manager.is_widget_visible(node))
+
+    def defer(self, manager, node):
+        # type: (WidgetsSignalManager, SchemeNode) -> bool
+        """
+        Should the update of the `node` be deferred while other nodes can be
+        updated.
+        """
+        if self.defer_threshold is None or manager.node_priority(node) > 0:
+            return False
+        duration = manager.processing_time(node)
+        return duration is not None and duration >= self.defer_threshold \
+            and not manager.scheme().widget_manager.is_widget_visible(node)
+
+
 class WidgetsSignalManager(SignalManager):
     """
     A signal manager for a WidgetsScheme.
+
+    Setting the workflow environment key `"trace-signals"` to `True` or to
+    a file name enables tracing of signal propagation in this workflow (see
+    :mod:`orangewidget.utils.tracing`). When the key is cleared, the trace
+    is written to the file, if given, and tracing of this workflow is
+    disabled. The global tracer is not affected.
+
+    The order of updates of nodes that are ready for update can be changed
+    by setting a :class:`SchedulingPolicy`.
     """
     def __init__(self, scheme, **kwargs):
+        self.__policy = None  # type: Optional[SchedulingPolicy]
+        self.__tracer = None  # type: Optional[SignalTracer]
+        # the parent need not be a workflow, so set_workflow may not be called
+        self.__clear_caches()
         super().__init__(scheme, **kwargs)
 
-    def send(self, widget, channelname, value, *args, **kwargs):
-        # type: (OWBaseWidget, str, Any, Any, Any, Any) -> None
+    def set_workflow(self, workflow):
+        """Reimplemented from `SignalManager`"""
+        current = self.workflow()
+        if workflow is current:
+            return
+        if current is not None:
+            current.link_added.disconnect(self.__on_link_changed)
+            current.link_removed.disconnect(self.__on_link_changed)
+            current.node_removed.disconnect(self.__on_node_removed)
+            current.runtime_env_changed.disconnect(self.__on_env_changed)
+        self.__clear_caches()
+        super().set_workflow(workflow)
+        if workflow is not None:
+            workflow.link_added.connect(self.__on_link_changed)
+            workflow.link_removed.connect(self.__on_link_changed)
+            workflow.node_removed.connect(self.__on_node_removed)
+            workflow.runtime_env_changed.connect(self.__on_env_changed)
+            trace = workflow.runtime_env().get("trace-signals")
+            if trace:
+                self.__on_env_changed("trace-signals", trace, None)
+
+    def __clear_caches(self):
+        # mapping sink nodes to positions of their input links in the model
+        self.__link_order = {}  # type: Dict[SchemeNode, Dict[SchemeLink, int]]
+        # mapping widgets to their nodes and (used) output channels by name
+        self.__bound_outputs = {}  # type: Dict[OWBaseWidget, _BoundOutputs]
+        self.__bound_widgets = {}  # type: Dict[SchemeNode, OWBaseWidget]
+        # output links of nodes, by (node, channel)
+        self.__output_links = {}  # type: _OutputLinks
+        # versions of values last sent on links, by signal id
+        self.__versions = {}  # type: Dict[SchemeLink, Dict[Any, Any]]
+        self.__suppressed = defaultdict(int)  # type: Dict[SchemeLink, int]
+        self.__priorities = {}  # type: Dict[SchemeNode, int]
+        # duration of the last delivery of signals to nodes
+        self.__processing_times = {}  # type: Dict[SchemeNode, float]
+
+    def tracer(self):
+        # type: () -> Optional[SignalTracer]
         """
-        send method compatible with OWBaseWidget.
+        Return the tracer of this workflow's signals: the tracer set by the
+        `"trace-signals"` environment key, if any, else the global tracer.
         """
-        scheme = self.scheme()
-        node = scheme.widget_manager.node_for_widget(widget)
-        if node is None:
-            # The Node/Widget was already removed from the scheme.
-            log.debug("Node for '%s' (%s.%s) is not in the scheme.",
-                      widget.captionTitle,
-                      type(widget).__module__, type(widget).__name__)
-            return
+        if self.__tracer is not None:
+            return self.__tracer
+        return signal_tracer()
 
-        try:
-            channel = node.output_channel(channelname)
-        except ValueError:
-            log.error("%r is not valid signal name for %r",
-                      channelname, node.description.name)
+    def __on_env_changed(self, key, newvalue, oldvalue):
+        if key != "trace-signals":
             return
+        tracer = self.__tracer
+        if newvalue and tracer is None:
+            self.__tracer = SignalTracer()
+        elif not newvalue and tracer is not None:
+            if oldvalue and isinstance(oldvalue, str):
+                try:
+                    tracer.write(oldvalue)
+                except OSError as ex:
+                    log.error("Could not write signal trace to %s (%s).",
+                              oldvalue, ex)
+            self.__tracer = None
+
+    def __on_link_changed(self, link):
+        self.__link_order.pop(link.sink_node, None)
+        self.__output_links.pop((link.source_node, link.source_channel), None)
+        self.__versions.pop(link, None)
+        self.__suppressed.pop(link, None)
+
+    def __on_node_removed(self, node):
+        self.__link_order.pop(node, None)
+        self.__priorities.pop(node, None)
+        self.__processing_times.pop(node, None)
+        widget = self.__bound_widgets.pop(node, None)
+        if widget is not None:
+            del self.__bound_outputs[widget]
 
-        # parse deprecated id parameter from *args, **kwargs.
-        _not_set = object()
+    def set_scheduling_policy(self, policy):
+        # type: (Optional[SchedulingPolicy]) -> None
+        """
+        Set the policy for the order of node updates; `None` (default)
+        updates nodes in topological order.
+        """
+        if self.__policy is not policy:
+            self.__policy = policy
+            self.post_update_request()
 
-        def _parse_call_signal_id(signal_id=_not_set):
-            if signal_id is _not_set:
-                return None
-            else:
-                warnings.warn(
-                    "'signal_id' parameter is deprecated",
-                    DeprecationWarning, stacklevel=3)
-                return signal_id
-        signal_id = _parse_call_signal_id(*args, **kwargs)
+    def scheduling_policy(self):
+        # type: () -> Optional[SchedulingPolicy]
+        """Return the scheduling policy."""
+        return self.__policy
+
+    def set_node_priority(self, node, priority):
+        # type: (SchemeNode, int) -> None
+        """
+        Set the priority of the `node` for the scheduling policy; positive
+        values mark nodes of high priority and 0 is the default.
+        """
+        if priority:
+            self.__priorities[node] = priority
+        else:
+            self.__priorities.pop(node, None)
+        self.post_update_request()
+
+    def node_priority(self, node):
+        # type: (SchemeNode) -> int
+        """Return the priority of the `node`."""
+        return self.__priorities.get(node, 0)
+
+    def processing_time(self, node):
+        # type: (SchemeNode) -> Optional[float]
+        """
+        Return the time (in seconds) of the last delivery of signals to the
+        `node`, or `None` if the node has not been updated yet.
+
+        This is the time of the synchronous delivery (the widget's input
+        handlers and `handleNewSignals`); work that the widget continues
+        asynchronously, e.g. in a thread, is not included.
+        """
+        return self.__processing_times.get(node)
+
+    def node_update_front(self):
+        # type: () -> List[SchemeNode]
+        """
+        Reimplemented from `SignalManager`.
+
+        Order the nodes and drop the deferred nodes by the scheduling
+        policy, if set.
+        """
+        front = super().node_update_front()
+        policy = self.__policy
+        if policy is None or not front:
+            return front
+        deferred = {node for node in front if policy.defer(self, node)}
+        if deferred:
+            if len(deferred) < len(front):
+                front = [node for node in front if node not in deferred]
+            elif any(node not in deferred for node in self.active_nodes()):
+                # wait until the workflow is otherwise idle
+                return []
+        return sorted(front, key=lambda node: policy.priority(self, node),
+                      reverse=True)
+
+    def link_order(self, node):
+        # type: (SchemeNode) -> Dict[SchemeLink, int]
+        """
+        Return a mapping of input links of the `node` to their positions in
+        the model. The mapping is cached until a link to the node is added
+        or removed.
+        """
+        order = self.__link_order.get(node)
+        if order is None:
+            links = self.scheme().find_links(sink_node=node)
+            order = self.__link_order[node] = \
+                {link: i for i, link in enumerate(links)}
+        return order
+
+    def send(self, widget, channelname, value, *args, version=None,
+             **kwargs):
+        # type: (OWBaseWidget, str, Any, Any, Any, Any, Any) -> None
+        """
+        send method compatible with OWBaseWidget.
+
+        If `version` is given and equals the version of the value that was
+        last sent on the output, the value is not delivered again and the
+        delivery is counted as suppressed (see `suppressed_deliveries`).
+        """
+        # Nodes and output channels of widgets are cached, so sending
+        # (partial) results many times does not search the scheme
+        bound = self.__bound_outputs.get(widget)
+        if bound is None:
+            bound = self.__bind_widget(widget)
+            if bound is None:
+                # The Node/Widget was already removed from the scheme.
+                log.debug("Node for '%s' (%s.%s) is not in the scheme.",
+                          widget.captionTitle,
+                          type(widget).__module__, type(widget).__name__)
+                return
+        node, channels = bound
+        channel = channels.get(channelname)
+        if channel is None:
+            try:
+                channel = channels[channelname] = \
+                    node.output_channel(channelname)
+            except ValueError:
+                log.error("%r is not valid signal name for %r",
+                          channelname, node.description.name)
+                return
+
+        signal_id = None
+        if args or kwargs:
+            signal_id = _parse_call_signal_id(*args, **kwargs)
+        if self.__is_unchanged(node, channel, signal_id, version):
+            return
         if signal_id is not None:
             super().send(node, channel, value, signal_id)  # type: ignore
         else:
             super().send(node, channel, value)
 
+    def __links_from(self, node, channel):
+        # type: (SchemeNode, OutputSignal) -> List[SchemeLink]
+        links = self.__output_links.get((node, channel))
+        if links is None:
+            links = self.__output_links[(node, channel)] = \
+                self.scheme().find_links(source_node=node,
+                                         source_channel=channel)
+        return links
+
+    def __is_unchanged(self, node, channel, signal_id, version):
+        # type: (SchemeNode, OutputSignal, Any, Any) -> bool
+        versions = self.__versions
+        if version is None:
+            if versions:
+                for link in self.__links_from(node, channel):
+                    held = versions.get(link)
+                    if held:
+                        held.pop(signal_id, None)
+            return False
+        links = self.__links_from(node, channel)
+        # The value is skipped only if the sinks of all links already hold
+        # this version; links on invalidated outputs wait for a new value,
+        # so it must be sent even if unchanged
+        for link in links:
+            held = versions.get(link)
+            if held is None or held.get(signal_id, _not_set) != version:
+                break
+        else:
+            if links and not self.has_invalidated_outputs(node):
+                for link in links:
+                    self.__suppressed[link] += 1
+                return True
+        for link in links:
+            versions.setdefault(link, {})[signal_id] = version
+        return False
+
+    def suppressed_deliveries(self):
+        # type: () -> Dict[SchemeLink, int]
+        """
+        Return the number of deliveries of unchanged values that were
+        suppressed, by links.
+        """
+        return dict(self.__suppressed)
+
+    def __bind_widget(self, widget):
+        # type: (OWBaseWidget) -> Optional[_BoundOutputs]
+        scheme = self.scheme()
+        if scheme is None:
+            return None
+        node = scheme.widget_manager.node_for_widget(widget)
+        if node is None:
+            return None
+        bound = self.__bound_outputs[widget] = (node, {})
+        self.__bound_widgets[node] = widget
+        return bound
+
     @overload
     def invalidate(self, widget: OWBaseWidget, channel: str) -> None: ...
 
@@ -762,6 +1092,15 @@ class WidgetsSignalManager(SignalManager):
             node = scheme.widget_manager.node_for_widget(node)
             channel = node.output_channel(channel)
         super().invalidate(node, channel)
+        workflow = self.workflow()
+        executor = getattr(workflow, "executor", None)
+        if executor is not None:
+            # tasks queued for the invalidated inputs are obsolete
+            for link in workflow.find_links(source_node=node,
+                                            source_channel=channel):
+                widget = workflow.widget_for_node(link.sink_node)
+                if widget is not None:
+                    executor.cancel(widget)
 
     def is_invalidated(self, node: SchemeNode) -> bool:
         """Reimplemented from `SignalManager`"""
@@ -794,9 +1133,7 @@ class WidgetsSignalManager(SignalManager):
             return
         # `signals` are in the order they were 'enqueued' for delivery.
         # Reorder them to match the order of links in the model.
-        _order = {
-            l: i for i, l in enumerate(scheme.find_links(sink_node=node))
-        }
+        _order = self.link_order(node)
 
         def order(signal: Signal) -> int:
             # if link is not in the workflow we are processing the final
@@ -817,7 +1154,29 @@ class WidgetsSignalManager(SignalManager):
         Process new signals for the OWBaseWidget.
         """
         workflow = self.workflow()
-        process_signals_for_widget(widget, signals, workflow)
+        tracer = self.tracer()
+        start = time.perf_counter()
+        if tracer is None:
+            process_signals_for_widget(widget, signals, workflow)
+        else:
+            with tracer.span("process signals", "node", node=node.title,
+                             signals=len(signals)):
+                process_signals_for_widget(widget, signals, workflow)
+        self.__processing_times[node] = time.perf_counter() - start
+
+
+_not_set = object()
+
+
+def _parse_call_signal_id(signal_id=_not_set):
+    # parse deprecated id parameter of WidgetsSignalManager.send
+    if signal_id is _not_set:
+        return None
+    else:
+        warnings.warn(
+            "'signal_id' parameter is deprecated",
+            DeprecationWarning, stacklevel=3)
+        return signal_id
 
 
 __NODE_ID: Mapping[SchemeNode, int] = WeakKeyDefaultDict(count().__next__)
@@ -846,56 +1205,141 @@ def process_signal_input_default(
 ):
     """
     """
-    inputs = get_widget_input_signals(widget)
+    slots = get_widget_input_slots(widget)
     link = signal.link
-    index = signal.index
     value = signal.value
 
-    index_existing = index_of(inputs, signal, eq=same_input_slot)
-    if index < 0 and index_existing is not None:
-        index = index_existing
-    elif index_existing is not None:
-        index = index_existing
-
     # 'input local' index i.e. which connection to the same (multiple) input.
-    index_local = index_of(
-        (s.link for s in inputs if s.channel.name == input.name),
-        signal.link,
-    )
+    index_local = slots.local_index(link)
     if isinstance(signal, Signal.New):
-        if not 0 <= index < len(inputs):
-            index = len(inputs)
-        inputs.insert(index, signal)
-        index_local = index_of(
-            (s.link for s in inputs if s.channel.name == input.name),
-            signal.link,
-        )
+        if index_local is None:
+            index_local = slots.insert(signal.index, signal)
+        else:
+            slots.replace(signal)
     elif isinstance(signal, Signal.Close):
-        old = inputs.pop(index)
-        assert old.link == signal.link
+        slots.remove(link)
         value = input.closing_sentinel
     else:
-        assert inputs[index].link == signal.link
-        inputs[index] = signal
+        assert index_local is not None
+        slots.replace(signal)
 
     wid = __NODE_ID[link.source_node]
     # historical key format: widget_id, output name and the id passed to send
     key = (wid, link.source_channel.name, signal.id)
-    notify_input_helper(
-        input, widget, value, key=key, index=index_local
-    )
+    tracer = signal_tracer(widget)
+    if tracer is None:
+        notify_input_helper(
+            input, widget, value, key=key, index=index_local
+        )
+    else:
+        with tracer.span(type(signal).__name__, "link", link=_link_name(link),
+                         node=link.sink_node.title, channel=input.name,
+                         type=payload_type(value)):
+            notify_input_helper(
+                input, widget, value, key=key, index=index_local
+            )
 
 
-def get_widget_input_signals(widget: OWBaseWidget) -> List[Signal]:
-    inputs: List[Signal]
-    inputs = widget.__dict__.setdefault(
-        "_OWBaseWidget__process_signal_input", []
-    )
-    return inputs
+def _link_name(link):
+    # type: (SchemeLink) -> str
+    return "{} ({}) -> {} ({})".format(
+        link.source_node.title, link.source_channel.name,
+        link.sink_node.title, link.sink_channel.name)
 
 
-def same_input_slot(s1: Signal, s2: Signal) -> bool:
-    return s1.link == s2.link
+class _InputSlots:
+    """
+    The current signals on links to a widget's inputs, in the order of links.
+
+    Signals are indexed by link and the links are indexed by their position
+    among all links and among the links to the same input, so lookups are
+    O(1). Appending a link (e.g. when loading a workflow) is O(1); inserting
+    or removing a link before others shifts the indices of the latter.
+    """
+    def __init__(self):
+        self.__links = []     # type: List[SchemeLink]
+        self.__signals = {}   # type: Dict[SchemeLink, Signal]
+        self.__index = {}     # type: Dict[SchemeLink, int]
+        self.__channels = {}  # type: Dict[str, List[SchemeLink]]
+        self.__local = {}     # type: Dict[SchemeLink, int]
+
+    def __len__(self):
+        return len(self.__links)
+
+    def __iter__(self):
+        signals = self.__signals
+        return (signals[link] for link in self.__links)
+
+    def __contains__(self, link):
+        return link in self.__signals
+
+    def index(self, link):
+        # type: (SchemeLink) -> Optional[int]
+        """Return the index of `link` among all links, or `None`."""
+        return self.__index.get(link)
+
+    def local_index(self, link):
+        # type: (SchemeLink) -> Optional[int]
+        """Return the index of `link` among links to the same input."""
+        return self.__local.get(link)
+
+    def insert(self, index, signal):
+        # type: (int, Signal) -> int
+        """
+        Insert the `signal` for a new link at `index`, or append it if the
+        index is out of range. Return its index among links to the input.
+        """
+        link, name = signal.link, signal.channel.name
+        links = self.__links
+        channel = self.__channels.setdefault(name, [])
+        if 0 <= index < len(links):
+            signals = self.__signals
+            local = sum(signals[other].channel.name == name
+                        for other in links[:index])
+        else:
+            index, local = len(links), len(channel)
+        self.__signals[link] = signal
+        links.insert(index, link)
+        channel.insert(local, link)
+        self.__reindex(self.__index, links, index)
+        self.__reindex(self.__local, channel, local)
+        return local
+
+    def replace(self, signal):
+        # type: (Signal) -> None
+        """Replace the signal on an existing link."""
+        assert signal.link in self.__signals
+        self.__signals[signal.link] = signal
+
+    def remove(self, link):
+        # type: (SchemeLink) -> int
+        """Remove the `link`; return its index among links to the input."""
+        signal = self.__signals.pop(link)
+        index, local = self.__index.pop(link), self.__local.pop(link)
+        channel = self.__channels[signal.channel.name]
+        del self.__links[index]
+        del channel[local]
+        self.__reindex(self.__index, self.__links, index)
+        self.__reindex(self.__local, channel, local)
+        return local
+
+    @staticmethod
+    def __reindex(indices, links, start):
+        for i in range(start, len(links)):
+            indices[links[i]] = i
+
+
+def get_widget_input_slots(widget: OWBaseWidget) -> _InputSlots:
+    slots: Optional[_InputSlots]
+    slots = widget.__dict__.get("_OWBaseWidget__process_signal_input")
+    if slots is None:
+        slots = widget.__dict__["_OWBaseWidget__process_signal_input"] = \
+            _InputSlots()
+    return slots
+
+
+def get_widget_input_signals(widget: OWBaseWidget) -> List[Signal]:
+    return list(get_widget_input_slots(widget))
 
 
 @singledispatch
@@ -915,9 +1359,34 @@ def process_signals_for_widget(widget, signals, workflow):
     # type: (OWBaseWidget, List[Signal], WidgetsScheme) -> None
     """
     Process new signals for the OWBaseWidget.
-    """
-    for signal in signals:
-        input_meta = get_input_meta(widget, signal.channel.name)
-        process_signal_input(input_meta, widget, signal, workflow)
 
-    handle_new_signals(widget, workflow)
+    Signals for `MultiInput` inputs with a bulk handler are grouped by
+    input and passed to the handler in a single call after other signals.
+    Input summaries are rendered after all signals are processed.
+    """
+    with widget.deferred_summary_updates():
+        bulk = {}  # type: Dict[str, Tuple[MultiInput, List[Signal]]]
+        for signal in signals:
+            input_meta = get_input_meta(widget, signal.channel.name)
+            if isinstance(input_meta, MultiInput) \
+                    and input_meta.bulk_handler is not None:
+                _, input_signals = bulk.setdefault(input_meta.name,
+                                                   (input_meta, []))
+                input_signals.append(signal)
+            else:
+                process_signal_input(input_meta, widget, signal, workflow)
+
+        for input_meta, input_signals in bulk.values():
+            with collect_input_changes(input_meta, widget) as changes:
+                for signal in input_signals:
+                    process_signal_input(input_meta, widget, signal, workflow)
+            if changes:
+                notify_input_changes(input_meta, widget, changes)
+
+        tracer = signal_tracer(widget)
+        if tracer is None:
+            handle_new_signals(widget, workflow)
+        else:
+            with tracer.span("handleNewSignals", "input",
+                             node=widget.captionTitle):
+                handle_new_signals(widget, workflow)
@@ -137,7 +137,7 @@ if not release:
         a.close()
 
 
-PACKAGES = find_packages()
+PACKAGES = find_packages(exclude=["benchmark", "benchmark.*"])
 
 # Extra non .py, .{so,pyd} files that are installed within the package dir
 # hierarchy